@@ -1,13 +1,57 @@
-from typing import List
-from langchain_core.messages import HumanMessage
+import logging
+import re
+from typing import Iterator, List, Tuple
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_openai import ChatOpenAI
 from langchain_community.utilities import SQLDatabase
 from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import tool
 from db.sqlite import SQLiteDatabase  # Assuming this is your SQLiteDatabase class
+from agents.sql_cache import SqlPlanCache, SqlResultCache
+from configs import Configs
+from utils.tracing import tracer, record_llm_call
+
+FAST_REPLY_PATTERN = re.compile(r"SQL:\s*(?P<sql>.*?)\s*ANSWER:\s*(?P<answer>.*)", re.DOTALL | re.IGNORECASE)
+
+
+def parse_fast_reply(reply: str) -> Tuple[str, str]:
+    """Split a one-shot reply into (sql, answer_template)."""
+    match = FAST_REPLY_PATTERN.search(reply)
+    if match is None:
+        raise ValueError(f"Unexpected fast-path reply: {reply!r}")
+    sql = match.group("sql").strip().strip("`").strip()
+    sql = re.sub(r"^sql\s+", "", sql, flags=re.IGNORECASE).rstrip(";").strip()
+    if not sql or sql.upper() == "NONE":
+        raise ValueError("Model could not answer the question with a single query")
+    return sql, match.group("answer").strip()
+
+
+def render_answer(template: str, rows: list, truncated: bool = False, max_rows: int = None) -> str:
+    """Fill the {result} placeholder of a fast-path answer template with query results.
+
+    The template is written before the model sees any rows, so at most max_rows rows are rendered,
+    followed by a "showing N of M" note when there were more (truncated: the fetch itself was cut).
+    """
+    max_rows = Configs.SQL_ANSWER_MAX_ROWS if max_rows is None else max_rows
+    shown = rows[:max_rows]
+    if not rows:
+        result = "no matching records"
+    elif len(rows) == 1 and len(rows[0]) == 1:
+        result = str(rows[0][0])
+    elif all(len(row) == 1 for row in shown):
+        result = ", ".join(str(row[0]) for row in shown)
+    else:
+        result = "\n" + "\n".join(" | ".join(str(v) for v in row) for row in shown)
+    if truncated or len(shown) < len(rows):
+        total = f"more than {len(rows)}" if truncated else str(len(rows))
+        result += f"\n(showing {len(shown)} of {total} rows)"
+    if "{result}" not in template:
+        return f"{template}\n{result}".strip()
+    return template.replace("{result}", result)
 
 class SqliteAgent:
-    def __init__(self, db_file: str, model_name: str = "gpt-4o-mini", temperature: float = 0):
+    def __init__(self, db_file: str, model_name: str = "gpt-4o-mini", temperature: float = 0, llm=None,
+                 config: Configs = None):
         """
         Initialize the SQLAgent with a connection to the SQLite database and a language model.
 
@@ -15,31 +59,43 @@ class SqliteAgent:
             db_file (str): Path to the SQLite database file.
             model_name (str): OpenAI model name to use (default is "gpt-4o-mini").
             temperature (float): Temperature for the language model (default is 0).
+            llm: Chat model to use instead of ChatOpenAI; it must support bind_tools.
+            config (Configs): Cache, pool, row-limit and mode settings (default: the Configs class values).
         """
+        self.config = config or Configs()
         # 1. Initialize Database Connection using the provided SQLiteDatabase class
-        self.db = SQLiteDatabase(db_file)
+        self.result_cache = SqlResultCache(self.config.SQL_RESULT_CACHE_SIZE, self.config.SQL_RESULT_CACHE_MAX_ROWS)
+        self.plan_cache = SqlPlanCache(self.config.SQL_PLAN_CACHE_SIZE)
+        self.db = SQLiteDatabase(db_file, sample_rows=self.config.SQL_SCHEMA_SAMPLE_ROWS,
+                                 result_cache=self.result_cache, pool_size=self.config.SQLITE_POOL_SIZE,
+                                 query_timeout_s=self.config.SQLITE_QUERY_TIMEOUT_S,
+                                 max_rows=self.config.SQL_MAX_ROWS)
 
         # 2. Initialize Language Model
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        self.llm = llm or ChatOpenAI(model=model_name, temperature=temperature)
 
         # 3. Create SQL Database Tools
         @tool
         def list_tables_tool():
             """List all tables in the database."""
-            return self.db.list_tables()
+            with tracer.span("sql.tool.list_tables"):
+                return self.db.list_tables()
 
         @tool
         def describe_table_schema(table_name: str):
             """Get the schema for a specific table."""
-            return self.db.describe_table(table_name)
+            with tracer.span("sql.tool.describe_table", table=table_name):
+                return self.db.describe_table(table_name)
 
         @tool
         def execute_sql_query(query: str):
-            """Execute a SQL query and return results."""
-            try:
-                return self.db.execute_query(query)
-            except Exception as e:
-                return f"Error executing query: {str(e)}"
+            """Execute a SQL query and return results (large results are truncated)."""
+            with tracer.span("sql.tool.execute_sql_query") as span:
+                try:
+                    return self.db.format_result(self.db.fetch(query))
+                except Exception as e:
+                    span.set(error=type(e).__name__)
+                    return f"Error executing query: {str(e)}"
 
         # 4. Combine Tools
         self.tools = [
@@ -48,23 +104,25 @@ class SqliteAgent:
             execute_sql_query
         ]
 
-        # 5. System Prompt for SQL Agent
+        # 5. System Prompt for SQL Agent; the schema snapshot saves the exploratory tool round-trips
         self.system_message = """ 
         You are an expert SQL database assistant. 
         You will take the users questions and turn them into SQL queries using the tools available.
+        The database schema, with a few sample rows per table, is:
+
+        {schema}
+
         Follow these guidelines:
-        1. Always start by understanding the database structure
+        1. Use the schema above instead of exploring the database
         2. Break down complex questions into step-by-step reasoning
-        3. Use tools to explore the database schema
+        3. Only call list_tables_tool or describe_table_schema if the schema above lacks something you need
         4. Generate precise, efficient SQL queries
         5. Handle errors gracefully
         6. Provide clear explanations of your reasoning
 
         When solving a problem:
-        - First, list available tables using list_tables 
-        - Then, examine relevant table schemas using describe_table 
-        - Generate an appropriate SQL query
-        - Execute the query and interpret results using execute_query 
+        - Generate an appropriate SQL query from the schema
+        - Execute the query and interpret results using execute_sql_query 
         - Provide a human-readable answer
         """
 
@@ -72,21 +130,184 @@ class SqliteAgent:
         self.agent_executor = create_react_agent(
             model=self.llm,
             tools=self.tools,
-            prompt=self.system_message
+            prompt=self._agent_prompt
         )
 
-    def sql_agent_query(self, question: str) -> dict:
+    def _agent_prompt(self, state: dict) -> list:
+        """Build the system prompt per call; the snapshot is cached until PRAGMA schema_version changes."""
+        system_message = SystemMessage(content=self.system_message.format(schema=self.db.schema_snapshot()))
+        return [system_message] + state["messages"]
+
+    def fast_sql_query(self, question: str) -> dict:
+        """
+        Answer with a single LLM call: generate SQL, validate it locally, run it and fill in the answer.
+
+        Args:
+            question (str): Natural language question about the database
+
+        Returns:
+            dict: Same shape as sql_agent_query, plus the executed "sql"
+
+        Raises:
+            Exception: if the reply cannot be parsed, or the SQL fails validation or execution
+        """
+        prompt = [
+            SystemMessage(content=self.config.FAST_SQL_PROMPT.format(schema=self.db.schema_snapshot())),
+            HumanMessage(content=question)
+        ]
+        with tracer.span("sql.fast") as span:
+            reply = self.llm.invoke(prompt)
+            record_llm_call(reply)
+            sql, template = parse_fast_reply(reply.content)
+            self.db.validate_query(sql)
+            result = self.db.fetch(sql)
+            answer = render_answer(template, result.rows, result.truncated, self.config.SQL_ANSWER_MAX_ROWS)
+            span.set(rows=len(result.rows))
+        self.plan_cache.put(question, self.db.schema_version(), sql, template=template,
+                            answer=answer, data_version=self.db.data_version())
+        return {
+            "messages": [HumanMessage(content=question), AIMessage(content=answer)],
+            "path": "fast",
+            "llm_calls": 1,
+            "sql": sql,
+        }
+
+    def cached_sql_query(self, question: str) -> dict:
+        """
+        Answer a previously seen question without any LLM call, or return None.
+
+        If the data is unchanged the stored answer is returned as-is; otherwise the stored SQL is
+        re-run (through the result cache) and its answer template filled in again.
         """
-        Execute a SQL query using the ReAct agent
+        with tracer.span("sql.cache") as span:
+            plan = self.plan_cache.get(question, self.db.schema_version())
+            span.set(hit=plan is not None)
+            if plan is None:
+                return None
+            if plan["answer"] is not None and plan["data_version"] == self.db.data_version():
+                answer = plan["answer"]
+                span.set(answer_reused=True)
+            else:
+                try:
+                    result = self.db.fetch(plan["sql"])
+                except Exception as e:
+                    logging.info(f"Cached SQL plan failed, ignoring it: {e}")
+                    span.set(hit=False)
+                    return None
+                answer = render_answer(plan["template"] or self.config.SQL_CACHED_ANSWER_TEMPLATE,
+                                       result.rows, result.truncated, self.config.SQL_ANSWER_MAX_ROWS)
+        return {
+            "messages": [HumanMessage(content=question), AIMessage(content=answer)],
+            "path": "cache",
+            "llm_calls": 0,
+            "sql": plan["sql"],
+        }
+
+    def _remember_react_plan(self, question: str, messages: list) -> str:
+        """Cache the last SQL the ReAct agent ran successfully, with its final answer; returns that SQL."""
+        results = {m.tool_call_id: m for m in messages if isinstance(m, ToolMessage)}
+        for message in reversed(messages):
+            for call in reversed(getattr(message, "tool_calls", None) or []):
+                result = results.get(call["id"])
+                if (call["name"] == "execute_sql_query" and result is not None
+                        and not str(result.content).startswith("Error")):
+                    self.plan_cache.put(question, self.db.schema_version(), call["args"]["query"],
+                                        answer=messages[-1].content, data_version=self.db.data_version())
+                    return call["args"]["query"]
+        return None
+
+    @staticmethod
+    def _record_agent_calls(messages: list) -> int:
+        """Record each ReAct model reply, with its token usage, on the current span; returns their count."""
+        replies = [m for m in messages if isinstance(m, AIMessage)]
+        for reply in replies:
+            record_llm_call(reply)
+        return len(replies)
+
+    def cache_stats(self) -> dict:
+        return {"plan": self.plan_cache.stats(), "result": self.result_cache.stats()}
+
+    def sql_agent_query(self, question: str, mode: str = None) -> dict:
+        """
+        Execute a SQL query, trying the one-shot fast path first when mode is "fast"
 
         Args:
             question (str): Natural language question about the database
+            mode (str): "fast" to try fast_sql_query before the ReAct agent, "react" to skip it;
+                defaults to config.SQL_AGENT_MODE
 
         Returns:
-            dict: Agent's response with reasoning and answer
+            dict: Agent's response with reasoning and answer, plus "path" ("cache", "fast",
+                "react" or "fallback"), "llm_calls" and the "sql" that produced the answer (None if
+                no query succeeded)
+        """
+        cached = self.cached_sql_query(question)
+        if cached is not None:
+            return cached
+
+        failed_calls = 0
+        if (mode or self.config.SQL_AGENT_MODE) == "fast":
+            try:
+                return self.fast_sql_query(question)
+            except Exception as e:
+                logging.info(f"SQL fast path failed, falling back to ReAct agent: {e}")
+                failed_calls = 1
+
+        with tracer.span("sql.react") as span:
+            response = self.agent_executor.invoke({
+                "messages": [HumanMessage(content=question)]
+            })
+            agent_calls = self._record_agent_calls(response["messages"])
+            span.set(tool_calls=sum(isinstance(m, ToolMessage) for m in response["messages"]))
+        response["sql"] = self._remember_react_plan(question, response["messages"])
+        response["path"] = "fallback" if failed_calls else "react"
+        response["llm_calls"] = failed_calls + agent_calls
+        return response
+
+    def stream_sql_agent_query(self, question: str, mode: str = None) -> Iterator[str]:
         """
-        response = self.agent_executor.invoke({
-            "messages": [HumanMessage(content=question)]
-        })
-        
-        return response 
\ No newline at end of file
+        Stream the answer to a database question.
+
+        The fast path yields its answer in one piece; otherwise the ReAct agent runs and the tokens of
+        its final answer are streamed. Tool-calling steps are consumed silently, and once the stream
+        completes the agent's plan is cached as in sql_agent_query.
+
+        Args:
+            question (str): Natural language question about the database
+            mode (str): "fast" or "react", as in sql_agent_query
+
+        Yields:
+            str: Token deltas of the answer
+        """
+        cached = self.cached_sql_query(question)
+        if cached is not None:
+            yield cached["messages"][-1].content
+            return
+
+        if (mode or self.config.SQL_AGENT_MODE) == "fast":
+            try:
+                yield self.fast_sql_query(question)["messages"][-1].content
+                return
+            except Exception as e:
+                logging.info(f"SQL fast path failed, falling back to ReAct agent: {e}")
+
+        stream = self.agent_executor.stream(
+            {"messages": [HumanMessage(content=question)]},
+            stream_mode=["messages", "values"]
+        )
+        messages = None
+        for mode, payload in stream:
+            if mode == "values":
+                # The full agent state after each step; the last one holds the finished conversation
+                messages = payload["messages"]
+                continue
+            message, metadata = payload
+            # Streaming models emit AIMessageChunks; non-streaming ones a single AIMessage
+            if (metadata.get("langgraph_node") == "agent" and isinstance(message, AIMessage)
+                    and message.content and not message.tool_calls
+                    and not getattr(message, "tool_call_chunks", None)):
+                yield message.content
+        if messages:
+            self._record_agent_calls(messages)
+            self._remember_react_plan(question, messages)
+
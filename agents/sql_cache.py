@@ -0,0 +1,54 @@
+import re
+from typing import Optional
+from utils.lru_cache import LRUCache
+
+FILLER_WORDS = {"please", "kindly", "hey", "hi", "hello", "can", "could", "would", "you", "tell", "me", "show"}
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form used to match near-identical questions (case, punctuation, filler words)."""
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    while words and words[0] in FILLER_WORDS:
+        words.pop(0)
+    return " ".join(words)
+
+
+class SqlPlanCache:
+    """Level 1: normalized question -> the validated SQL that answered it.
+
+    Entries are keyed by the schema version so a schema change never replays stale SQL. The final
+    answer is kept alongside with the data version it was produced at, so an unchanged database can
+    return it verbatim.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.cache = LRUCache(max_size)
+
+    def get(self, question: str, schema_version: int) -> Optional[dict]:
+        return self.cache.get((normalize_question(question), schema_version))
+
+    def put(self, question: str, schema_version: int, sql: str, template: str = None,
+            answer: str = None, data_version: tuple = None):
+        self.cache.put((normalize_question(question), schema_version),
+                       {"sql": sql, "template": template, "answer": answer, "data_version": data_version})
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class SqlResultCache:
+    """Level 2: (SQL text, data version) -> QueryResult."""
+
+    def __init__(self, max_size: int = 256, max_rows: int = 1000):
+        self.cache = LRUCache(max_size)
+        self.max_rows = max_rows
+
+    def get(self, sql: str, data_version: tuple):
+        return self.cache.get((sql.strip(), data_version))
+
+    def put(self, sql: str, data_version: tuple, result):
+        if len(result.rows) <= self.max_rows:
+            self.cache.put((sql.strip(), data_version), result)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Iterable, List, NamedTuple, Optional
+from configs import Configs
+from utils.tracing import tracer, record_llm_call
+
+
+def is_rate_limit(error: Exception) -> bool:
+    """True for provider rate-limit errors (HTTP 429), without importing any provider SDK."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_s(error: Exception) -> Optional[float]:
+    """The Retry-After header of a rate-limit error's response, if it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Prepared(NamedTuple):
+    index: int
+    item: dict
+    started: float
+    standalone: str
+    summary: str
+    recent: list
+    use_context: bool
+
+
+class BatchChat:
+    """Answers many chat questions at once, for offline evaluation.
+
+    Questions are processed in chunks: the chunk's standalone queries are embedded in one batch
+    call, looked up in the semantic cache, and retrieved together (one matrix pass on the numpy
+    store, one multi-embedding query on chroma). LLM and embedding calls share one concurrency limit; a rate-limited call pauses every
+    new call until its Retry-After (or an exponential backoff) has passed, then retries. An
+    embedding or retrieval call that still fails fails only its chunk's questions. Answer calls of one chunk
+    overlap with the preparation of the next.
+    """
+
+    def __init__(self, chat_engine, embed_model, concurrency: int = Configs.BATCH_CONCURRENCY,
+                 chunk_size: int = Configs.BATCH_CHUNK_SIZE, max_retries: int = Configs.BATCH_MAX_RETRIES,
+                 backoff_s: float = Configs.BATCH_BACKOFF_S):
+        self.engine = chat_engine
+        self.embed_model = embed_model
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.rate_limited = 0
+        self.embedding_calls = 0
+        self._resume_at = 0.0
+        self._semaphore = None
+
+    async def _call(self, func: Callable[..., Awaitable], *args):
+        """Run one LLM-backed coroutine under the concurrency limit, retrying on rate limits."""
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                try:
+                    return await func(*args)
+                except Exception as e:
+                    if not is_rate_limit(e) or attempt == self.max_retries:
+                        raise
+                    self.rate_limited += 1
+                    wait = retry_after_s(e) or self.backoff_s * 2 ** attempt * (0.5 + random.random())
+                    self._resume_at = max(self._resume_at, time.monotonic() + wait)
+                    logging.warning(f"chat_batch: rate limited, retrying in {wait:.1f}s")
+
+    async def _prepare(self, item: dict) -> tuple:
+        """(standalone query, memory summary, recent messages) for one question."""
+        history = item.get("history") or []
+        standalone = await self._call(self.engine.rewriter.arewrite, item["query"], history)
+        summary, recent = await self._call(self.engine.new_memory().awindow, history)
+        return standalone, summary, recent
+
+    async def _answer(self, messages: list) -> str:
+        with tracer.span("llm.chat"):
+            response = await self._call(self.engine.llm.achat, messages)
+            record_llm_call(response)
+        return str(response).strip()
+
+    async def _run_chunk(self, chunk: List[tuple], use_context: bool, emit: Callable, pending: set):
+        with tracer.span("batch.chunk", questions=len(chunk)) as span:
+            prepared = await asyncio.gather(*(self._prepare(item) for _, item, _ in chunk), return_exceptions=True)
+            ready = []
+            for (index, item, started), prep in zip(chunk, prepared):
+                if isinstance(prep, Exception):
+                    emit(index, item, started, error=prep)
+                else:
+                    ready.append(_Prepared(index, item, started, *prep, item.get("use_context", use_context)))
+
+            # One embedding call for every standalone query that needs retrieval or a cache lookup
+            contextual = [entry for entry in ready if entry.use_context]
+            vectors = []
+            if contextual:
+                try:
+                    vectors = await self._call(self.embed_model.aget_text_embedding_batch,
+                                               [entry.standalone for entry in contextual])
+                    self.embedding_calls += 1
+                except Exception as e:
+                    # Fail this chunk's contextual questions, not the whole batch
+                    ready = self._fail(ready, contextual, e, emit)
+                    contextual = []
+            lookups = {}
+            for entry, vector in zip(contextual, vectors):
+                if self.engine.cache_applies(entry.item["query"], entry.standalone, entry.item.get("history"), True):
+                    lookups[entry.index] = self.engine.semantic_cache.lookup_vector(vector)
+
+            misses = [(entry, vector) for entry, vector in zip(contextual, vectors)
+                      if lookups.get(entry.index) is None or lookups[entry.index].answer is None]
+            nodes = {}
+            if misses:
+                try:
+                    results = await asyncio.to_thread(self.engine.retriever.retrieve_batch,
+                                                      [entry.standalone for entry, _ in misses],
+                                                      [vector for _, vector in misses])
+                    nodes = {entry.index: result for (entry, _), result in zip(misses, results)}
+                except Exception as e:
+                    ready = self._fail(ready, [entry for entry, _ in misses], e, emit)
+            span.set(cache_hits=len(contextual) - len(misses), retrieved=len(misses))
+
+            for entry in ready:
+                lookup = lookups.get(entry.index)
+                if lookup is not None and lookup.answer is not None:
+                    emit(entry.index, entry.item, entry.started, answer=lookup.answer, standalone=entry.standalone,
+                         cached=True)
+                    continue
+                messages = self.engine._history_messages(entry.summary, entry.recent)
+                messages = self.engine._append_query(messages, entry.standalone, nodes.get(entry.index))
+                task = asyncio.create_task(self._finish(entry, messages, lookup, emit))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+    @staticmethod
+    def _fail(ready: List[_Prepared], failed: List[_Prepared], error: Exception, emit: Callable) -> List[_Prepared]:
+        """Emit error for the failed entries; returns the rest of ready."""
+        for entry in failed:
+            emit(entry.index, entry.item, entry.started, error=error, standalone=entry.standalone)
+        failed_indexes = {entry.index for entry in failed}
+        return [entry for entry in ready if entry.index not in failed_indexes]
+
+    async def _finish(self, entry: _Prepared, messages: list, lookup, emit: Callable):
+        try:
+            answer = await self._answer(messages)
+        except Exception as e:
+            emit(entry.index, entry.item, entry.started, error=e, standalone=entry.standalone)
+            return
+        self.engine._cache_store(lookup, entry.standalone, answer)
+        emit(entry.index, entry.item, entry.started, answer=answer, standalone=entry.standalone, cached=False)
+
+    async def run(self, items: Iterable[dict], use_context: bool = True,
+                  on_result: Callable[[dict], None] = None) -> List[dict]:
+        """Answer every item ({"query", optional "history", "id", "use_context"}).
+
+        on_result is called with each result as soon as it is ready (completion order); the returned
+        list is in input order. A failed question yields a result with "error" instead of "answer".
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        items = list(items)
+        results: List[Optional[dict]] = [None] * len(items)
+
+        def emit(index: int, item: dict, started: float, error: Exception = None, **fields):
+            result = {"id": item.get("id", index), "query": item["query"], **fields,
+                      "latency_s": time.perf_counter() - started}
+            if error is not None:
+                result["error"] = f"{type(error).__name__}: {error}"
+            results[index] = result
+            if on_result is not None:
+                on_result(result)
+
+        pending = set()
+        with tracer.span("generator.chat_batch", questions=len(items)) as span:
+            for start in range(0, len(items), self.chunk_size):
+                # Keep at most about two chunks of answers in flight while preparing the next one
+                while len(pending) >= 2 * self.chunk_size:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                now = time.perf_counter()
+                chunk = [(i, items[i], now) for i in range(start, min(start + self.chunk_size, len(items)))]
+                await self._run_chunk(chunk, use_context, emit, pending)
+            if pending:
+                await asyncio.wait(pending)
+            span.set(rate_limited=self.rate_limited, embedding_calls=self.embedding_calls)
+        return results
+
+
+def read_questions(path: str) -> List[dict]:
+    """Questions from a JSONL file; an item without "id" is identified by its line number."""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"query": item}
+            item.setdefault("id", number)
+            items.append(item)
+    return items
+
+
+def completed_ids(path: str) -> set:
+    """Ids already answered in an output file; a torn last line (interrupted write) is dropped."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    done = set()
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "error" not in record:
+            done.add(record["id"])
+    return done
+
+
+def run_batch(generator, input_path: str, output_path: str, use_context: bool = True,
+              concurrency: int = Configs.BATCH_CONCURRENCY, resume: bool = True) -> dict:
+    """Answer a JSONL file of questions into a JSONL file, one line per answer as it completes.
+
+    With resume, questions whose ids already have an answer in output_path are skipped, so an
+    interrupted run picks up where it stopped. Failed questions are written with an "error" field
+    and retried by the next resumed run.
+    """
+    items = read_questions(input_path)
+    done = completed_ids(output_path) if resume else set()
+    todo = [item for item in items if item["id"] not in done]
+    logging.info(f"chat_batch: {len(todo)} of {len(items)} questions to answer ({len(done)} already done)")
+
+    counts = {"answered": 0, "cached": 0, "failed": 0}
+    start = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        def write(result: dict):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            counts["failed" if "error" in result else "cached" if result.get("cached") else "answered"] += 1
+
+        generator.chat_batch(todo, use_context=use_context, concurrency=concurrency, on_result=write)
+        out.flush()
+        os.fsync(out.fileno())
+    elapsed = time.perf_counter() - start
+    return {"questions": len(items), "skipped": len(done), **counts, "seconds": elapsed,
+            "questions_per_s": len(todo) / elapsed if elapsed else 0.0}
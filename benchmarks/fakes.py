@@ -0,0 +1,196 @@
+"""Deterministic local stand-ins for OpenAI, OpenAIEmbedding and ChatOpenAI.
+
+Each fake sleeps for a configurable latency and counts its calls, so benchmarks can measure
+the pipeline's own overhead and the number of model round-trips without network access.
+"""
+import asyncio
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.base.llms.generic_utils import completion_response_to_chat_response
+from llama_index.core.llms import (ChatMessage, ChatResponse, CompletionResponse, CompletionResponseGen, CustomLLM,
+                                  LLMMetadata)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+VOCABULARY = (
+    "data model training inference latency throughput vector index query retrieval embedding token "
+    "context window prompt answer document chunk cache memory database table order product staff "
+    "customer price revenue pipeline batch stream request response network storage compute cluster"
+).split()
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _stable_hash(text: str) -> int:
+    # Python's hash() is salted per process; crc32 keeps outputs identical across runs
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class _CallCounter:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.calls += 1
+
+
+class FakeLLM(CustomLLM):
+    """llama_index LLM that echoes the tail of the prompt padded to response_tokens words."""
+
+    latency_s: float = 0.0
+    token_latency_s: float = 0.0
+    response_tokens: int = 60
+    _counter: _CallCounter = PrivateAttr(default_factory=_CallCounter)
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=128_000, num_output=self.response_tokens, model_name="fake-llm")
+
+    @property
+    def calls(self) -> int:
+        return self._counter.calls
+
+    def _response(self, prompt: str) -> List[str]:
+        words = _words(prompt.strip().splitlines()[-1] if prompt.strip() else "")[:self.response_tokens // 2]
+        seed = _stable_hash(prompt)
+        while len(words) < self.response_tokens:
+            seed = (seed * 1103515245 + 12345) & 0x7FFFFFFF
+            words.append(VOCABULARY[seed % len(VOCABULARY)])
+        return words
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        self._counter.increment()
+        words = self._response(prompt)
+        time.sleep(self.latency_s + self.token_latency_s * len(words))
+        return CompletionResponse(text=" ".join(words))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        self._counter.increment()
+        words = self._response(prompt)
+
+        def gen() -> CompletionResponseGen:
+            time.sleep(self.latency_s)
+            text = ""
+            for i, word in enumerate(words):
+                time.sleep(self.token_latency_s)
+                delta = word if i == 0 else " " + word
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+        return gen()
+
+    # CustomLLM's async methods call the blocking ones; these sleep on the event loop instead,
+    # so async callers (Generator.achat, the HTTP server) see realistic concurrency.
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        self._counter.increment()
+        words = self._response(prompt)
+        await asyncio.sleep(self.latency_s + self.token_latency_s * len(words))
+        return CompletionResponse(text=" ".join(words))
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        return completion_response_to_chat_response(await self.acomplete(prompt, formatted=True, **kwargs))
+
+
+class FakeEmbedding(BaseEmbedding):
+    """Hashed bag-of-words embeddings: texts sharing words get similar vectors, so retrieval is meaningful."""
+
+    dim: int = 256
+    latency_s: float = 0.0
+    _counter: _CallCounter = PrivateAttr(default_factory=_CallCounter)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    @property
+    def calls(self) -> int:
+        return self._counter.calls
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in _words(text):
+            h = _stable_hash(word)
+            vector[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._counter.increment()
+        time.sleep(self.latency_s)
+        return [self._vector(text) for text in texts]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._counter.increment()
+        await asyncio.sleep(self.latency_s)
+        return [self._vector(text) for text in texts]
+
+
+class FakeChatModel(BaseChatModel):
+    """langchain chat model that answers SQL questions from a fixed question -> SQL table.
+
+    Replies in the fast-path format when given the one-shot prompt; otherwise behaves like a
+    ReAct agent: one execute_sql_query tool call, then a final answer built from the tool output.
+    """
+
+    queries: Dict[str, str]
+    latency_s: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "FakeChatModel":
+        return self
+
+    def _sql_for(self, messages: List[BaseMessage]) -> Optional[str]:
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        wanted = " ".join(_words(question))
+        return next((sql for q, sql in self.queries.items() if " ".join(_words(q)) == wanted), None)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency_s)
+        sql = self._sql_for(messages)
+        one_shot = any(isinstance(m, SystemMessage) and "SQL:" in m.content for m in messages)
+        if one_shot:
+            message = AIMessage(content=f"SQL: {sql}\nANSWER: The answer is {{result}}." if sql else "SQL: NONE")
+        elif isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=f"The query returned: {messages[-1].content[:500]}")
+        elif sql:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "execute_sql_query", "args": {"query": sql}, "id": f"call_{self.calls}"}])
+        else:
+            message = AIMessage(content="I cannot answer that from this database.")
+        # Word counts stand in for the token usage a provider would report
+        prompt_tokens = sum(len(_words(str(m.content))) for m in messages)
+        completion_tokens = len(_words(message.content))
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                  "total_tokens": prompt_tokens + completion_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
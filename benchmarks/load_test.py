@@ -0,0 +1,200 @@
+"""Load test for the HTTP service (server.py), run in-process against the local model fakes.
+
+Usage:
+    python -m benchmarks.load_test --requests 2000 --concurrency 128 --llm-latency 0.2 --output load_results.json
+
+Starts the server on a free local port, fires a mix of chat / SQL / routed / streaming requests from
+--concurrency concurrent clients spread over --sessions conversations, then shuts the server down
+gracefully. Reports throughput, latency percentiles per endpoint, 429 counts and shutdown time.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import tempfile
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.run_benchmarks import (CHAT_TURNS, SQL_QUESTIONS, TOPICS, fake_generator, git_revision,
+                                       latency_stats, max_rss_mb, workdir_config, write_documents)
+from db.bulk_import import BulkImporter, generate_synthetic
+from server import ChatServer
+
+ENDPOINTS = ("/chat", "/sql", "/answer", "/chat/stream", "/answer/stream")
+
+
+def parse_mix(text: str) -> dict:
+    """'chat=6,sql=3' -> {'/chat': 6.0, '/sql': 3.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        path = "/" + name.strip().replace(".", "/")
+        if path not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; choose from {ENDPOINTS}")
+        mix[path] = float(weight)
+    return mix
+
+
+def build_requests(args) -> list:
+    rng = random.Random(args.seed)
+    paths, weights = zip(*args.mix.items())
+    requests = []
+    for i in range(args.requests):
+        path = rng.choices(paths, weights)[0]
+        if path.startswith("/sql") or (path.startswith("/answer") and rng.random() < 0.5):
+            query = rng.choice(list(SQL_QUESTIONS))
+        else:
+            query = rng.choice(CHAT_TURNS).format(topic=rng.choice(TOPICS))
+        requests.append((path, {"query": query, "session_id": f"load-{i % args.sessions}"}))
+    return requests
+
+
+async def send(client: aiohttp.ClientSession, base_url: str, path: str, body: dict) -> dict:
+    start = time.perf_counter()
+    first_byte_s = None
+    try:
+        async with client.post(base_url + path, json=body) as response:
+            if path.endswith("/stream") and response.status == 200:
+                async for _ in response.content.iter_any():
+                    if first_byte_s is None:
+                        first_byte_s = time.perf_counter() - start
+            else:
+                await response.read()
+            status = response.status
+    except aiohttp.ClientError as e:
+        status = type(e).__name__
+    return {"path": path, "status": status, "latency_s": time.perf_counter() - start, "first_byte_s": first_byte_s}
+
+
+async def run_load(base_url: str, requests: list, concurrency: int) -> tuple:
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    results = []
+    # A conversation waits for its previous answer, as a user would; the server rejects overlapping turns
+    turns = {body["session_id"]: asyncio.Lock() for _, body in requests}
+
+    async def client_loop(client):
+        while not queue.empty():
+            path, body = queue.get_nowait()
+            async with turns[body["session_id"]]:
+                results.append(await send(client, base_url, path, body))
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=300)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def summarize(results: list, wall_s: float) -> dict:
+    summary = {
+        "requests": len(results),
+        "wall_s": wall_s,
+        "throughput_rps": sum(r["status"] == 200 for r in results) / wall_s,
+        "status": dict(Counter(str(r["status"]) for r in results)),
+        "endpoints": {},
+    }
+    for path in sorted({r["path"] for r in results}):
+        ok = [r for r in results if r["path"] == path and r["status"] == 200]
+        entry = {
+            "status": dict(Counter(str(r["status"]) for r in results if r["path"] == path)),
+            "latency": latency_stats([r["latency_s"] for r in ok]),
+        }
+        if path.endswith("/stream"):
+            entry["first_byte"] = latency_stats([r["first_byte_s"] for r in ok if r["first_byte_s"] is not None])
+        summary["endpoints"][path] = entry
+    return summary
+
+
+async def load_test(args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="genai-load-") as workdir:
+        config = workdir_config(workdir)
+        config.SEMANTIC_CACHE_ENABLED = args.semantic_cache
+        config.SERVER_CHAT_CONCURRENCY = args.chat_concurrency
+        config.SERVER_SQL_CONCURRENCY = args.sql_concurrency
+        config.SERVER_MAX_QUEUE = args.max_queue
+        generator = fake_generator(workdir, args, config)
+
+        write_documents(config.NEW_DOCUMENTS_DIR, args.docs, 600, args.seed)
+        generator.vector_db.process_new_documents()
+        importer = BulkImporter(config.SQLITE_DB_DIR)
+        generate_synthetic(importer, 500, 50, args.sql_orders, args.seed)
+        importer.close()
+
+        server = ChatServer(generator, config)
+        runner = web.AppRunner(server.build_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        base_url = f"http://{host}:{port}"
+
+        results, wall_s = await run_load(base_url, build_requests(args), args.concurrency)
+        summary = summarize(results, wall_s)
+        summary["server"] = {name: limiter.stats() for name, limiter in server.limiters.items()}
+        summary["sessions"] = len(server.sessions)
+
+        # Graceful shutdown with requests still in flight
+        burst_client = aiohttp.ClientSession()
+        burst = [asyncio.create_task(send(burst_client, base_url, "/chat", {
+            "query": CHAT_TURNS[0].format(topic=TOPICS[i % len(TOPICS)]), "session_id": f"shutdown-{i}"}))
+            for i in range(args.concurrency)]
+        deadline = time.monotonic() + 5
+        while not any(limiter.busy for limiter in server.limiters.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        await runner.cleanup()
+        shutdown_s = time.perf_counter() - start
+        in_flight = await asyncio.gather(*burst)
+        await burst_client.close()
+        summary["shutdown"] = {"seconds": shutdown_s,
+                               "in_flight_status": dict(Counter(str(r["status"]) for r in in_flight))}
+        summary["memory"] = max_rss_mb()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent client connections")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=4,sql=2,answer=2,chat.stream=1,answer.stream=1"))
+    parser.add_argument("--chat-concurrency", type=int, default=32)
+    parser.add_argument("--sql-concurrency", type=int, default=None, help="default: SQLITE_POOL_SIZE")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--semantic-cache", action="store_true", help="keep the semantic answer cache on")
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--sql-orders", type=int, default=20_000)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embedding batch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    summary = asyncio.run(load_test(args))
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parameters": {**vars(args), "mix": args.mix},
+        "results": summary,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({key: summary[key] for key in ("throughput_rps", "status", "shutdown")}, indent=2))
+    for path, entry in summary["endpoints"].items():
+        latency = entry["latency"]
+        if latency["count"]:
+            print(f"{path:<15} p50 {latency['p50_s']:.3f}s  p99 {latency['p99_s']:.3f}s  {entry['status']}")
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
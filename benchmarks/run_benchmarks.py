@@ -0,0 +1,294 @@
+"""Offline benchmarks for ingestion, retrieval, chat and SQL, using the local model fakes.
+
+Usage:
+    python -m benchmarks.run_benchmarks --docs 200 --llm-latency 0.05 --output benchmark_results.json
+
+Everything runs in a temporary directory; results (latency percentiles, model call counts and
+memory high-water marks per stage) are written as JSON so runs can be compared across commits.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+from benchmarks.fakes import FakeChatModel, FakeEmbedding, FakeLLM, VOCABULARY
+from configs import Configs
+from db.bulk_import import BulkImporter, generate_synthetic
+from generator import Generator
+
+TOPICS = ["machine learning", "vector databases", "query planning", "caching strategies", "stream processing",
+          "distributed storage", "model serving", "observability", "cost optimization", "data privacy"]
+
+CHAT_TURNS = [
+    "What is {topic}?",
+    "How does it affect latency?",
+    "Can you give an example?",
+    "What are the trade-offs compared to the alternatives?",
+    "Summarize the key points about {topic}.",
+]
+
+SQL_QUESTIONS = {
+    "How many orders are there?": "SELECT COUNT(*) FROM orders",
+    "How many orders did staff member 1 handle?": "SELECT COUNT(*) FROM orders WHERE staff_id = 1",
+    "What is the most expensive product?": "SELECT product_name, price FROM products ORDER BY price DESC LIMIT 1",
+    "Which staff member handled the most orders?":
+        "SELECT s.first_name, s.last_name, COUNT(*) AS n FROM orders o JOIN staff s ON s.staff_id = o.staff_id "
+        "GROUP BY o.staff_id ORDER BY n DESC LIMIT 1",
+    "What is the total revenue?":
+        "SELECT ROUND(SUM(p.price), 2) FROM orders o JOIN products p ON p.product_id = o.product_id",
+    "List the five cheapest products.": "SELECT product_name, price FROM products ORDER BY price LIMIT 5",
+}
+
+
+def latency_stats(samples: list) -> dict:
+    values = np.asarray(samples, dtype=float)
+    if not len(values):
+        return {"count": 0}
+    return {
+        "count": int(len(values)),
+        "mean_s": float(values.mean()),
+        "p50_s": float(np.percentile(values, 50)),
+        "p90_s": float(np.percentile(values, 90)),
+        "p99_s": float(np.percentile(values, 99)),
+        "max_s": float(values.max()),
+    }
+
+
+def max_rss_mb() -> dict:
+    """Process high-water marks so far (Linux reports ru_maxrss in KiB, macOS in bytes)."""
+    scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024
+    return {
+        "self_max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children_max_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+@contextmanager
+def stage(results: dict, name: str, trace_memory: bool):
+    """Record wall time, memory high-water marks and (optionally) the Python heap peak of a stage."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    entry = results.setdefault(name, {})
+    try:
+        yield entry
+    finally:
+        entry["wall_s"] = time.perf_counter() - start
+        if trace_memory:
+            entry["python_heap_peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        entry["memory"] = max_rss_mb()
+        logging.info(f"benchmark {name}: {entry['wall_s']:.2f}s")
+
+
+def write_documents(directory: str, count: int, words_per_doc: int, seed: int):
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        sentences = []
+        for _ in range(max(1, words_per_doc // 12)):
+            words = rng.choices(VOCABULARY, k=10)
+            sentences.append(f"{topic.capitalize()} {' '.join(words)}.")
+        with open(os.path.join(directory, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Document {i} about {topic}.\n\n" + " ".join(sentences))
+
+
+def workdir_config(workdir: str) -> Configs:
+    """Configs with every on-disk path moved under workdir.
+
+    Generator passes it to the subsystems it builds; WRITE_LOGS is process-wide, so it is turned
+    off on the Configs class itself.
+    """
+    Configs.WRITE_LOGS = False
+    config = Configs()
+    config.VECTOR_DB_DIR = os.path.join(workdir, "chroma_db")
+    config.NEW_DOCUMENTS_DIR = os.path.join(workdir, "documents", "new")
+    config.PROCESSED_DOCUMENTS_DIR = os.path.join(workdir, "documents", "processed")
+    config.FAILED_DOCUMENTS_DIR = os.path.join(workdir, "documents", "failed")
+    config.INGEST_MANIFEST_PATH = os.path.join(workdir, "chroma_db", "ingestion_manifest.json")
+    config.EMBEDDING_CACHE_PATH = os.path.join(workdir, "embedding_cache.db")
+    config.NUMPY_INDEX_DIR = os.path.join(workdir, "numpy_index")
+    config.SQLITE_DB_DIR = os.path.join(workdir, "sqlite_data.db")
+    return config
+
+
+def fake_generator(workdir: str, args, config: Configs = None) -> Generator:
+    """Generator on the local fakes, with latencies taken from the --*-latency arguments."""
+    return Generator(
+        config=config or workdir_config(workdir),
+        llm=FakeLLM(latency_s=args.llm_latency, token_latency_s=args.token_latency),
+        embed_model=FakeEmbedding(latency_s=args.embed_latency),
+        sql_llm=FakeChatModel(queries=SQL_QUESTIONS, latency_s=args.llm_latency),
+    )
+
+
+def bench_ingestion(generator: Generator, entry: dict, args):
+    write_documents(generator.config.NEW_DOCUMENTS_DIR, args.docs, args.words_per_doc, args.seed)
+    embed_calls = generator._base_embed_model.calls
+    start = time.perf_counter()
+    generator.vector_db.process_new_documents()
+    elapsed = time.perf_counter() - start
+    chunks = generator.vector_db.collection.count()
+    entry.update({
+        "documents": args.docs,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "docs_per_s": args.docs / elapsed,
+        "chunks_per_s": chunks / elapsed,
+        "embedding_calls": generator._base_embed_model.calls - embed_calls,
+    })
+
+
+def bench_retrieval(generator: Generator, entry: dict, args):
+    rng = random.Random(args.seed)
+    queries = [f"{rng.choice(TOPICS)} {' '.join(rng.choices(VOCABULARY, k=4))}" for _ in range(args.queries)]
+    generator.retriever.retrieve(queries[0])  # warm-up: index load
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        generator.retriever.retrieve(query)
+        samples.append(time.perf_counter() - start)
+    entry.update({"latency": latency_stats(samples), "top_k": Configs.SIMILARITY_TOP_K})
+
+
+def bench_chat(generator: Generator, entry: dict, args):
+    llm = generator.llm
+    samples, calls = [], []
+    for conversation in range(args.conversations):
+        topic = TOPICS[conversation % len(TOPICS)]
+        history, memory = [], generator.new_memory()
+        for turn in CHAT_TURNS[:args.turns]:
+            query = turn.format(topic=topic)
+            before = llm.calls
+            start = time.perf_counter()
+            response = generator.chat(query, history, memory=memory)
+            samples.append(time.perf_counter() - start)
+            calls.append(llm.calls - before)
+            history += [{"role": "user", "content": query}, {"role": "assistant", "content": response}]
+    # Packing stats of the last turn's retrieval, recomputed outside the timed requests
+    _, context_stats = generator.retriever.format_context(generator.retriever.retrieve(query))
+    entry.update({
+        "latency": latency_stats(samples),
+        "llm_calls_per_request": {"mean": float(np.mean(calls)), "max": int(max(calls)), "total": int(sum(calls))},
+        "context": context_stats,
+        "rewrite_cache": generator.chat_engine.rewriter.stats(),
+        "semantic_cache": generator.semantic_cache.stats() if generator.semantic_cache else None,
+    })
+
+
+def bench_batch(generator: Generator, entry: dict, args):
+    rng = random.Random(args.seed + 1)
+    items = [{"query": f"{rng.choice(CHAT_TURNS[:1]).format(topic=rng.choice(TOPICS))} "
+                       f"{' '.join(rng.choices(VOCABULARY, k=3))}"} for _ in range(args.queries)]
+    llm_calls, embed_calls = generator.llm.calls, generator._base_embed_model.calls
+    start = time.perf_counter()
+    results = generator.chat_batch(items, concurrency=args.batch_concurrency)
+    elapsed = time.perf_counter() - start
+    entry.update({
+        "questions": len(items),
+        "seconds": elapsed,
+        "questions_per_s": len(items) / elapsed,
+        "failed": sum("error" in r for r in results),
+        "llm_calls": generator.llm.calls - llm_calls,
+        "embedding_calls": generator._base_embed_model.calls - embed_calls,
+        "latency": latency_stats([r["latency_s"] for r in results]),
+    })
+
+
+def bench_sql(generator: Generator, entry: dict, args):
+    importer = BulkImporter(generator.config.SQLITE_DB_DIR)
+    generate_synthetic(importer, args.sql_products, args.sql_staff, args.sql_orders, args.seed)
+    importer.close()
+
+    agent = generator.sql_agent
+    for run in ("cold", "warm"):
+        samples, calls = [], []
+        for question in SQL_QUESTIONS:
+            before = agent.llm.calls
+            start = time.perf_counter()
+            generator.sql_query(question)
+            samples.append(time.perf_counter() - start)
+            calls.append(agent.llm.calls - before)
+        entry[run] = {
+            "latency": latency_stats(samples),
+            "llm_calls_per_request": {"mean": float(np.mean(calls)), "max": int(max(calls)), "total": int(sum(calls))},
+        }
+    entry.update({"orders": args.sql_orders, "mode": Configs.SQL_AGENT_MODE, "cache": agent.cache_stats()})
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+STAGES = {
+    "ingestion": bench_ingestion,
+    "retrieval": bench_retrieval,
+    "chat": bench_chat,
+    "batch": bench_batch,
+    "sql": bench_sql,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--words-per-doc", type=int, default=1500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--conversations", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=len(CHAT_TURNS))
+    parser.add_argument("--batch-concurrency", type=int, default=Configs.BATCH_CONCURRENCY)
+    parser.add_argument("--sql-products", type=int, default=1_000)
+    parser.add_argument("--sql-staff", type=int, default=100)
+    parser.add_argument("--sql-orders", type=int, default=100_000)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embedding batch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="also record tracemalloc heap peaks (slower)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="genai-bench-") as workdir:
+        generator = fake_generator(workdir, args)
+        for name in STAGES:
+            if name in args.stages:
+                with stage(results, name, args.trace_memory) as entry:
+                    STAGES[name](generator, entry, args)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "startup_s": dict(generator.startup_timings),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({name: {k: v for k, v in entry.items() if k in ("wall_s", "latency", "docs_per_s", "questions_per_s", "cold")}
+                      for name, entry in results.items()}, indent=2))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
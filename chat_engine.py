@@ -2,53 +2,185 @@ from llama_index.llms.openai import OpenAI
 from llama_index.core.llms import ChatMessage
 from configs import Configs
 from retriever import Retriever
+from query_rewriter import QueryRewriter
+from conversation_memory import ConversationMemory
+from semantic_cache import SemanticCache, CacheLookup
+from utils.tracing import tracer, record_llm_call
+import asyncio
 import logging
+import re
+from typing import Iterator, Optional
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the lower-cased word sets of two queries."""
+    words_a, words_b = set(re.findall(r"\w+", a.lower())), set(re.findall(r"\w+", b.lower()))
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
 
 class ChatEngine:
-    def __init__(self, llm: OpenAI, retriever: Retriever):
+    def __init__(self, llm: OpenAI, retriever: Retriever, semantic_cache: SemanticCache = None,
+                 config: Configs = None):
         self.llm = llm
         self.retriever = retriever
-        self.system_prompt = Configs.SYSTEM_PROMPT
+        self.semantic_cache = semantic_cache
+        self.config = config or Configs()
+        self.system_prompt = self.config.SYSTEM_PROMPT
+        self.rewriter = QueryRewriter(llm, cache_size=self.config.REWRITE_CACHE_SIZE)
         logging.basicConfig(level=Configs.LOG_LEVEL)
 
-    def _rewrite_query_with_history(self, query: str, history: list, context_window: int = 5) -> str:
-        if not history:
-            return query
-        recent_history = history[-context_window:]
-        chat_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_history])
-        formatted_template = Configs.REWRITE_QUERY_TEMPLATE.format(chat_history=chat_history, question=query)
-        rewrite_prompt = [
-            ChatMessage(role="system", content=Configs.REWRITE_QUERY_PROMPT),
-            ChatMessage(role="user", content=formatted_template)
-        ]
-        response = self.llm.chat(rewrite_prompt)
-        return str(response).strip()
-
-    def _format_messages(self, query: str, history: list, use_context: bool) -> list:
-        messages = [ChatMessage(role="system", content=self.system_prompt)]  
-        for msg in history:
+    def new_memory(self) -> ConversationMemory:
+        return ConversationMemory(self.llm, self.config.MEMORY_TOKEN_BUDGET, self.config.MEMORY_RECENT_TURNS,
+                                  self.config.MEMORY_SUMMARY_MAX_TOKENS)
+
+    def _history_messages(self, summary: str, recent: list) -> list:
+        messages = [ChatMessage(role="system", content=self.system_prompt)]
+        if summary:
+            messages.append(ChatMessage(role="system", content=Configs.CONVERSATION_SUMMARY_TEMPLATE.format(summary=summary)))
+        for msg in recent:
             role = "user" if msg["role"] == "user" else "assistant"
             messages.append(ChatMessage(role=role, content=msg["content"]))
-        if len(history) > 1:
-            query = self._rewrite_query_with_history(query, history)
-            if Configs.WRITE_LOGS:
-                logging.info(f"rewrite_query_with_history: {query}")             
-
-        if use_context:
-            nodes = self.retriever.retrieve(query)
-            context = self.retriever.format_context(nodes)
+        return messages
+
+    def _append_query(self, messages: list, query: str, nodes: list = None) -> list:
+        if nodes is not None:
+            context, _ = self.retriever.format_context(nodes)
             query = f"{context}\n\nQuestion: {query}"
         messages.append(ChatMessage(role="user", content=query))
         return messages
 
-    def chat(self, query: str, history: list = None, use_context: bool = True) -> str:
+    def cache_applies(self, query: str, standalone: str, history: list, use_context: bool) -> bool:
+        """Whether an answer may be cached under the standalone query alone.
+
+        Entries are keyed on the standalone query. First questions and follow-ups the rewrite gate
+        judges standalone qualify; a follow-up the LLM rewrite returned unchanged may still lean on
+        earlier turns and bypasses the cache.
+        """
+        if self.semantic_cache is None or not use_context:
+            return False
+        if not self.rewriter.needs_rewrite(query, history or []):
+            return True
+        return standalone.strip() != query.strip()
+
+    def _cache_lookup(self, query: str, standalone: str, history: list,
+                      use_context: bool) -> Optional[CacheLookup]:
+        """Semantic cache lookup for a standalone query; None when the cache does not apply."""
+        if not self.cache_applies(query, standalone, history, use_context):
+            return None
+        with tracer.span("chat.semantic_cache") as span:
+            lookup = self.semantic_cache.lookup(standalone)
+            span.set(hit=lookup.answer is not None, similarity=lookup.similarity)
+        return lookup
+
+    async def _acache_lookup(self, query: str, standalone: str, history: list,
+                             use_context: bool) -> Optional[CacheLookup]:
+        if not self.cache_applies(query, standalone, history, use_context):
+            return None
+        with tracer.span("chat.semantic_cache") as span:
+            lookup = await self.semantic_cache.alookup(standalone)
+            span.set(hit=lookup.answer is not None, similarity=lookup.similarity)
+        return lookup
+
+    def _cache_store(self, lookup: Optional[CacheLookup], query: str, answer: str):
+        if lookup is not None:
+            self.semantic_cache.store(lookup, query, answer)
+
+    def _format_messages(self, query: str, history: list, use_context: bool, memory: ConversationMemory) -> list:
+        """Prompt messages for an already rewritten (standalone) query."""
+        messages = self._history_messages(*memory.window(history))
+
+        nodes = self.retriever.retrieve(query) if use_context else None
+        return self._append_query(messages, query, nodes)
+
+    async def _aformat_messages(self, query: str, history: list, use_context: bool,
+                                memory: ConversationMemory) -> tuple:
+        """Async _format_messages that retrieves on the raw query while the rewrite is in flight.
+
+        A second retrieval runs only if the rewritten query differs meaningfully from the raw one;
+        the two result sets are then merged. Memory folding runs alongside the rewrite.
+
+        Returns (messages, rewritten query, semantic cache lookup); messages is None on a cache hit.
+        """
+        speculative = asyncio.create_task(self.retriever.aretrieve(query)) if use_context else None
+        try:
+            (summary, recent), rewritten = await asyncio.gather(
+                memory.awindow(history), self.rewriter.arewrite(query, history))
+            lookup = await self._acache_lookup(query, rewritten, history, use_context)
+            if lookup is not None and lookup.answer is not None:
+                return None, rewritten, lookup
+            messages = self._history_messages(summary, recent)
+
+            nodes = None
+            if use_context:
+                nodes = await speculative
+                if query_similarity(query, rewritten) < self.config.REWRITE_RETRIEVAL_SIMILARITY:
+                    nodes = self.retriever.merge_results(nodes, await self.retriever.aretrieve(rewritten))
+        finally:
+            if speculative is not None and not speculative.done():
+                speculative.cancel()
+        return self._append_query(messages, rewritten, nodes), rewritten, lookup
+
+    def chat(self, query: str, history: list = None, use_context: bool = True,
+             memory: ConversationMemory = None) -> str:
         history = history or []
-        messages = self._format_messages(query, history, use_context)
+        standalone = self.rewriter.rewrite(query, history)
+        lookup = self._cache_lookup(query, standalone, history, use_context)
+        if lookup is not None and lookup.answer is not None:
+            return lookup.answer
+        messages = self._format_messages(standalone, history, use_context, memory or self.new_memory())
 
         if Configs.WRITE_LOGS:
             logging.info(f"================================================================================\n") 
             logging.info(f"User query: {query}") 
             # logging.info(f"Message to LLM : {messages[-1]}")            
 
-        response = self.llm.chat(messages)
-        return str(response).strip()
+        with tracer.span("llm.chat"):
+            response = self.llm.chat(messages)
+            record_llm_call(response)
+        answer = str(response).strip()
+        self._cache_store(lookup, standalone, answer)
+        return answer
+
+    async def achat(self, query: str, history: list = None, use_context: bool = True,
+                    memory: ConversationMemory = None) -> str:
+        """Async chat; lets one process serve many conversations without a thread per request."""
+        history = history or []
+        messages, standalone, lookup = await self._aformat_messages(
+            query, history, use_context, memory or self.new_memory())
+        if messages is None:
+            return lookup.answer
+
+        if Configs.WRITE_LOGS:
+            logging.info(f"================================================================================\n")
+            logging.info(f"User query (async): {query}")
+
+        with tracer.span("llm.chat"):
+            response = await self.llm.achat(messages)
+            record_llm_call(response)
+        answer = str(response).strip()
+        self._cache_store(lookup, standalone, answer)
+        return answer
+
+    def stream_chat(self, query: str, history: list = None, use_context: bool = True,
+                    memory: ConversationMemory = None) -> Iterator[str]:
+        """Same as chat, but yields the answer as token deltas while it is generated."""
+        history = history or []
+        standalone = self.rewriter.rewrite(query, history)
+        lookup = self._cache_lookup(query, standalone, history, use_context)
+        if lookup is not None and lookup.answer is not None:
+            yield lookup.answer
+            return
+        messages = self._format_messages(standalone, history, use_context, memory or self.new_memory())
+
+        if Configs.WRITE_LOGS:
+            logging.info(f"================================================================================\n")
+            logging.info(f"User query (stream): {query}")
+
+        record_llm_call()
+        parts = []
+        for chunk in tracer.iterate("llm.stream", self.llm.stream_chat(messages)):
+            if chunk.delta:
+                parts.append(chunk.delta)
+                yield chunk.delta
+        self._cache_store(lookup, standalone, "".join(parts).strip())
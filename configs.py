@@ -1,11 +1,85 @@
 class Configs():
     LOG_LEVEL="INFO"
     WRITE_LOGS=True
+    TRACE_SAMPLE_RATE=0.1  # share of requests whose spans are exported; metrics cover all requests
+    TRACE_JSONL_PATH=None  # e.g. './PIPELINE_DOCS/traces.jsonl' to export sampled spans as JSONL
+    METRICS_PORT=None  # e.g. 9100 to serve Prometheus metrics at /metrics
+    SERVER_HOST="0.0.0.0"
+    SERVER_PORT=8080
+    SERVER_CHAT_CONCURRENCY=32  # LLM chat requests in flight at once
+    SERVER_SQL_CONCURRENCY=None  # SQL agent runs in flight; None means SQLITE_POOL_SIZE, which it must not exceed
+    SERVER_MAX_QUEUE=64  # requests waiting per backend before new ones are rejected with 429
+    SERVER_QUEUE_TIMEOUT_S=30
+    SERVER_MAX_SESSIONS=10_000
+    SERVER_SHUTDOWN_TIMEOUT_S=30  # how long shutdown waits for in-flight requests
+    SERVER_WARMUP=True
 
     PROCESSED_DOCUMENTS_DIR= './documents/processed' 
     NEW_DOCUMENTS_DIR= './documents/new' 
+    FAILED_DOCUMENTS_DIR= './documents/failed'  # new documents that could not be parsed are moved here
     VECTOR_DB_DIR= './chroma_db'
+    VECTOR_BACKEND= 'chroma'  # 'chroma' or 'numpy'
+    NUMPY_INDEX_DIR= './numpy_index'
+    VECTOR_QUANTIZATION= 'none'  # 'none', 'int8' or 'binary'
     SQLITE_DB_DIR = "./db/sqlite_data.db"
+    SQLITE_WAL = True  # journal mode set by db/bulk_import.py when a load finishes
+    SQLITE_POOL_SIZE = 4  # read-only connections shared by all sessions
+    SQLITE_QUERY_TIMEOUT_S = 10
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB = 64 * 1024
+    SQL_MAX_ROWS = 200  # rows fetched per query; the rest is reported as truncated
+    SQL_ANSWER_MAX_ROWS = 20  # rows written into a fast-path / cached answer; the rest is summarized as "showing N of M"
+    SQL_RESULT_MAX_CHARS = 8000  # cap on a query result passed back to the LLM
+    SQL_SCHEMA_SAMPLE_ROWS = 3
+    SQL_IMPORT_BATCH_SIZE = 10_000  # rows per executemany call
+    SQL_IMPORT_TRANSACTION_ROWS = 500_000  # rows per commit during bulk loads
+    ROUTER_MIN_CONFIDENCE = 0.5  # below this, Generator.answer falls back to the other path if the first one is unusable
+    # A chat answer matching this (the documents did not cover the question) is unusable for an unsure route
+    ROUTER_CHAT_UNUSABLE_PATTERN = (
+        r"\b(?:(?:documents?|context)\s+(?:do(?:es)?\s*n[o']t|do(?:es)?\s+not)\s+(?:contain|mention|provide|include|cover|say)"
+        r"|not\s+(?:mentioned|provided|included|available|found|covered)\s+in\s+the\s+(?:documents?|context)"
+        r"|(?:don't|do\s+not|doesn't|does\s+not)\s+have\s+(?:enough\s+|any\s+)?(?:information|details|data)"
+        r"|(?:can(?:not|'t)|could\s*n[o']t|unable\s+to)\s+find"
+        r"|need\s+more\s+information|please\s+provide\s+more)"
+    )
+    ROUTER_WEIGHTS = {"keywords": 1.0, "schema": 0.5, "examples": 2.0}
+    ROUTER_EXAMPLE_MARGIN = 0.3  # SQL-over-chat example similarity that counts as SQL evidence without a keyword cue
+    ROUTER_EXAMPLES = {
+        "sql": [
+            "How many orders are there?",
+            "How many orders did Alice handle?",
+            "Which staff member handled the most orders?",
+            "List all products and their prices",
+            "What is the total revenue from orders?",
+            "What is the average product price?",
+            "Show the orders placed by customer David Lee",
+            "Top 5 most expensive products",
+            "Which customers live in Berlin?",
+        ],
+        "chat": [
+            "What are the library opening hours?",
+            "How do I register for courses?",
+            "What is the grading policy?",
+            "Explain the academic integrity rules",
+            "Where can I find information about scholarships?",
+            "What does the student guide say about exams?",
+            "Summarize the attendance policy",
+            "Hi, can you help me with a question?",
+        ],
+    }
+    SQL_AGENT_MODE = "fast"  # "fast" tries one-shot SQL before the ReAct agent, "react" always uses the agent
+    SQL_PLAN_CACHE_SIZE = 1024
+    SQL_RESULT_CACHE_SIZE = 256
+    SQL_RESULT_CACHE_MAX_ROWS = 1000
+    SQL_CACHED_ANSWER_TEMPLATE = "Result: {result}"
+    INGEST_MANIFEST_PATH = './chroma_db/ingestion_manifest.json'
+
+    CHUNK_SIZE=512
+    CHUNK_OVERLAP=70
+    INGEST_WORKERS=4
+    EMBED_BATCH_SIZE=100
+    EMBED_CONCURRENCY=4
+    CHROMA_WRITE_BATCH_SIZE=1000
 
 
     EMBEDDING_MODEL= 'text-embedding-3-small'
@@ -13,8 +87,24 @@ class Configs():
     TEMPERATURE=1
     MAX_TOKENS=1024 
     CACHE_DIR= './PIPELINE_DOCS'
+    EMBEDDING_CACHE_PATH= './PIPELINE_DOCS/embedding_cache.db'
+    EMBEDDING_CACHE_MAX_ENTRIES=500_000
     DB_NAME= 'knowledge_repository' 
     SIMILARITY_TOP_K=10
+    RETRIEVAL_WORKERS=8  # threads serving async retrievals; the vector store clients are synchronous
+    CONTEXT_TOKEN_BUDGET=3000
+    # Below this word overlap with the raw query, a rewritten query triggers a second retrieval
+    REWRITE_RETRIEVAL_SIMILARITY=0.6
+    REWRITE_CACHE_SIZE=2048
+    SEMANTIC_CACHE_ENABLED=True
+    SEMANTIC_CACHE_THRESHOLD=0.92  # cosine similarity of standalone queries needed to reuse an answer
+    SEMANTIC_CACHE_MAX_ENTRIES=5000
+    SEMANTIC_CACHE_TTL_S=24 * 3600
+    BATCH_CONCURRENCY=16  # LLM calls in flight during chat_batch
+    BATCH_CHUNK_SIZE=256  # questions embedded and retrieved together
+    BATCH_MAX_RETRIES=6  # retries of a rate-limited LLM call
+    BATCH_BACKOFF_S=1.0  # first retry delay when the provider sends no Retry-After
+    CONTEXT_METADATA_KEYS=["file_name", "page_label"]
     SYSTEM_PROMPT="""
     You are a helpful assistant to answer students and teachers questions. 
     You are here to answer questions based on the documents given.
@@ -41,4 +131,38 @@ class Configs():
     {question}
     <Standalone question>
     assistant:
-    """
\ No newline at end of file
+    """
+
+    MEMORY_TOKEN_BUDGET=2000
+    MEMORY_SUMMARY_MAX_TOKENS=500  # the rolling summary is cut to this; it counts against MEMORY_TOKEN_BUDGET
+    MEMORY_RECENT_TURNS=3
+    MEMORY_MAX_SESSIONS=1000
+
+    MEMORY_SUMMARY_PROMPT = """
+    You maintain a running summary of a conversation between a student or teacher (user) and an assistant.
+    Update the summary with the new messages. Keep names, facts, questions asked and answers given
+    that later questions may refer to. Drop greetings and filler. Reply with the summary only, under 200 words.
+    """
+
+    MEMORY_SUMMARY_TEMPLATE = """
+    <Current Summary>
+    {summary}
+    <New Messages>
+    {messages}
+    <Updated Summary>
+    """
+
+    CONVERSATION_SUMMARY_TEMPLATE = "Summary of the earlier conversation:\n{summary}"
+
+    FAST_SQL_PROMPT = """
+    You are an expert SQLite assistant. Write one read-only SQLite query that answers the user's question.
+    The database schema, with a few sample rows per table, is:
+
+    {schema}
+
+    Reply in exactly this format:
+    SQL: <a single SELECT statement, no comments>
+    ANSWER: <one short sentence answering the question, with the placeholder {{result}} where the query result goes>
+
+    If the question cannot be answered with a single query over this schema, reply with "SQL: NONE".
+    """
@@ -0,0 +1,121 @@
+from typing import List, Tuple
+from llama_index.core.schema import MetadataMode
+from llama_index.core.utils import get_tokenizer
+from configs import Configs
+
+MIN_OVERLAP_CHARS = 20
+
+
+def _text_overlap(left: str, right: str, max_chars: int = 2000) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+    for size in range(min(len(left), len(right), max_chars), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class _Passage:
+    def __init__(self, node_with_score):
+        node = node_with_score.node
+        self.source = node.ref_doc_id or node.metadata.get("file_name") or node.node_id
+        self.metadata = node.metadata
+        self.text = node.get_content(metadata_mode=MetadataMode.NONE)
+        self.start = node.start_char_idx
+        self.end = node.end_char_idx
+        self.score = node_with_score.score or 0.0
+
+    def try_merge(self, other: "_Passage") -> bool:
+        """Absorb a later passage from the same source if it touches or overlaps this one."""
+        if None not in (self.start, self.end, other.start, other.end):
+            if other.start > self.end + 1:
+                return False
+            if other.end > self.end:  # otherwise fully contained
+                overlap = self.end - other.start
+                self.text += other.text[overlap:] if overlap > 0 else " " + other.text
+                self.end = other.end
+        else:
+            overlap = _text_overlap(self.text, other.text)
+            if not overlap:
+                return False
+            self.text += other.text[overlap:]
+        self.score = max(self.score, other.score)
+        return True
+
+
+class ContextPacker:
+    """Packs retrieved nodes into a token-budgeted context block.
+
+    Neighbouring and overlapping chunks from the same document are merged, metadata is reduced
+    to a short source header, and passages are added by relevance until the budget is used.
+    """
+
+    def __init__(self, token_budget: int = Configs.CONTEXT_TOKEN_BUDGET,
+                 metadata_keys: List[str] = Configs.CONTEXT_METADATA_KEYS):
+        self.token_budget = token_budget
+        self.metadata_keys = metadata_keys
+        self.tokenizer = get_tokenizer()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, ending on a word boundary."""
+        while text and self.count_tokens(text) > max_tokens:
+            cut = int(len(text) * max_tokens / self.count_tokens(text) * 0.95)
+            text = text[:cut].rsplit(" ", 1)[0]
+        return text
+
+    def _merge(self, nodes: list) -> List[_Passage]:
+        by_source = {}
+        for node_with_score in nodes:
+            passage = _Passage(node_with_score)
+            by_source.setdefault(passage.source, []).append(passage)
+
+        merged = []
+        for passages in by_source.values():
+            if all(p.start is not None and p.end is not None for p in passages):
+                passages.sort(key=lambda p: p.start)
+            current = passages[0]
+            for passage in passages[1:]:
+                if not current.try_merge(passage):
+                    merged.append(current)
+                    current = passage
+            merged.append(current)
+        return merged
+
+    def _header(self, passage: _Passage) -> str:
+        fields = [str(passage.metadata[k]) for k in self.metadata_keys if passage.metadata.get(k) not in (None, "")]
+        return f"[{', '.join(fields)}]\n" if fields else ""
+
+    def pack(self, nodes: list) -> Tuple[str, dict]:
+        """Return the packed context string and packing statistics."""
+        raw_tokens = self.count_tokens("\n\n".join(n.node.get_content(metadata_mode=MetadataMode.ALL) for n in nodes))
+        passages = sorted(self._merge(nodes), key=lambda p: p.score, reverse=True)
+
+        blocks, used, dropped = [], 0, 0
+        for passage in passages:
+            header = self._header(passage)
+            cost = self.count_tokens(header + passage.text) + 2  # separator
+            remaining = self.token_budget - used
+            if cost <= remaining:
+                blocks.append(header + passage.text)
+                used += cost
+            elif remaining - self.count_tokens(header) > 50:
+                # Fill the tail of the budget with the start of the passage
+                room = remaining - self.count_tokens(header) - 2
+                blocks.append(header + self._truncate(passage.text, room))
+                used = self.token_budget
+            else:
+                dropped += 1
+
+        context = "\n\n".join(blocks)
+        packed_tokens = self.count_tokens(context)
+        stats = {
+            "nodes": len(nodes),
+            "passages": len(passages),
+            "dropped_passages": dropped,
+            "raw_tokens": raw_tokens,
+            "packed_tokens": packed_tokens,
+            "saved_tokens": raw_tokens - packed_tokens,
+        }
+        return context, stats
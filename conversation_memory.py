@@ -0,0 +1,115 @@
+import hashlib
+import logging
+from typing import Tuple
+from llama_index.core.llms import ChatMessage, LLM
+from llama_index.core.utils import get_tokenizer
+from configs import Configs
+from utils.tracing import tracer, record_llm_call
+
+
+def _digest(messages: list) -> str:
+    return hashlib.sha1("\x1e".join(f"{m['role']}\x1f{m['content']}" for m in messages).encode("utf-8")).hexdigest()
+
+
+def conversation_key(history: list) -> str:
+    """Stable key for the conversation a history belongs to, taken from its opening exchange."""
+    return _digest(history[:2])
+
+
+class ConversationMemory:
+    """Token-bounded view of a conversation for the chat prompt.
+
+    The last recent_turns exchanges are kept verbatim; anything older (or anything that would push
+    the prompt past token_budget) is folded into a rolling summary. Folding is incremental: each
+    update summarizes only the newly aged-out messages together with the previous summary, so one
+    instance should live as long as the session it belongs to. The summary is cut to
+    summary_max_tokens, and a last message that alone exceeds the budget is cut to fit.
+    """
+
+    def __init__(self, llm: LLM, token_budget: int = Configs.MEMORY_TOKEN_BUDGET,
+                 recent_turns: int = Configs.MEMORY_RECENT_TURNS,
+                 summary_max_tokens: int = Configs.MEMORY_SUMMARY_MAX_TOKENS):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = min(summary_max_tokens, token_budget)
+        self.tokenizer = get_tokenizer()
+        self.summary = ""
+        self.folded = 0
+        self._folded_digest = _digest([])
+
+    def _tokens(self, messages: list) -> int:
+        return sum(len(self.tokenizer(m["content"])) + 4 for m in messages)
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the start of text, at most max_tokens tokens including the cut marker."""
+        if max_tokens <= 1:
+            return ""
+        cut = text
+        while (count := len(self.tokenizer(cut))) > max_tokens - 1:
+            cut = cut[:len(cut) * (max_tokens - 1) // count - 1]
+        return text if cut == text else cut + "…"
+
+    def _fit(self, recent: list) -> list:
+        """Cut the verbatim messages to what the summary leaves of the budget.
+
+        _plan keeps more than one message only when they fit, so only a lone last message can be over.
+        """
+        room = self.token_budget - (len(self.tokenizer(self.summary)) if self.summary else 0)
+        if len(recent) != 1 or self._tokens(recent) <= room:
+            return recent
+        return [{**recent[0], "content": self._truncate(recent[0]["content"], room - 4)}]
+
+    def _plan(self, history: list) -> int:
+        """Return the index where the verbatim part of history starts."""
+        if self.folded > len(history) or _digest(history[:self.folded]) != self._folded_digest:
+            # History was edited or belongs to another conversation; start over
+            self.summary, self.folded, self._folded_digest = "", 0, _digest([])
+
+        start = max(self.folded, len(history) - 2 * self.recent_turns)
+        start = self._shrink(history, start, len(self.tokenizer(self.summary)) if self.summary else 0)
+        if start > self.folded:
+            # Folding replaces the summary with one of up to summary_max_tokens
+            start = self._shrink(history, start, self.summary_max_tokens)
+        return start
+
+    def _shrink(self, history: list, start: int, summary_tokens: int) -> int:
+        while start < len(history) - 1 and self._tokens(history[start:]) + summary_tokens > self.token_budget:
+            start += 1
+        return start
+
+    def _summary_prompt(self, messages: list) -> list:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return [
+            ChatMessage(role="system", content=Configs.MEMORY_SUMMARY_PROMPT),
+            ChatMessage(role="user", content=Configs.MEMORY_SUMMARY_TEMPLATE.format(
+                summary=self.summary or "(empty)", messages=transcript))
+        ]
+
+    def _commit(self, history: list, start: int, summary: str):
+        self.summary = self._truncate(summary, self.summary_max_tokens)
+        self.folded = start
+        self._folded_digest = _digest(history[:start])
+        if Configs.WRITE_LOGS:
+            logging.info(f"ConversationMemory: folded {start} messages into summary")
+
+    def window(self, history: list) -> Tuple[str, list]:
+        """Return (summary, recent messages) for history, folding aged-out messages first."""
+        with tracer.span("chat.memory") as span:
+            start = self._plan(history)
+            if start > self.folded:
+                span.set(folded_messages=start - self.folded)
+                response = self.llm.chat(self._summary_prompt(history[self.folded:start]))
+                record_llm_call(response)
+                self._commit(history, start, str(response).strip())
+            return self.summary, self._fit(history[start:])
+
+    async def awindow(self, history: list) -> Tuple[str, list]:
+        with tracer.span("chat.memory") as span:
+            start = self._plan(history)
+            if start > self.folded:
+                span.set(folded_messages=start - self.folded)
+                response = await self.llm.achat(self._summary_prompt(history[self.folded:start]))
+                record_llm_call(response)
+                self._commit(history, start, str(response).strip())
+            return self.summary, self._fit(history[start:])
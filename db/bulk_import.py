@@ -0,0 +1,335 @@
+"""Bulk-load CSV, JSONL or Parquet files (or synthetic data) into the SQL agent's database.
+
+Usage:
+    python -m db.bulk_import import data/orders.csv --table orders --index staff_id --index product_id
+    python -m db.bulk_import synthetic --products 10000 --staff 5000 --orders 5000000
+
+`import` appends to existing tables unless --replace is given; `synthetic` always recreates its tables.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+from configs import Configs
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+# Rows inspected to infer column types when no schema is given.
+INFER_SAMPLE_ROWS = 1000
+
+
+def _leading_zero(value: str) -> bool:
+    """True for zero-padded codes like "007", which a numeric column would turn into 7."""
+    digits = value.strip().lstrip("+-")
+    return len(digits) > 1 and digits[0] == "0" and digits[1].isdigit()
+
+
+def _sqlite_type(values: list) -> str:
+    """Narrowest SQLite column type that fits all non-empty sample values."""
+    values = [v for v in values if v not in (None, "")]
+    if not values:
+        return "TEXT"
+    if all(isinstance(v, bool) or isinstance(v, int) for v in values):
+        return "INTEGER"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "REAL"
+    if all(isinstance(v, str) for v in values) and not any(_leading_zero(v) for v in values):
+        try:
+            [int(v) for v in values]
+            return "INTEGER"
+        except ValueError:
+            pass
+        try:
+            [float(v) for v in values]
+            return "REAL"
+        except ValueError:
+            pass
+    return "TEXT"
+
+
+def infer_schema(columns: Sequence[str], sample: List[Sequence]) -> List[Tuple[str, str]]:
+    """[(column, type)] from a sample of rows aligned with columns."""
+    return [(column, _sqlite_type([row[i] for row in sample])) for i, column in enumerate(columns)]
+
+
+def _converter(column_type: str):
+    base = column_type.split()[0].upper() if column_type else "TEXT"
+    if base in ("INTEGER", "INT", "BIGINT"):
+        cast = int
+    elif base in ("REAL", "FLOAT", "DOUBLE", "DECIMAL", "NUMERIC"):
+        cast = float
+    else:
+        return lambda v: None if v == "" else json.dumps(v) if isinstance(v, (dict, list)) else v
+
+    def convert(value):
+        if value is None or value == "":
+            return None
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return cast(value)
+        except ValueError:  # a value the type sample did not cover; let column affinity handle it
+            return value
+    return convert
+
+
+def read_rows(path: str, fmt: str = None, batch_size: int = 50_000) -> Tuple[List[str], Iterator[tuple]]:
+    """Open a data file and return (columns, row iterator) without loading it into memory."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt == "csv":
+        f = open(path, newline="", encoding="utf-8")
+        reader = csv.reader(f)
+        columns = next(reader)
+
+        def rows():
+            with f:
+                yield from (tuple(row) for row in reader)
+        return columns, rows()
+
+    if fmt in ("jsonl", "ndjson"):
+        with open(path, encoding="utf-8") as f:
+            first = next((line for line in f if line.strip()), None)
+        if first is None:
+            return [], iter(())
+        columns = list(json.loads(first).keys())
+
+        def rows():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield tuple(record.get(column) for column in columns)
+        return columns, rows()
+
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet import needs pyarrow: pip install pyarrow") from e
+        parquet_file = pq.ParquetFile(path)
+        columns = parquet_file.schema_arrow.names
+
+        def rows():
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+        return columns, rows()
+
+    raise ValueError(f"Unsupported format {fmt!r}; expected one of {FORMATS}")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class BulkImporter:
+    """Loads large row streams into SQLite with load-time pragmas.
+
+    Rows are inserted with executemany in batches, committing every transaction_rows rows.
+    Indexes requested during the load are built afterwards and ANALYZE runs in finish(), which
+    also restores the normal journal mode.
+    """
+
+    def __init__(self, db_file: str = Configs.SQLITE_DB_DIR, batch_size: int = Configs.SQL_IMPORT_BATCH_SIZE,
+                 transaction_rows: int = Configs.SQL_IMPORT_TRANSACTION_ROWS):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.transaction_rows = transaction_rows
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode=MEMORY;")
+        self.conn.execute("PRAGMA synchronous=OFF;")
+        self.conn.execute("PRAGMA temp_store=MEMORY;")
+        self.conn.execute(f"PRAGMA cache_size={-Configs.SQLITE_CACHE_SIZE_KIB};")
+        self.pending_indexes: List[Tuple[str, Tuple[str, ...], bool]] = []
+        self.rows_loaded: Dict[str, int] = {}
+
+    def create_table(self, table: str, schema: Sequence[Tuple[str, str]], foreign_keys: Sequence[str] = (),
+                     replace: bool = False):
+        """Create table from [(column, type)] plus raw FOREIGN KEY clauses; replace drops it first."""
+        if replace:
+            self.conn.execute(f"DROP TABLE IF EXISTS {_quote(table)};")
+        definitions = [f"{_quote(column)} {column_type}".strip() for column, column_type in schema]
+        definitions += list(foreign_keys)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({', '.join(definitions)});")
+
+    def add_index(self, table: str, columns: Sequence[str], unique: bool = False):
+        """Queue an index; it is created in finish(), after the data is in."""
+        self.pending_indexes.append((table, tuple(columns), unique))
+
+    def insert_rows(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+        """executemany rows in batches, one transaction per transaction_rows rows.
+
+        If a batch fails, the open transaction is rolled back (earlier, committed transactions stay)
+        and the error is raised.
+        """
+        sql = (f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        rows = iter(rows)
+        loaded = in_transaction = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                if not in_transaction:
+                    self.conn.execute("BEGIN;")
+                self.conn.executemany(sql, batch)
+                loaded += len(batch)
+                in_transaction += len(batch)
+                if in_transaction >= self.transaction_rows:
+                    self.conn.commit()
+                    in_transaction = 0
+            if in_transaction:
+                self.conn.commit()
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+        self.rows_loaded[table] = self.rows_loaded.get(table, 0) + loaded
+        if Configs.WRITE_LOGS:
+            elapsed = time.perf_counter() - start
+            logging.info(f"Loaded {loaded} rows into {table} in {elapsed:.2f}s "
+                         f"({loaded / elapsed if elapsed else 0:.0f} rows/s)")
+        return loaded
+
+    def import_file(self, path: str, table: str = None, schema: Sequence[Tuple[str, str]] = None,
+                    fmt: str = None, replace: bool = False) -> int:
+        """Load a CSV, JSONL or Parquet file into table (default: the file's base name).
+
+        Without a schema, column types are inferred from the first INFER_SAMPLE_ROWS rows.
+        """
+        table = table or os.path.splitext(os.path.basename(path))[0]
+        columns, rows = read_rows(path, fmt, batch_size=self.batch_size)
+        sample = list(islice(rows, INFER_SAMPLE_ROWS))
+        if schema is None:
+            schema = infer_schema(columns, sample)
+        types = dict(schema)
+        converters = [_converter(types.get(column, "TEXT")) for column in columns]
+
+        def converted(source):
+            for row in source:
+                yield tuple(convert(value) for convert, value in zip(converters, row))
+
+        self.create_table(table, schema, replace=replace)
+        return self.insert_rows(table, columns, converted(chain(sample, rows)))
+
+    def finish(self):
+        """Build queued indexes, run ANALYZE and switch back to durable settings."""
+        for table, columns, unique in self.pending_indexes:
+            name = f"idx_{table}_{'_'.join(columns)}"
+            start = time.perf_counter()
+            self.conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {_quote(name)} "
+                              f"ON {_quote(table)} ({', '.join(_quote(c) for c in columns)});")
+            if Configs.WRITE_LOGS:
+                logging.info(f"Built index {name} in {time.perf_counter() - start:.2f}s")
+        self.pending_indexes = []
+        self.conn.commit()
+        self.conn.execute("ANALYZE;")
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if Configs.SQLITE_WAL else 'DELETE'};")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+PRODUCTS_SCHEMA = [("product_id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+                   ("product_name", "VARCHAR(255) NOT NULL"),
+                   ("price", "DECIMAL(10, 2) NOT NULL")]
+STAFF_SCHEMA = [("staff_id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+                ("first_name", "VARCHAR(255) NOT NULL"),
+                ("last_name", "VARCHAR(255) NOT NULL")]
+ORDERS_SCHEMA = [("order_id", "INTEGER PRIMARY KEY AUTOINCREMENT"),
+                 ("customer_name", "VARCHAR(255) NOT NULL"),
+                 ("staff_id", "INTEGER NOT NULL"),
+                 ("product_id", "INTEGER NOT NULL")]
+ORDERS_FOREIGN_KEYS = ["FOREIGN KEY (staff_id) REFERENCES staff (staff_id)",
+                       "FOREIGN KEY (product_id) REFERENCES products (product_id)"]
+
+FIRST_NAMES = ["Alice", "Bob", "Charlie", "David", "Emily", "Frank", "Grace", "Hannah", "Ivan", "Julia",
+               "Kevin", "Laura", "Mohammed", "Nina", "Oscar", "Priya", "Quinn", "Rosa", "Sam", "Tara"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Lee", "Chen", "Brown", "Garcia", "Patel", "Kim", "Nguyen",
+              "Lopez", "Martin", "Singh", "Clark", "Lewis", "Walker", "Young", "Hall", "Allen", "King"]
+PRODUCT_ADJECTIVES = ["Basic", "Pro", "Ultra", "Compact", "Wireless", "Ergonomic", "Smart", "Portable"]
+PRODUCT_NOUNS = ["Laptop", "Keyboard", "Mouse", "Monitor", "Headset", "Webcam", "Dock", "Tablet", "Charger"]
+
+
+def create_seed_schema(importer: BulkImporter, replace: bool = False):
+    """The products / staff / orders tables the SQL agent is built around."""
+    importer.create_table("products", PRODUCTS_SCHEMA, replace=replace)
+    importer.create_table("staff", STAFF_SCHEMA, replace=replace)
+    importer.create_table("orders", ORDERS_SCHEMA, foreign_keys=ORDERS_FOREIGN_KEYS, replace=replace)
+    importer.add_index("orders", ["staff_id"])
+    importer.add_index("orders", ["product_id"])
+
+
+def generate_synthetic(importer: BulkImporter, products: int, staff: int, orders: int, seed: int = 0):
+    """Fill products, staff and orders with reproducible random rows; orders reference existing ids."""
+    rng = random.Random(seed)
+    create_seed_schema(importer, replace=True)
+    importer.insert_rows("products", ["product_id", "product_name", "price"], (
+        (i, f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {i}", round(rng.uniform(5, 2500), 2))
+        for i in range(1, products + 1)
+    ))
+    importer.insert_rows("staff", ["staff_id", "first_name", "last_name"], (
+        (i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for i in range(1, staff + 1)
+    ))
+    importer.insert_rows("orders", ["order_id", "customer_name", "staff_id", "product_id"], (
+        (i, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.randint(1, staff), rng.randint(1, products))
+        for i in range(1, orders + 1)
+    ))
+    importer.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=Configs.SQLITE_DB_DIR)
+    parser.add_argument("--batch-size", type=int, default=Configs.SQL_IMPORT_BATCH_SIZE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("import", help="load data files")
+    load.add_argument("files", nargs="+")
+    load.add_argument("--table", help="target table (default: file name); only with a single file")
+    load.add_argument("--format", choices=FORMATS)
+    load.add_argument("--schema", help='JSON list of [column, type] pairs, e.g. [["id", "INTEGER PRIMARY KEY"]]')
+    load.add_argument("--index", action="append", default=[], help="column(s) to index, comma separated")
+    load.add_argument("--replace", action="store_true", help="drop existing tables first")
+
+    synthetic = commands.add_parser("synthetic", help="generate products, staff and orders")
+    synthetic.add_argument("--products", type=int, default=10_000)
+    synthetic.add_argument("--staff", type=int, default=1_000)
+    synthetic.add_argument("--orders", type=int, default=1_000_000)
+    synthetic.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=Configs.LOG_LEVEL)
+    start = time.perf_counter()
+    importer = BulkImporter(args.db, batch_size=args.batch_size)
+    try:
+        if args.command == "synthetic":
+            generate_synthetic(importer, args.products, args.staff, args.orders, args.seed)
+        else:
+            if args.table and len(args.files) > 1:
+                parser.error("--table can only be used with a single file")
+            schema = [tuple(pair) for pair in json.loads(args.schema)] if args.schema else None
+            for path in args.files:
+                table = args.table or os.path.splitext(os.path.basename(path))[0]
+                importer.import_file(path, table=table, schema=schema, fmt=args.format, replace=args.replace)
+                for columns in args.index:
+                    importer.add_index(table, [c.strip() for c in columns.split(",")])
+            importer.finish()
+    finally:
+        importer.close()
+    print(f"Loaded {sum(importer.rows_loaded.values())} rows {importer.rows_loaded} into {args.db} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
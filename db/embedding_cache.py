@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+
+class EmbeddingCache:
+    """Size-bounded on-disk embedding store keyed by (model, sha256(text)).
+
+    Vectors are stored as packed float32 blobs in SQLite and evicted least-recently-used
+    once the entry count exceeds max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors aligned with texts, None where missing."""
+        hashes = [self._hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return [array("f", found[h]).tolist() if h in found else None for h in hashes]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [(model, self._hash(text), array("f", vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._entries += self._conn.total_changes - before
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Trim a little below the bound so eviction does not run on every insert.
+        target = int(self.max_entries * 0.95)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE (model, text_hash) IN "
+            "(SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (self._entries - target,)
+        )
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._entries,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that serves repeated texts from an EmbeddingCache."""
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        cached = self._cache.get_many(self.model_name, [query])[0]
+        if cached is not None:
+            return cached
+        vector = self._embed_model.get_query_embedding(query)
+        self._cache.put_many(self.model_name, [query], [vector])
+        return vector
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        cached = self._cache.get_many(self.model_name, [query])[0]
+        if cached is not None:
+            return cached
+        vector = await self._embed_model.aget_query_embedding(query)
+        self._cache.put_many(self.model_name, [query], [vector])
+        return vector
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._cache.get_many(self.model_name, texts)
+        missing = self._missing_texts(texts, vectors)
+        if missing:
+            self._fill(texts, vectors, missing, self._embed_model.get_text_embedding_batch(missing))
+        return vectors
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._cache.get_many(self.model_name, texts)
+        missing = self._missing_texts(texts, vectors)
+        if missing:
+            self._fill(texts, vectors, missing, await self._embed_model.aget_text_embedding_batch(missing))
+        return vectors
+
+    @staticmethod
+    def _missing_texts(texts: List[str], vectors: list) -> List[str]:
+        """Distinct texts without a cached vector, in first-seen order."""
+        return list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+
+    def _fill(self, texts: List[str], vectors: list, missing: List[str], computed: List[List[float]]):
+        by_text = dict(zip(missing, computed))
+        for i, text in enumerate(texts):
+            if vectors[i] is None:
+                vectors[i] = by_text[text]
+        self._cache.put_many(self.model_name, missing, computed)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+# Reader metadata that changes whenever a file is touched, even if its text is identical.
+VOLATILE_METADATA_KEYS = {
+    "file_path",
+    "file_size",
+    "creation_date",
+    "last_modified_date",
+    "last_accessed_date",
+}
+
+
+class IngestionManifest:
+    """Persistent record of which files and chunks are already in the vector store.
+
+    Layout on disk:
+        {"version": int, "reconciled": bool,
+         "files": {file_name: {"file_hash": str, "chunks": {chunk_id: chunk_hash}}}}
+
+    reconciled is set once the collection holds only chunks listed here (see
+    VectorDBManager.process_new_documents); older manifests and new ones start unset.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self.reconciled = False
+        self.files: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.version = data.get("version", 0)
+        self.reconciled = data.get("reconciled", False)
+        self.files = data.get("files", {})
+
+    def save(self):
+        """Atomically write the manifest so a crash never leaves a half-written file."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "reconciled": self.reconciled, "files": self.files}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def disk_stamp(path: str) -> Optional[tuple]:
+        """(mtime_ns, size) of the manifest file, or None if it does not exist yet.
+
+        Changes whenever any process saves the manifest, which the in-memory version does not see.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_chunk(text: str, metadata: dict) -> str:
+        stable_metadata = {k: v for k, v in metadata.items() if k not in VOLATILE_METADATA_KEYS}
+        payload = json.dumps([text, stable_metadata], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def chunk_id(file_name: str, chunk_hash: str) -> str:
+        return f"{file_name}#{chunk_hash[:16]}"
+
+    def file_hash(self, file_name: str) -> Optional[str]:
+        entry = self.files.get(file_name)
+        return entry["file_hash"] if entry else None
+
+    def chunks(self, file_name: str) -> Dict[str, str]:
+        entry = self.files.get(file_name)
+        return dict(entry["chunks"]) if entry else {}
+
+    def set_file(self, file_name: str, file_hash: str, chunks: Dict[str, str]):
+        self.files[file_name] = {"file_hash": file_hash, "chunks": chunks}
+        self.version += 1
+
+    def chunk_ids(self) -> set:
+        """Ids of every chunk of every recorded file."""
+        return {chunk_id for entry in self.files.values() for chunk_id in entry["chunks"]}
+
+    def remove_file(self, file_name: str) -> Dict[str, str]:
+        entry = self.files.pop(file_name, None)
+        if entry is None:
+            return {}
+        self.version += 1
+        return entry["chunks"]
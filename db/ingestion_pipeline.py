@@ -0,0 +1,181 @@
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode, NodeRelationship
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from db.ingestion_manifest import IngestionManifest
+
+
+@lru_cache(maxsize=4)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> SentenceSplitter:
+    return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def assign_chunk_ids(filename: str, nodes: list) -> Tuple[list, Dict[str, str]]:
+    """Give each node a content-addressed id and keep prev/next links consistent.
+
+    Returns the de-duplicated nodes and a {chunk_id: chunk_hash} map.
+    """
+    id_map, unique_nodes, chunk_hashes = {}, {}, {}
+    for node in nodes:
+        chunk_hash = IngestionManifest.hash_chunk(node.get_content(), node.metadata)
+        chunk_id = IngestionManifest.chunk_id(filename, chunk_hash)
+        id_map[node.node_id] = chunk_id
+        node.id_ = chunk_id
+        unique_nodes.setdefault(chunk_id, node)
+        chunk_hashes[chunk_id] = chunk_hash
+
+    for node in unique_nodes.values():
+        for relation in (NodeRelationship.PREVIOUS, NodeRelationship.NEXT):
+            related = node.relationships.get(relation)
+            if related is not None and related.node_id in id_map:
+                related.node_id = id_map[related.node_id]
+    return list(unique_nodes.values()), chunk_hashes
+
+
+def parse_and_split(filename: str, file_path: str, chunk_size: int, chunk_overlap: int) -> tuple:
+    """Load and chunk a single file. Runs inside a worker process, so it must stay top-level."""
+    docs = SimpleDirectoryReader(input_files=[file_path], filename_as_id=True, raise_on_error=True).load_data()
+    nodes = _get_splitter(chunk_size, chunk_overlap).get_nodes_from_documents(docs)
+    return assign_chunk_ids(filename, nodes)
+
+
+def _batched(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class IngestionPipeline:
+    """Staged ingestion: parse/split in a process pool, embed in concurrent batches, write in batches.
+
+    Files are streamed through the stages with a bounded number in flight, so memory depends on
+    the worker count rather than the size of the drop. The manifest is saved after every file,
+    which makes an interrupted run resumable: finished files are skipped on the next run. A file
+    that cannot be parsed is logged, recorded in `failed` and handed to on_file_failed; the rest
+    of the drop is still ingested.
+    """
+
+    def __init__(self, collection, embed_model, manifest: IngestionManifest,
+                 chunk_size: int = 512, chunk_overlap: int = 70, parse_workers: int = 4,
+                 embed_batch_size: int = 100, embed_concurrency: int = 4, write_batch_size: int = 1000):
+        self.collection = collection
+        self.embed_model = embed_model
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.parse_workers = parse_workers
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.write_batch_size = write_batch_size
+        self.failed: Dict[str, str] = {}  # file name -> parse error of the last run
+
+    def run(self, files: List[Tuple[str, str]], on_file_done: Callable[[str], None],
+            on_file_failed: Optional[Callable[[str], None]] = None) -> bool:
+        """Ingest (filename, path) pairs; on_file_done is called once a file is durably stored,
+        on_file_failed once a file has failed to parse.
+
+        Returns True if the collection changed.
+        """
+        self.failed = {}
+        pending = deque()
+        for filename, file_path in files:
+            file_hash = IngestionManifest.hash_file(file_path)
+            if self.manifest.file_hash(filename) == file_hash:
+                logging.info(f"Skipping unchanged document: {filename}")
+                on_file_done(filename)
+            else:
+                pending.append((filename, file_path, file_hash))
+
+        if not pending:
+            return False
+        if self.parse_workers <= 1:
+            return self._run_inline(pending, on_file_done, on_file_failed)
+
+        changed = False
+        max_in_flight = self.parse_workers * 2
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool, \
+                ThreadPoolExecutor(max_workers=self.embed_concurrency) as embed_pool:
+            in_flight = {}
+            while pending or in_flight:
+                while pending and len(in_flight) < max_in_flight:
+                    filename, file_path, file_hash = pending.popleft()
+                    future = parse_pool.submit(parse_and_split, filename, file_path,
+                                               self.chunk_size, self.chunk_overlap)
+                    in_flight[future] = (filename, file_hash)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename, file_hash = in_flight.pop(future)
+                    try:
+                        nodes, chunk_hashes = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        self._parse_failed(filename, e, on_file_failed)
+                        continue
+                    changed = self._store_file(filename, file_hash, nodes, chunk_hashes, embed_pool) or changed
+                    on_file_done(filename)
+        return changed
+
+    def _run_inline(self, pending: deque, on_file_done: Callable[[str], None],
+                    on_file_failed: Optional[Callable[[str], None]]) -> bool:
+        changed = False
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as embed_pool:
+            for filename, file_path, file_hash in pending:
+                try:
+                    nodes, chunk_hashes = parse_and_split(filename, file_path, self.chunk_size, self.chunk_overlap)
+                except Exception as e:
+                    self._parse_failed(filename, e, on_file_failed)
+                    continue
+                changed = self._store_file(filename, file_hash, nodes, chunk_hashes, embed_pool) or changed
+                on_file_done(filename)
+        return changed
+
+    def _parse_failed(self, filename: str, error: Exception, on_file_failed: Optional[Callable[[str], None]]):
+        self.failed[filename] = f"{type(error).__name__}: {error}"
+        logging.error(f"Failed to parse {filename}, skipping it: {self.failed[filename]}")
+        if on_file_failed is not None:
+            on_file_failed(filename)
+
+    def _store_file(self, filename: str, file_hash: str, nodes: list, chunk_hashes: Dict[str, str],
+                    embed_pool: ThreadPoolExecutor) -> bool:
+        """Diff one file's chunks against the manifest, write the changes and checkpoint."""
+        old_chunks = self.manifest.chunks(filename)
+        stale_ids = [chunk_id for chunk_id in old_chunks if chunk_id not in chunk_hashes]
+        fresh_nodes = [node for node in nodes if node.node_id not in old_chunks]
+
+        if stale_ids:
+            self.collection.delete(ids=stale_ids)
+        for batch in _batched(fresh_nodes, self.write_batch_size):
+            self._upsert_nodes(batch, embed_pool)
+
+        self.manifest.set_file(filename, file_hash, chunk_hashes)
+        self.manifest.save()
+        logging.info(f"Ingested {filename}: {len(fresh_nodes)} chunks embedded, "
+                     f"{len(chunk_hashes) - len(fresh_nodes)} unchanged, {len(stale_ids)} removed")
+        return bool(stale_ids or fresh_nodes)
+
+    def _upsert_nodes(self, nodes: list, embed_pool: ThreadPoolExecutor):
+        """Embed nodes in concurrent batches and write them in the layout ChromaVectorStore reads."""
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = []
+        for batch_embeddings in embed_pool.map(self.embed_model.get_text_embedding_batch,
+                                               _batched(texts, self.embed_batch_size)):
+            embeddings.extend(batch_embeddings)
+
+        metadatas = []
+        for node in nodes:
+            metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=True)
+            metadatas.append({k: ("" if v is None else v) for k, v in metadata.items()})
+
+        self.collection.upsert(
+            ids=[node.node_id for node in nodes],
+            embeddings=embeddings,
+            documents=[node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes],
+            metadatas=metadatas
+        )
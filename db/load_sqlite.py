@@ -1,73 +1,44 @@
-import sqlite3
-
-# Connect to SQLite database (it will be created if it doesn't exist)
-conn = sqlite3.connect('sqlite_data.db')
-
-# Create a cursor object to interact with the database
-cursor = conn.cursor()
-
-# Create the 'products' table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS products (
-    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_name VARCHAR(255) NOT NULL,
-    price DECIMAL(10, 2) NOT NULL
-)
-''')
-
-# Create the 'staff' table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS staff (
-    staff_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    first_name VARCHAR(255) NOT NULL,
-    last_name VARCHAR(255) NOT NULL
-)
-''')
-
-# Create the 'orders' table
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS orders (
-    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    customer_name VARCHAR(255) NOT NULL,
-    staff_id INTEGER NOT NULL,
-    product_id INTEGER NOT NULL,
-    FOREIGN KEY (staff_id) REFERENCES staff (staff_id),
-    FOREIGN KEY (product_id) REFERENCES products (product_id)
-)
-''')
-
-# Insert data into the 'products' table
-cursor.executemany('''
-INSERT INTO products (product_name, price) VALUES (?, ?)
-''', [
-    ('Laptop', 799.99),
-    ('Keyboard', 129.99),
-    ('Mouse', 29.99)
-])
-
-# Insert data into the 'staff' table
-cursor.executemany('''
-INSERT INTO staff (first_name, last_name) VALUES (?, ?)
-''', [
-    ('Alice', 'Smith'),
-    ('Bob', 'Johnson'),
-    ('Charlie', 'Williams')
-])
-
-# Insert data into the 'orders' table
-cursor.executemany('''
-INSERT INTO orders (customer_name, staff_id, product_id) VALUES (?, ?, ?)
-''', [
-    ('David Lee', 1, 1),
-    ('Emily Chen', 2, 2),
-    ('Frank Brown', 1, 3)
-])
-
-# Commit the changes to the database
-conn.commit()
-
-# Close the cursor and connection
-cursor.close()
-conn.close()
-
-print("Tables created successfully.")
+"""Create the sample products / staff / orders database at Configs.SQLITE_DB_DIR.
+
+Usage (from the repository root):
+    python -m db.load_sqlite
+
+The tables are recreated on every run, so re-running does not duplicate rows.
+For large or real datasets use `python -m db.bulk_import` instead.
+"""
+from configs import Configs
+from db.bulk_import import BulkImporter, create_seed_schema
+
+
+def main():
+    importer = BulkImporter(Configs.SQLITE_DB_DIR)
+    create_seed_schema(importer, replace=True)
+
+    # Insert data into the 'products' table
+    importer.insert_rows("products", ["product_name", "price"], [
+        ('Laptop', 799.99),
+        ('Keyboard', 129.99),
+        ('Mouse', 29.99)
+    ])
+
+    # Insert data into the 'staff' table
+    importer.insert_rows("staff", ["first_name", "last_name"], [
+        ('Alice', 'Smith'),
+        ('Bob', 'Johnson'),
+        ('Charlie', 'Williams')
+    ])
+
+    # Insert data into the 'orders' table
+    importer.insert_rows("orders", ["customer_name", "staff_id", "product_id"], [
+        ('David Lee', 1, 1),
+        ('Emily Chen', 2, 2),
+        ('Frank Brown', 1, 3)
+    ])
+
+    importer.finish()
+    importer.close()
+    print("Tables created successfully.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Export the Chroma collection into a memory-mapped NumpyVectorStore.
+
+Usage:
+    python -m db.migrate_chroma --quantization int8
+"""
+import argparse
+import time
+import chromadb
+from configs import Configs
+from db.ingestion_manifest import IngestionManifest
+from db.numpy_vector_store import NumpyVectorStore, QUANTIZATIONS
+
+
+def migrate(db_dir: str, collection_name: str, out_dir: str, quantization: str, batch_size: int) -> NumpyVectorStore:
+    collection = chromadb.PersistentClient(path=db_dir).get_collection(collection_name)
+    source_version = IngestionManifest(Configs.INGEST_MANIFEST_PATH).version
+    return NumpyVectorStore.from_chroma_collection(
+        collection, out_dir, quantization=quantization, batch_size=batch_size,
+        extra_meta={"source_version": source_version, "embedding_model": Configs.EMBEDDING_MODEL}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-dir", default=Configs.VECTOR_DB_DIR)
+    parser.add_argument("--collection", default=Configs.DB_NAME)
+    parser.add_argument("--out", default=Configs.NUMPY_INDEX_DIR)
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=Configs.VECTOR_QUANTIZATION)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = migrate(args.db_dir, args.collection, args.out, args.quantization, args.batch_size)
+    print(f"Exported {store.count} vectors ({args.quantization}) to {args.out} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
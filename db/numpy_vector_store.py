@@ -0,0 +1,266 @@
+import json
+import mmap
+import os
+import shutil
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TextNode
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery, VectorStoreQueryResult
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+
+QUANTIZATIONS = ("none", "int8", "binary")
+BLOCK_ROWS = 65536
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _quantize(normalized: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return the stored representation of normalized rows and, for int8, the per-row scales."""
+    if quantization == "int8":
+        max_abs = np.abs(normalized).max(axis=1)
+        scales = np.where(max_abs > 0, 127.0 / np.maximum(max_abs, 1e-12), 1.0).astype(np.float32)
+        return np.rint(normalized * scales[:, None]).astype(np.int8), scales
+    if quantization == "binary":
+        return np.packbits(normalized > 0, axis=1), None
+    return normalized.astype(np.float32), None
+
+
+def _write_index(persist_dir: str, count: int, quantization: str,
+                 batches: Iterable[Tuple[List[str], np.ndarray, List[str], List[dict]]], extra_meta: dict = None):
+    """Stream (ids, embeddings, texts, metadatas) batches into a fresh index directory.
+
+    Files are written to a sibling temp directory and swapped in at the end, so readers never
+    see a partial index.
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+
+    tmp_dir = f"{persist_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    vectors, scales, dim, pos = None, None, None, 0
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    with open(os.path.join(tmp_dir, "payloads.jsonl"), "wb") as payloads:
+        for ids, embeddings, texts, metadatas in batches:
+            rows, row_scales = _quantize(_normalize(np.asarray(embeddings, dtype=np.float32)), quantization)
+            if vectors is None:
+                dim = int(np.asarray(embeddings).shape[1])
+                vectors = np.lib.format.open_memmap(os.path.join(tmp_dir, "vectors.npy"), mode="w+",
+                                                    dtype=rows.dtype, shape=(count, rows.shape[1]))
+                if row_scales is not None:
+                    scales = np.lib.format.open_memmap(os.path.join(tmp_dir, "scales.npy"), mode="w+",
+                                                       dtype=np.float32, shape=(count,))
+            end = pos + len(ids)
+            if end > count:
+                raise ValueError(f"Index received more than the expected {count} vectors")
+            vectors[pos:end] = rows
+            if scales is not None:
+                scales[pos:end] = row_scales
+            for i, (node_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                payloads.write(json.dumps({"id": node_id, "text": text, "metadata": metadata}).encode("utf-8"))
+                payloads.write(b"\n")
+                offsets[pos + i + 1] = payloads.tell()
+            pos = end
+
+    if pos != count:
+        raise ValueError(f"Index expected {count} vectors but received {pos}")
+    for array in (vectors, scales):
+        if array is not None:
+            array.flush()
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"dim": dim, "count": count, "quantization": quantization, **(extra_meta or {})}, f)
+
+    old_dir = f"{persist_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(persist_dir):
+        os.replace(persist_dir, old_dir)
+    os.replace(tmp_dir, persist_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """Exact brute-force vector store over a memory-mapped NumPy matrix.
+
+    Embeddings are L2-normalized and stored as float32, or quantized to int8 (4x smaller) or sign
+    bits (32x smaller). Opening an index only maps the files, so it costs milliseconds; node payloads
+    are decoded lazily for the top-k hits.
+    """
+
+    stores_text: bool = True
+    persist_dir: str
+
+    _meta: dict = PrivateAttr()
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _offsets: Optional[np.ndarray] = PrivateAttr(default=None)
+    _payloads: Optional[mmap.mmap] = PrivateAttr(default=None)
+
+    def __init__(self, persist_dir: str, **kwargs: Any):
+        super().__init__(persist_dir=persist_dir, **kwargs)
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return self._vectors
+
+    @property
+    def meta(self) -> dict:
+        return dict(self._meta)
+
+    @property
+    def count(self) -> int:
+        return self._meta["count"]
+
+    def _load(self):
+        meta_path = os.path.join(self.persist_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            self._meta = {"dim": None, "count": 0, "quantization": "none"}
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self._meta = json.load(f)
+        if self.count == 0:
+            return
+        self._vectors = np.load(os.path.join(self.persist_dir, "vectors.npy"), mmap_mode="r")
+        self._offsets = np.load(os.path.join(self.persist_dir, "offsets.npy"), mmap_mode="r")
+        if self._meta["quantization"] == "int8":
+            self._scales = np.load(os.path.join(self.persist_dir, "scales.npy"), mmap_mode="r")
+        with open(os.path.join(self.persist_dir, "payloads.jsonl"), "rb") as f:
+            self._payloads = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def from_chroma_collection(cls, collection, persist_dir: str, quantization: str = "none",
+                               batch_size: int = 5000, extra_meta: dict = None) -> "NumpyVectorStore":
+        """Export a Chroma collection page by page into a new index at persist_dir."""
+        count = collection.count()
+
+        def batches():
+            for offset in range(0, count, batch_size):
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=batch_size, offset=offset)
+                yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+
+        _write_index(persist_dir, count, quantization, batches(), extra_meta)
+        return cls(persist_dir=persist_dir)
+
+    def _payload(self, row: int) -> dict:
+        return json.loads(self._payloads[self._offsets[row]:self._offsets[row + 1]])
+
+    def _node(self, row: int) -> BaseNode:
+        payload = self._payload(row)
+        try:
+            return metadata_dict_to_node(payload["metadata"], text=payload["text"])
+        except Exception:
+            # Entries written without llama_index node metadata
+            return TextNode(id_=payload["id"], text=payload["text"], metadata=payload["metadata"])
+
+    def _dequantized(self, start: int, end: int) -> np.ndarray:
+        block = self._vectors[start:end]
+        quantization = self._meta["quantization"]
+        if quantization == "int8":
+            return block.astype(np.float32) / self._scales[start:end, None]
+        if quantization == "binary":
+            signs = np.unpackbits(block, axis=1)[:, :self._meta["dim"]]
+            return signs.astype(np.float32) * 2.0 - 1.0
+        return np.asarray(block, dtype=np.float32)
+
+    def _iter_rows(self, keep=None):
+        """Yield the stored entries in blocks, optionally filtered by a payload predicate."""
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.count)
+            payloads = [self._payload(row) for row in range(start, end)]
+            mask = np.array([keep is None or keep(p) for p in payloads], dtype=bool)
+            if mask.any():
+                selected = [p for p, m in zip(payloads, mask) if m]
+                yield ([p["id"] for p in selected], self._dequantized(start, end)[mask],
+                       [p["text"] for p in selected], [p["metadata"] for p in selected])
+
+    def _rewrite(self, keep=None, extra_batches: list = (), extra_count: int = 0):
+        kept = self.count if keep is None else sum(
+            1 for row in range(self.count) if keep(self._payload(row)))
+        quantization = self._meta["quantization"]
+        extra_meta = {k: v for k, v in self._meta.items() if k not in ("dim", "count", "quantization")}
+        # Materialize before the files we are reading from are swapped out
+        batches = list(self._iter_rows(keep)) + list(extra_batches)
+        self._release()
+        _write_index(self.persist_dir, kept + extra_count, quantization, batches, extra_meta)
+        self._load()
+
+    def _release(self):
+        if self._payloads is not None:
+            self._payloads.close()
+        self._vectors = self._scales = self._offsets = self._payloads = None
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        """Append nodes by rewriting the index; use from_chroma_collection for bulk builds."""
+        if not nodes:
+            return []
+        ids = [node.node_id for node in nodes]
+        batch = (ids, np.asarray([node.get_embedding() for node in nodes], dtype=np.float32),
+                 [node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes],
+                 [node_to_metadata_dict(node, remove_text=True, flat_metadata=False) for node in nodes])
+        self._rewrite(extra_batches=[batch], extra_count=len(nodes))
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._rewrite(keep=lambda payload: payload["metadata"].get("ref_doc_id") != ref_doc_id)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("NumpyVectorStore does not support metadata filters")
+        return self.query_batch([query.query_embedding], query.similarity_top_k)[0]
+
+    def _score_block(self, start: int, end: int, queries: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+        """Similarity of every query against rows [start, end), shape (queries, rows)."""
+        block = self._vectors[start:end]
+        quantization = self._meta["quantization"]
+        if quantization == "int8":
+            return (block.astype(np.float32) @ queries.T).T / self._scales[start:end]
+        if quantization == "binary":
+            hamming = np.stack([_POPCOUNT[np.bitwise_xor(block, bits)].sum(axis=1) for bits in query_bits])
+            return np.cos(np.pi * hamming / self._meta["dim"])
+        return (block @ queries.T).T
+
+    def query_batch(self, query_embeddings: Sequence[Sequence[float]], top_k: int) -> List[VectorStoreQueryResult]:
+        """Exact top-k for several queries in one pass over the matrix."""
+        if self.count == 0:
+            return [VectorStoreQueryResult(nodes=[], similarities=[], ids=[]) for _ in query_embeddings]
+
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        query_bits = np.packbits(queries > 0, axis=1) if self._meta["quantization"] == "binary" else None
+        k = min(top_k, self.count)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.count)
+            scores = np.concatenate([best_scores, self._score_block(start, end, queries, query_bits)], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))],
+                                  axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            nodes = [self._node(int(row)) for row in rows]
+            results.append(VectorStoreQueryResult(
+                nodes=nodes, similarities=[float(s) for s in scores], ids=[n.node_id for n in nodes]))
+        return results
@@ -1,21 +1,150 @@
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, NamedTuple
+from configs import Configs
+from utils.tracing import tracer, annotate
+
+# Statement actions a read-only query may perform; everything else is denied at prepare time.
+READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# How many SQLite VM instructions run between deadline checks.
+PROGRESS_HANDLER_STEPS = 10_000
+
+# Introspection pragmas the pooled connections may run.
+READ_ONLY_PRAGMAS = {"table_info", "table_xinfo", "foreign_key_list", "index_list", "index_info", "schema_version"}
+
+
+def _read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    if action == sqlite3.SQLITE_PRAGMA:
+        return sqlite3.SQLITE_OK if (arg1 or "").lower() in READ_ONLY_PRAGMAS else sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK if action in READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class QueryResult(NamedTuple):
+    columns: List[str]
+    rows: list
+    truncated: bool
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a query runs past its time limit."""
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection became free in time."""
+
+
+class ConnectionPool:
+    """Fixed-size pool of read-only connections, checked out for one request at a time.
+
+    Every connection runs with the read-only authorizer, query_only and the mmap/cache pragmas, and
+    carries a progress handler that interrupts statements once the checkout's deadline has passed.
+    """
+
+    def __init__(self, db_file: str, size: int = Configs.SQLITE_POOL_SIZE,
+                 mmap_size: int = Configs.SQLITE_MMAP_SIZE, cache_size_kib: int = Configs.SQLITE_CACHE_SIZE_KIB):
+        self.db_file = db_file
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._deadlines = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)};")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kib)};")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA query_only=1;")
+        conn.set_authorizer(_read_only_authorizer)
+        conn.set_progress_handler(lambda: int(time.monotonic() > self._deadlines.get(id(conn), float("inf"))),
+                                  PROGRESS_HANDLER_STEPS)
+        return conn
+
+    @contextmanager
+    def connection(self, timeout_s: float = None, wait_s: float = None):
+        """Check out a connection; statements on it are interrupted after timeout_s seconds.
+
+        Waits at most wait_s (default: timeout_s) for a free connection, then raises PoolTimeoutError.
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                wait_s = timeout_s if wait_s is None else wait_s
+                try:
+                    conn = self._idle.get(timeout=wait_s)
+                except queue.Empty:
+                    raise PoolTimeoutError(f"no free connection to {self.db_file} after {wait_s}s "
+                                           f"(pool of {self.size})") from None
+
+        if timeout_s:
+            self._deadlines[id(conn)] = time.monotonic() + timeout_s
+        try:
+            yield conn
+        finally:
+            self._deadlines.pop(id(conn), None)
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 
 class SQLiteDatabase:
-    def __init__(self, db_file: str):
-        """Initialize the SQLiteDatabase object with a given database file."""
+    def __init__(self, db_file: str, sample_rows: int = 3, result_cache=None,
+                 pool_size: int = Configs.SQLITE_POOL_SIZE, query_timeout_s: float = Configs.SQLITE_QUERY_TIMEOUT_S,
+                 max_rows: int = Configs.SQL_MAX_ROWS):
+        """Initialize the SQLiteDatabase object with a given database file.
+
+        Queries run on a pool of read-only connections with a per-query time limit and are capped at
+        max_rows rows. result_cache, if given, is an object with get(sql, data_version) /
+        put(sql, data_version, result) used to serve repeated queries.
+        """
         self.db_file = db_file
-        self.db_conn = sqlite3.connect(db_file, check_same_thread=False)
-        print(f" - DB CONNECTED: {db_file}")
+        self.sample_rows = sample_rows
+        self.result_cache = result_cache
+        self.query_timeout_s = query_timeout_s
+        self.max_rows = max_rows
+        # A separate read-only connection tracks data_version / schema_version. The query layer never
+        # changes the file (journal mode included); db/bulk_import.py sets WAL at load time.
+        self.db_conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        self.pool = ConnectionPool(db_file, size=pool_size)
+        self._schema = None
+        self._schema_version = None
+        self._schema_lock = threading.Lock()
+        if Configs.WRITE_LOGS:
+            logging.info(f"DB connected: {db_file} (pool of {pool_size})")
 
     def list_tables(self) -> list[str]:
         """Retrieve the names of all tables in the database."""
-        print(' - DB CALL: list_tables()')
-        cursor = self.db_conn.cursor()
-
-        # Fetch the table names.
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-
-        tables = cursor.fetchall()
+        if Configs.WRITE_LOGS:
+            logging.info("DB call: list_tables()")
+        with self.pool.connection(self.query_timeout_s) as conn:
+            # Fetch the table names.
+            tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table';").fetchall()
         return [t[0] for t in tables]
 
     def describe_table(self, table_name: str) -> list[tuple[str, str]]:
@@ -24,26 +153,177 @@ class SQLiteDatabase:
         Returns:
           List of columns, where each entry is a tuple of (column, type).
         """
-        print(f' - DB CALL: describe_table({table_name})')
-
-        cursor = self.db_conn.cursor()
-
-        cursor.execute(f"PRAGMA table_info({table_name});")
-
-        schema = cursor.fetchall()
+        if Configs.WRITE_LOGS:
+            logging.info(f"DB call: describe_table({table_name})")
+        quoted = '"' + table_name.replace('"', '""') + '"'
+        with self.pool.connection(self.query_timeout_s) as conn:
+            schema = conn.execute(f"PRAGMA table_info({quoted});").fetchall()
         # [column index, column name, column type, ...]
         return [(col[1], col[2]) for col in schema]
 
     def execute_query(self, sql: str) -> list[list[str]]:
-        """Execute an SQL statement, returning the results."""
-        print(f' - DB CALL: execute_query({sql})')
+        """Execute an SQL statement, returning at most max_rows result rows."""
+        return self.fetch(sql).rows
+
+    def fetch(self, sql: str) -> QueryResult:
+        """Run a read-only query with the time limit, streaming at most max_rows rows via fetchmany.
+
+        Raises QueryTimeoutError when the limit is hit and sqlite3.DatabaseError for writes.
+        """
+        with tracer.span("db.execute") as span:
+            result = self._fetch(sql)
+            span.set(rows=len(result.rows), truncated=result.truncated)
+            return result
+
+    def _fetch(self, sql: str) -> QueryResult:
+        max_rows = self.max_rows
+        if Configs.WRITE_LOGS:
+            logging.info(f"DB call: execute_query({sql})")
+
+        version = self.data_version() if self.result_cache is not None else None
+        if version is not None:
+            result = self.result_cache.get(sql, version)
+            annotate(cache_hit=result is not None)
+            if result is not None:
+                return result
+
+        started = time.perf_counter()
+        with self.pool.connection(self.query_timeout_s) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql)
+                rows = []
+                while len(rows) <= max_rows:
+                    batch = cursor.fetchmany(min(500, max_rows + 1 - len(rows)))
+                    if not batch:
+                        break
+                    rows.extend(batch)
+            except sqlite3.OperationalError as e:
+                if str(e) == "interrupted":
+                    raise QueryTimeoutError(f"query exceeded the {self.query_timeout_s}s time limit") from e
+                raise
+            finally:
+                cursor.close()
+            columns = [d[0] for d in cursor.description or []]
+
+        result = QueryResult(columns, rows[:max_rows], len(rows) > max_rows)
+        if Configs.WRITE_LOGS:
+            logging.info(f"DB query returned {len(result.rows)} rows{' (truncated)' if result.truncated else ''} "
+                         f"in {time.perf_counter() - started:.3f}s")
+        if version is not None:
+            self.result_cache.put(sql, version, result)
+        return result
+
+    def format_result(self, result: QueryResult, max_chars: int = Configs.SQL_RESULT_MAX_CHARS) -> str:
+        """Render a result for the LLM, with a note when rows or characters were cut."""
+        lines = [" | ".join(result.columns)] if result.columns else []
+        shown = 0
+        for row in result.rows:
+            line = " | ".join(str(v) for v in row)
+            if sum(len(l) + 1 for l in lines) + len(line) > max_chars:
+                break
+            lines.append(line)
+            shown += 1
+        if not result.rows:
+            lines.append("(no rows)")
+        elif result.truncated or shown < len(result.rows):
+            total = f"more than {len(result.rows)}" if result.truncated else str(len(result.rows))
+            lines.append(f"... showing {shown} of {total} rows. Use aggregation, filters or LIMIT "
+                         f"to get a smaller result.")
+        return "\n".join(lines)
 
-        cursor = self.db_conn.cursor()
+    def data_version(self) -> tuple:
+        """Token that changes whenever the database contents may have changed.
 
-        cursor.execute(sql)
-        return cursor.fetchall()
+        Combines PRAGMA data_version (bumped by commits from other connections; this layer's own
+        connections are read-only) and the modification times of the database and WAL files.
+        """
+        with self._conn_lock:
+            pragma_version = self.db_conn.execute("PRAGMA data_version;").fetchone()[0]
+        mtimes = tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+                       for path in (self.db_file, f"{self.db_file}-wal"))
+        return (pragma_version,) + mtimes
+
+    def schema_version(self) -> int:
+        """SQLite's schema cookie; it changes whenever any table, index or view is altered."""
+        with self._conn_lock:
+            return self.db_conn.execute("PRAGMA schema_version;").fetchone()[0]
+
+    def schema(self) -> dict:
+        """Structured schema of all user tables, rebuilt only when PRAGMA schema_version changes.
+
+        Returns:
+          {table: {"columns": [(name, type, notnull, pk)], "foreign_keys": [(column, ref_table, ref_column)],
+                   "indexes": [(name, unique, [columns])], "samples": [row, ...]}}
+        """
+        with self._schema_lock:
+            version = self.schema_version()
+            if self._schema is None or version != self._schema_version:
+                self._schema = self._read_schema()
+                self._schema_version = version
+            return self._schema
+
+    def _read_schema(self) -> dict:
+        with self.pool.connection(self.query_timeout_s) as conn:
+            return self._read_schema_from(conn.cursor())
+
+    def _read_schema_from(self, cursor) -> dict:
+        tables = [row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name;")]
+        schema = {}
+        for table in tables:
+            quoted = '"' + table.replace('"', '""') + '"'
+            columns = [(col[1], col[2], bool(col[3]), bool(col[5]))
+                       for col in cursor.execute(f"PRAGMA table_info({quoted});")]
+            foreign_keys = [(fk[3], fk[2], fk[4]) for fk in cursor.execute(f"PRAGMA foreign_key_list({quoted});")]
+            indexes = []
+            for index in cursor.execute(f"PRAGMA index_list({quoted});").fetchall():
+                index_quoted = '"' + index[1].replace('"', '""') + '"'
+                index_columns = [col[2] for col in cursor.execute(f"PRAGMA index_info({index_quoted});")]
+                indexes.append((index[1], bool(index[2]), index_columns))
+            samples = cursor.execute(f"SELECT * FROM {quoted} LIMIT ?;", (self.sample_rows,)).fetchall()
+            schema[table] = {"columns": columns, "foreign_keys": foreign_keys, "indexes": indexes, "samples": samples}
+        return schema
+
+    def schema_snapshot(self) -> str:
+        """Compact text rendering of schema() for LLM prompts."""
+        def short(value):
+            text = repr(value)
+            return text if len(text) <= 40 else text[:37] + "..."
+
+        lines = []
+        for table, info in self.schema().items():
+            references = {column: f"{ref_table}.{ref_column}" for column, ref_table, ref_column in info["foreign_keys"]}
+            columns = []
+            for name, col_type, notnull, pk in info["columns"]:
+                column = f"{name} {col_type}".strip()
+                if pk:
+                    column += " PRIMARY KEY"
+                elif notnull:
+                    column += " NOT NULL"
+                if name in references:
+                    column += f" REFERENCES {references[name]}"
+                columns.append(column)
+            lines.append(f"TABLE {table} ({', '.join(columns)})")
+            for name, unique, index_columns in info["indexes"]:
+                lines.append(f"  {'UNIQUE ' if unique else ''}INDEX {name} ({', '.join(index_columns)})")
+            if info["samples"]:
+                lines.append("  sample rows: " + "; ".join(
+                    "(" + ", ".join(short(v) for v in row) + ")" for row in info["samples"]))
+        return "\n".join(lines)
+
+    def validate_query(self, sql: str) -> list:
+        """Check that sql is a single read-only statement that SQLite can plan, without running it.
+
+        Returns the EXPLAIN QUERY PLAN rows; raises sqlite3.Error (including
+        sqlite3.DatabaseError "not authorized" for writes) if the statement is rejected.
+        """
+        with tracer.span("db.validate"), self.pool.connection(self.query_timeout_s) as conn:
+            return conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
 
     def close(self):
-        """Close the database connection."""
+        """Close the database connections."""
+        self.pool.close()
         self.db_conn.close()
-        print(f" - DB CONNECTION CLOSED")
+        if Configs.WRITE_LOGS:
+            logging.info("DB connection closed")
@@ -1,22 +1,42 @@
 import os
 import shutil
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext
-from llama_index.core.node_parser import SentenceSplitter, SimpleNodeParser, SemanticSplitterNodeParser
+import logging
+from llama_index.core import VectorStoreIndex, Settings
+from llama_index.core.node_parser import SimpleNodeParser
 from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.embeddings.openai import OpenAIEmbedding
 import chromadb
 from chromadb.errors import InvalidCollectionException
-from typing import List
+from typing import List, Optional
+from db.ingestion_manifest import IngestionManifest
+from db.ingestion_pipeline import IngestionPipeline
+from configs import Configs
 
 class VectorDBManager:
-    def __init__(self, db_dir: str, new_documents_dir: str, processed_documents_dir: str, db_name: str):
+    def __init__(self, db_dir: str, new_documents_dir: str, processed_documents_dir: str, db_name: str,
+                 manifest_path: str = None, embed_model=None, config: Configs = None,
+                 failed_documents_dir: str = None):
+        config = config or Configs()
         self.db_dir = db_dir
         self.new_documents_dir = new_documents_dir
         self.processed_documents_dir = processed_documents_dir
+        self.failed_documents_dir = failed_documents_dir or config.FAILED_DOCUMENTS_DIR
         self.db_name = db_name
         self.client = chromadb.PersistentClient(path=db_dir)
         self.collection = self._get_or_create_collection()
         self.node_parser = SimpleNodeParser.from_defaults()
+        self.embed_model = embed_model or Settings.embed_model
+        self.manifest = IngestionManifest(manifest_path or os.path.join(db_dir, "ingestion_manifest.json"))
+        self.pipeline = IngestionPipeline(
+            collection=self.collection,
+            embed_model=self.embed_model,
+            manifest=self.manifest,
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP,
+            parse_workers=config.INGEST_WORKERS,
+            embed_batch_size=config.EMBED_BATCH_SIZE,
+            embed_concurrency=config.EMBED_CONCURRENCY,
+            write_batch_size=config.CHROMA_WRITE_BATCH_SIZE
+        )
 
         # Ensure directories exist
         os.makedirs(self.new_documents_dir, exist_ok=True)
@@ -33,8 +53,8 @@ class VectorDBManager:
                 return collection 
             return collection  # Return the existing, non-empty collection
         
-        except InvalidCollectionException:
-            # If the collection doesn't exist, create it 
+        except (InvalidCollectionException, ValueError):
+            # If the collection doesn't exist, create it (chromadb 0.4 raises ValueError here)
             return self.client.create_collection(self.db_name) 
 
         except Exception as e:
@@ -42,45 +62,91 @@ class VectorDBManager:
             print(f"An error occurred: {str(e)}")
             raise
 
+    @property
+    def corpus_version(self) -> int:
+        """Monotonic counter bumped whenever ingestion changes the collection."""
+        return self.manifest.version
+
     def get_new_files(self) -> List[str]:
         return [f for f in os.listdir(self.new_documents_dir)
                 if os.path.isfile(os.path.join(self.new_documents_dir, f))]
 
-    def process_new_documents(self) -> VectorStoreIndex:
+    def process_new_documents(self) -> Optional[VectorStoreIndex]:
+        """Ingest files from the new documents directory, re-embedding only what changed.
+
+        On the first run against a collection built before the manifest existed, entries the
+        manifest does not own are deleted and processed documents it does not list are ingested
+        again, so each document is stored once, under its content-hashed chunk ids.
+
+        Returns an index over the collection if anything changed, otherwise None.
+        """
         new_files = self.get_new_files()
+        changed = self._remove_deleted_files(new_files)
+        reingest = []
+        if not self.manifest.reconciled:
+            changed = self._remove_unowned_entries() or changed
+            reingest = [f for f in os.listdir(self.processed_documents_dir)
+                        if os.path.isfile(os.path.join(self.processed_documents_dir, f))
+                        and f not in self.manifest.files and f not in new_files]
+            if not reingest:
+                self.manifest.reconciled = True
+                self.manifest.save()
 
-        if not new_files:
+        if not new_files and not reingest and not changed:
             return None  # No new documents to process
 
-        # Load and process new documents
-        new_docs = SimpleDirectoryReader(
-            input_files=[os.path.join(self.new_documents_dir, f) for f in new_files],
-            filename_as_id=True
-        ).load_data()        
+        if changed:
+            self.manifest.save()
 
-        # Insert into index
-        splitter = SentenceSplitter(chunk_size=512, chunk_overlap=70)
-        
         # Semantic chunking
         # embed_model = OpenAIEmbedding()
         # splitter = SemanticSplitterNodeParser(
         #     buffer_size=1, breakpoint_percentile_threshold=95, embed_model=embed_model)
-        
-        nodes = splitter.get_nodes_from_documents(new_docs)
+
+        files = [(f, os.path.join(self.new_documents_dir, f)) for f in new_files]
+        files += [(f, os.path.join(self.processed_documents_dir, f)) for f in reingest]
+        changed = self.pipeline.run(files, on_file_done=self._move_to_processed,
+                                    on_file_failed=self._move_to_failed) or changed
+        if reingest:
+            self.manifest.reconciled = True
+            self.manifest.save()
+
+        if not changed:
+            return None
         vector_store = ChromaVectorStore(chroma_collection=self.collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        index = VectorStoreIndex(nodes=nodes, storage_context=storage_context,show_progress=True)
-
-        # Move processed files
-        for filename in new_files:
-            shutil.move(os.path.join(self.new_documents_dir, filename),
-                        os.path.join(self.processed_documents_dir, filename))
-
-        # Update the ChromaDB collection
-        self.collection.add(
-            ids=[doc.doc_id for doc in new_docs],
-            documents=[doc.text for doc in new_docs],
-            metadatas=[doc.metadata for doc in new_docs]
-        )
+        return VectorStoreIndex.from_vector_store(vector_store, embed_model=self.embed_model)
+
+    def _remove_deleted_files(self, new_files: List[str]) -> bool:
+        """Drop chunks of manifest entries whose file is in neither documents directory."""
+        processed_files = set(os.listdir(self.processed_documents_dir))
+        deleted = [f for f in self.manifest.files if f not in processed_files and f not in new_files]
+        for filename in deleted:
+            stale_ids = list(self.manifest.remove_file(filename))
+            if stale_ids:
+                self.collection.delete(ids=stale_ids)
+            logging.info(f"Removed {len(stale_ids)} chunks of deleted document: {filename}")
+        return bool(deleted)
+
+    def _remove_unowned_entries(self) -> bool:
+        """Delete collection entries that no manifest file owns (e.g. written before the manifest existed)."""
+        owned = self.manifest.chunk_ids()
+        unowned = [i for i in self.collection.get(include=[])["ids"] if i not in owned]
+        for start in range(0, len(unowned), 5000):
+            self.collection.delete(ids=unowned[start:start + 5000])
+        if unowned:
+            self.manifest.version += 1
+            logging.info(f"Removed {len(unowned)} entries not owned by any manifest file")
+        return bool(unowned)
+
+    def _move_to_processed(self, filename: str):
+        source = os.path.join(self.new_documents_dir, filename)
+        if os.path.exists(source):  # files re-ingested from the processed directory stay where they are
+            shutil.move(source, os.path.join(self.processed_documents_dir, filename))
 
-        return index
+    def _move_to_failed(self, filename: str):
+        """Quarantine a file that could not be parsed so resumed runs do not retry it; fix it and move it back to retry."""
+        os.makedirs(self.failed_documents_dir, exist_ok=True)
+        source = os.path.join(self.new_documents_dir, filename)
+        if not os.path.exists(source):
+            source = os.path.join(self.processed_documents_dir, filename)
+        shutil.move(source, os.path.join(self.failed_documents_dir, filename))
@@ -1,55 +1,348 @@
-from db.vector_db_manager import VectorDBManager
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext
-from retriever import Retriever
-from chat_engine import ChatEngine
-from agents.data_agent import SqliteAgent
-from llama_index.llms.openai import OpenAI
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, ContextManager
 from configs import Configs
+from utils.streaming import TimedStream
+from utils.lru_cache import LRUCache
+from utils.tracing import tracer, serve_metrics
 
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from llama_index.core import VectorStoreIndex
+    from conversation_memory import ConversationMemory
+    from db.numpy_vector_store import NumpyVectorStore
+    from router import IntentRouter
+
 class Generator:
-    def __init__(self):
-        self.config = Configs()
+    """Entry point for RAG chat and SQL questions.
+
+    Subsystems are built on first use, so a process that only answers SQL questions never loads
+    the vector stack and vice versa. Heavy libraries (llama_index, langchain, chromadb) are
+    imported inside the builders rather than at module import.
+
+    config is passed to every subsystem built here (paths, models, chunking, retrieval, memory,
+    caches, router and SQL settings). Process-wide settings are still read from the Configs class:
+    WRITE_LOGS, LOG_LEVEL, tracing, and the prompt templates other than SYSTEM_PROMPT and FAST_SQL_PROMPT.
+    """
+
+    def __init__(self, config: Configs = None, llm=None, embed_model=None, sql_llm=None):
+        """All arguments are optional; llm / embed_model / sql_llm replace the OpenAI clients
+        (e.g. with the local stand-ins in benchmarks/fakes.py)."""
+        self.config = config or Configs()
         load_dotenv()
+        self._llm = llm
+        self._base_embed_model = embed_model
+        self._sql_llm = sql_llm
+        self.memories = LRUCache(self.config.MEMORY_MAX_SESSIONS)
+        self.startup_timings = {}
+        self._components = {}
+        self._init_lock = threading.RLock()
+        if self.config.METRICS_PORT:
+            serve_metrics(self.config.METRICS_PORT)
+
+    def _component(self, name: str, build: Callable):
+        """Build a subsystem once, recording how long it took (including its dependencies)."""
+        with self._init_lock:
+            if name not in self._components:
+                start = time.perf_counter()
+                self._components[name] = build()
+                self.startup_timings[name] = time.perf_counter() - start
+                if self.config.WRITE_LOGS:
+                    logging.info(f"Generator: built {name} in {self.startup_timings[name]:.3f}s")
+            return self._components[name]
+
+    def startup_report(self) -> str:
+        """Human-readable build times of the subsystems initialized so far"""
+        lines = [f"{name:<14} {seconds:8.3f}s" for name, seconds in self.startup_timings.items()]
+        return "\n".join(lines) or "no subsystems initialized yet"
+
+    @property
+    def embed_model(self):
+        def build():
+            from llama_index.embeddings.openai import OpenAIEmbedding
+            from db.embedding_cache import EmbeddingCache, CachedEmbedding
+            # Shared by ingestion and query embedding so repeated texts never hit the API twice
+            return CachedEmbedding(
+                self._base_embed_model or OpenAIEmbedding(model=self.config.EMBEDDING_MODEL,
+                                                          embed_batch_size=self.config.EMBED_BATCH_SIZE),
+                EmbeddingCache(self.config.EMBEDDING_CACHE_PATH, self.config.EMBEDDING_CACHE_MAX_ENTRIES)
+            )
+        return self._component("embed_model", build)
+
+    @property
+    def vector_db(self):
+        def build():
+            from db.vector_db_manager import VectorDBManager
+            return VectorDBManager(
+                db_dir=self.config.VECTOR_DB_DIR,
+                new_documents_dir=self.config.NEW_DOCUMENTS_DIR,
+                processed_documents_dir=self.config.PROCESSED_DOCUMENTS_DIR,
+                failed_documents_dir=self.config.FAILED_DOCUMENTS_DIR,
+                db_name=self.config.DB_NAME,
+                manifest_path=self.config.INGEST_MANIFEST_PATH,
+                embed_model=self.embed_model,
+                config=self.config
+            )
+        return self._component("vector_db", build)
 
-        # Initialize VectorDBManager
-        self.vector_db = VectorDBManager(
-            db_dir=self.config.VECTOR_DB_DIR,
-            new_documents_dir=self.config.NEW_DOCUMENTS_DIR,
-            processed_documents_dir=self.config.PROCESSED_DOCUMENTS_DIR,
-            db_name=self.config.DB_NAME
-        )
+    @property
+    def index(self) -> VectorStoreIndex:
+        return self._component("index", self._initialize_index)
 
-        # Initialize or load the index
-        self.index = self._initialize_index()
+    @property
+    def retriever(self):
+        def build():
+            from retriever import Retriever
+            from context_packer import ContextPacker
+            return Retriever(self.index, self.config.SIMILARITY_TOP_K,
+                             ContextPacker(self.config.CONTEXT_TOKEN_BUDGET, self.config.CONTEXT_METADATA_KEYS),
+                             self.config.RETRIEVAL_WORKERS)
+        return self._component("retriever", build)
 
-        # Initialize Retriever and ChatEngine
-        self.retriever = Retriever(self.index)
-        self.llm = OpenAI(model=self.config.MODEL_NAME, temperature=0.5)
-        self.chat_engine = ChatEngine(self.llm, self.retriever)
-        self.sql_agent = SqliteAgent(db_file=Configs.SQLITE_DB_DIR)
+    @property
+    def llm(self):
+        def build():
+            if self._llm is not None:
+                return self._llm
+            from llama_index.llms.openai import OpenAI
+            return OpenAI(model=self.config.MODEL_NAME, temperature=0.5)
+        return self._component("llm", build)
+
+    @property
+    def chat_engine(self):
+        def build():
+            from chat_engine import ChatEngine
+            return ChatEngine(self.llm, self.retriever, semantic_cache=self.semantic_cache, config=self.config)
+        return self._component("chat_engine", build)
+
+    @property
+    def semantic_cache(self):
+        def build():
+            if not self.config.SEMANTIC_CACHE_ENABLED:
+                return None
+            from semantic_cache import SemanticCache
+            from db.ingestion_manifest import IngestionManifest
+            # Tagged with the ingestion manifest as saved on disk, so new documents invalidate cached
+            # answers even when another process (the CLI, a migration, a second server) ingested them
+            manifest_path = self.config.INGEST_MANIFEST_PATH
+            return SemanticCache(self.embed_model, self.config.SEMANTIC_CACHE_THRESHOLD,
+                                 self.config.SEMANTIC_CACHE_MAX_ENTRIES, self.config.SEMANTIC_CACHE_TTL_S,
+                                 version_provider=lambda: (
+                self.vector_db.corpus_version, IngestionManifest.disk_stamp(manifest_path)))
+        return self._component("semantic_cache", build)
+
+    @property
+    def sql_agent(self):
+        def build():
+            from agents.data_agent import SqliteAgent
+            return SqliteAgent(db_file=self.config.SQLITE_DB_DIR, llm=self._sql_llm, config=self.config)
+        return self._component("sql_agent", build)
+
+    @property
+    def router(self) -> IntentRouter:
+        def build():
+            from router import IntentRouter
+            # Schema terms come from the SQL agent's cached schema, refreshed on schema_version changes
+            return IntentRouter(schema_provider=lambda: self.sql_agent.db.schema(),
+                                examples=self.config.ROUTER_EXAMPLES, weights=self.config.ROUTER_WEIGHTS,
+                                example_margin=self.config.ROUTER_EXAMPLE_MARGIN)
+        return self._component("router", build)
 
     def _initialize_index(self) -> VectorStoreIndex:
         """Initialize or load index with automatic file handling"""
+        from llama_index.core import VectorStoreIndex, StorageContext
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
         index = self.vector_db.process_new_documents()
 
+        if self.config.VECTOR_BACKEND == "numpy":
+            return VectorStoreIndex.from_vector_store(self._load_numpy_store(), embed_model=self.embed_model)
+
         if index is None:
             # If no new documents, load the existing index
             index = VectorStoreIndex.from_vector_store(
                 ChromaVectorStore(self.vector_db.collection),
                 storage_context=StorageContext.from_defaults(
                     vector_store=ChromaVectorStore(self.vector_db.collection)
-                )
+                ),
+                embed_model=self.embed_model
             )
         return index
 
-    def chat(self, query: str, chat_history: list = None, use_context: bool = True) -> str:
+    def _load_numpy_store(self) -> NumpyVectorStore:
+        """Open the memory-mapped index, re-exporting it from Chroma if ingestion changed the corpus."""
+        from db.numpy_vector_store import NumpyVectorStore
+
+        store = NumpyVectorStore(persist_dir=self.config.NUMPY_INDEX_DIR)
+        if (store.meta.get("source_version") != self.vector_db.corpus_version
+                or store.meta["quantization"] != self.config.VECTOR_QUANTIZATION):
+            store = NumpyVectorStore.from_chroma_collection(
+                self.vector_db.collection, self.config.NUMPY_INDEX_DIR,
+                quantization=self.config.VECTOR_QUANTIZATION,
+                extra_meta={"source_version": self.vector_db.corpus_version,
+                            "embedding_model": self.config.EMBEDDING_MODEL}
+            )
+        return store
+
+    def new_memory(self) -> ConversationMemory:
+        """Fresh conversation memory; only needs the LLM, not the retrieval stack"""
+        from conversation_memory import ConversationMemory
+        return ConversationMemory(self.llm, self.config.MEMORY_TOKEN_BUDGET, self.config.MEMORY_RECENT_TURNS,
+                                  self.config.MEMORY_SUMMARY_MAX_TOKENS)
+
+    def get_memory(self, session_id: str) -> ConversationMemory:
+        """Conversation memory for a session, kept so its rolling summary is not recomputed"""
+        memory = self.memories.get(session_id)
+        if memory is None:
+            memory = self.new_memory()
+            self.memories.put(session_id, memory)
+        return memory
+
+    def _memory_for(self, chat_history: list, memory: ConversationMemory = None) -> ConversationMemory:
+        """memory if given, else the kept memory of the conversation chat_history belongs to.
+
+        Callers that pass only the history still get an incrementally folded summary instead of
+        re-summarizing every aged-out turn on each call.
+        """
+        if memory is not None or not chat_history:
+            return memory
+        from conversation_memory import conversation_key
+        return self.get_memory(f"history:{conversation_key(chat_history)}")
+
+    def chat(self, query: str, chat_history: list = None, use_context: bool = True,
+             memory: ConversationMemory = None) -> str:
         """Public interface for chat functionality"""
-        return self.chat_engine.chat(query, chat_history, use_context)
+        with tracer.span("generator.chat", use_context=use_context):
+            return self.chat_engine.chat(query, chat_history, use_context, self._memory_for(chat_history, memory))
+
+    async def achat(self, query: str, chat_history: list = None, use_context: bool = True,
+                    memory: ConversationMemory = None) -> str:
+        """Async interface for chat functionality"""
+        with tracer.span("generator.achat", use_context=use_context):
+            return await self.chat_engine.achat(query, chat_history, use_context,
+                                                self._memory_for(chat_history, memory))
+
+    def chat_batch(self, items: list, use_context: bool = True, concurrency: int = None,
+                   on_result: Callable[[dict], None] = None) -> list:
+        """Answer many questions with batched embedding and retrieval and concurrent LLM calls.
+
+        items are dicts with "query" and optionally "history", "id" and "use_context"; results come
+        back in input order, and on_result sees each one as soon as it is ready. See batch.BatchChat.
+        Must not be called from a running event loop; use achat_batch there.
+        """
+        return asyncio.run(self.achat_batch(items, use_context, concurrency, on_result))
+
+    async def achat_batch(self, items: list, use_context: bool = True, concurrency: int = None,
+                          on_result: Callable[[dict], None] = None) -> list:
+        from batch import BatchChat
+        runner = BatchChat(self.chat_engine, self.embed_model, concurrency or self.config.BATCH_CONCURRENCY,
+                           self.config.BATCH_CHUNK_SIZE, self.config.BATCH_MAX_RETRIES, self.config.BATCH_BACKOFF_S)
+        return await runner.run(items, use_context, on_result)
 
     def sql_query(self, query: str, chat_history: list = None, use_context: bool = True) -> str:
         """Public interface for chat functionality"""
-        response = self.sql_agent.sql_agent_query(query)
-        return response['messages'][-1].content
\ No newline at end of file
+        return self.sql_response(query)['messages'][-1].content
+
+    def sql_response(self, query: str) -> dict:
+        """Full SQL agent result: {"messages", "sql", "path", "llm_calls", ...}"""
+        with tracer.span("generator.sql_query") as span:
+            response = self.sql_agent.sql_agent_query(query)
+            span.set(path=response['path'])
+        if self.config.WRITE_LOGS:
+            logging.info(f"sql_query: path={response['path']} llm_calls={response['llm_calls']}")
+        return response
+
+    def answer(self, query: str, chat_history: list = None, memory: ConversationMemory = None,
+               fallback_slot: Callable[[str], ContextManager] = None) -> dict:
+        """Route a question to RAG chat or the SQL agent with the local intent router.
+
+        When the router is unsure, the path it leans to runs first and the other one only if that
+        does not give a usable answer: an SQL answer is usable only if one of its queries succeeded,
+        a chat answer only if it does not say the documents lack the information
+        (ROUTER_CHAT_UNUSABLE_PATTERN). fallback_slot(label), if given, is entered around the
+        second path (e.g. the server's admission limit for that backend).
+
+        Returns:
+            dict: {"answer", "route" ("chat" or "sql", the path that answered), "confidence", "fell_back"}
+        """
+        with tracer.span("generator.answer") as span:
+            route = self.router.route(query)
+            span.set(route=route.label, confidence=route.confidence)
+            if route.confidence >= self.config.ROUTER_MIN_CONFIDENCE:
+                if route.label == "sql":
+                    answer = self.sql_query(query)
+                else:
+                    answer = self.chat(query, chat_history, memory=memory)
+                return {"answer": answer, "route": route.label, "confidence": route.confidence, "fell_back": False}
+
+            label, answer = self._with_fallback(query, route.label, chat_history, memory, fallback_slot)
+            span.set(answered_by=label)
+            return {"answer": answer, "route": label, "confidence": route.confidence,
+                    "fell_back": label != route.label}
+
+    def _with_fallback(self, query: str, first: str, chat_history: list, memory: ConversationMemory,
+                       fallback_slot: Callable[[str], ContextManager] = None) -> tuple:
+        """Try the `first` path, then the other one if it is unusable; return (label, answer).
+
+        Paths run one after the other, so a question costs a second path's LLM calls only when the
+        first one gave nothing usable. If neither is usable, the first unusable answer is returned.
+        """
+        unusable = None
+        for label in (first, "sql" if first == "chat" else "chat"):
+            try:
+                with fallback_slot(label) if fallback_slot and label != first else nullcontext():
+                    if label == "chat":
+                        answer = self.chat(query, chat_history, True, memory)
+                        usable = self.chat_answer_usable(answer)
+                    else:
+                        result = self.sql_response(query)
+                        answer, usable = result["messages"][-1].content, result.get("sql") is not None
+            except Exception as e:
+                logging.warning(f"answer: {label} path failed: {e}")
+                continue
+            if usable:
+                return label, answer
+            unusable = unusable or (label, answer)
+        if unusable is None:
+            raise RuntimeError(f"Neither chat nor the SQL agent could answer: {query!r}")
+        return unusable
+
+    def chat_answer_usable(self, answer: str) -> bool:
+        """False if a chat answer says the documents do not cover the question."""
+        return bool(answer.strip()) and not re.search(self.config.ROUTER_CHAT_UNUSABLE_PATTERN, answer, re.IGNORECASE)
+
+    def stream_answer(self, query: str, chat_history: list = None, memory: ConversationMemory = None,
+                      fallback_slot: Callable[[str], ContextManager] = None) -> tuple:
+        """Streaming variant of answer; returns (route, TimedStream).
+
+        Confident routes stream from the chosen path; an unsure route's answer (see answer)
+        arrives in one piece.
+        """
+        route = self.router.route(query)
+        if route.confidence >= self.config.ROUTER_MIN_CONFIDENCE:
+            if route.label == "sql":
+                return route, self.stream_sql_query(query, chat_history)
+            return route, self.stream_chat(query, chat_history, memory=memory)
+
+        def with_fallback():
+            yield self._with_fallback(query, route.label, chat_history, memory, fallback_slot)[1]
+        return route, TimedStream(tracer.iterate("generator.stream_answer", with_fallback()), name="stream_answer")
+
+    def stream_chat(self, query: str, chat_history: list = None, use_context: bool = True,
+                    memory: ConversationMemory = None) -> TimedStream:
+        """Streaming variant of chat; iterate the result for token deltas, then read .latency"""
+        tokens = self.chat_engine.stream_chat(query, chat_history, use_context, self._memory_for(chat_history, memory))
+        return TimedStream(tracer.iterate("generator.stream_chat", tokens, use_context=use_context), name="stream_chat")
+
+    def stream_sql_query(self, query: str, chat_history: list = None, use_context: bool = True) -> TimedStream:
+        """Streaming variant of sql_query; iterate the result for token deltas, then read .latency"""
+        tokens = tracer.iterate("generator.stream_sql_query", self.sql_agent.stream_sql_agent_query(query))
+        return TimedStream(tokens, name="stream_sql_query")
+
@@ -1,9 +1,30 @@
+import argparse
+import json
+import logging
+from configs import Configs
 from generator import Generator
 
 def main():
+    parser = argparse.ArgumentParser(description="Ask one question, or answer a JSONL file of questions in batch.")
+    parser.add_argument("query", nargs="?", default="What is machine learning?")
+    parser.add_argument("--batch", metavar="INPUT_JSONL",
+                        help='one question per line: {"query": ..., "history": [...], "id": ...}')
+    parser.add_argument("--output", default="batch_answers.jsonl", help="answers JSONL; resumed if it exists")
+    parser.add_argument("--concurrency", type=int, default=Configs.BATCH_CONCURRENCY)
+    parser.add_argument("--no-context", action="store_true", help="answer without retrieval")
+    parser.add_argument("--restart", action="store_true", help="overwrite --output instead of resuming")
+    args = parser.parse_args()
+
     generator = Generator()
-    query = "What is machine learning?"
-    response = generator.chat(query)
+    if args.batch:
+        from batch import run_batch
+        logging.basicConfig(level=Configs.LOG_LEVEL)
+        summary = run_batch(generator, args.batch, args.output, use_context=not args.no_context,
+                            concurrency=args.concurrency, resume=not args.restart)
+        print(json.dumps(summary, indent=2))
+        return
+
+    response = generator.chat(args.query)
     print(response)
 
 if __name__ == "__main__":
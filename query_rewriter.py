@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import re
+from llama_index.core.llms import ChatMessage, LLM
+from configs import Configs
+from utils.tracing import tracer, record_llm_call
+from utils.lru_cache import LRUCache
+
+REFERENCE_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "theirs",
+    "he", "him", "his", "she", "her", "hers", "there", "such", "same", "former", "latter",
+    "one", "ones", "above", "previous", "else",
+}
+ELLIPSIS_PREFIXES = ("and ", "or ", "but ", "also ", "what about", "how about", "why not", "what else", "more ")
+GREETING = re.compile(
+    r"^(hi|hello|hey|thanks|thank you|thx|bye|goodbye|ok|okay|cool|great|"
+    r"good (morning|afternoon|evening|night))\b"
+)
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "do", "does", "did", "of", "to", "in",
+    "on", "for", "with", "at", "by", "from", "about", "as", "and", "or", "but", "if", "then", "so",
+    "what", "which", "who", "whom", "when", "where", "why", "how", "can", "could", "should", "would",
+    "will", "i", "me", "my", "we", "our", "you", "your", "please", "tell", "there", "any", "some",
+}
+
+
+def _words(text: str) -> list:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def _content_words(text: str) -> set:
+    return {w for w in _words(text) if w not in STOPWORDS and w not in REFERENCE_WORDS}
+
+
+class QueryRewriter:
+    """Turns follow-up messages into standalone questions, avoiding the LLM call when it can.
+
+    A local gate skips the rewrite for greetings, first questions and messages that are already
+    standalone; rewrites that do run are cached by (history window, query).
+    """
+
+    def __init__(self, llm: LLM, context_window: int = 5, cache_size: int = Configs.REWRITE_CACHE_SIZE):
+        self.llm = llm
+        self.context_window = context_window
+        self.cache = LRUCache(cache_size)
+        self.calls = 0
+        self.skipped = 0
+        self.llm_rewrites = 0
+
+    def needs_rewrite(self, query: str, history: list) -> bool:
+        previous_user_turns = [msg["content"] for msg in history if msg["role"] == "user"]
+        if not previous_user_turns:
+            return False
+
+        normalized = query.strip().lower()
+        words = _words(normalized)
+        if GREETING.match(normalized) and len(words) <= 4:
+            return False
+
+        content = _content_words(normalized)
+        refers_back = (
+            any(w in REFERENCE_WORDS for w in words)
+            or normalized.startswith(ELLIPSIS_PREFIXES)
+            or len(content) <= 2
+        )
+        if not refers_back:
+            return False
+
+        # A long follow-up that already restates the previous question's topic stands on its own
+        previous_content = _content_words(previous_user_turns[-1])
+        if len(content) >= 4 and previous_content:
+            overlap = len(content & previous_content) / len(previous_content)
+            if overlap >= 0.5:
+                return False
+        return True
+
+    def _cache_key(self, query: str, history: list) -> tuple:
+        window = history[-self.context_window:]
+        digest = hashlib.sha1("\x1e".join(f"{m['role']}\x1f{m['content']}" for m in window).encode("utf-8"))
+        return digest.hexdigest(), query.strip().lower()
+
+    def _prompt(self, query: str, history: list) -> list:
+        recent_history = history[-self.context_window:]
+        chat_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_history])
+        formatted_template = Configs.REWRITE_QUERY_TEMPLATE.format(chat_history=chat_history, question=query)
+        return [
+            ChatMessage(role="system", content=Configs.REWRITE_QUERY_PROMPT),
+            ChatMessage(role="user", content=formatted_template)
+        ]
+
+    def _lookup(self, query: str, history: list):
+        """Return (cache_key, rewritten) where rewritten is set if no LLM call is needed."""
+        self.calls += 1
+        if not self.needs_rewrite(query, history):
+            self.skipped += 1
+            return None, query
+        key = self._cache_key(query, history)
+        return key, self.cache.get(key)
+
+    def _store(self, key: tuple, rewritten: str) -> str:
+        self.llm_rewrites += 1
+        self.cache.put(key, rewritten)
+        if Configs.WRITE_LOGS:
+            logging.info(f"rewrite_query_with_history: {rewritten} ({self.stats()})")
+        return rewritten
+
+    def rewrite(self, query: str, history: list) -> str:
+        with tracer.span("chat.rewrite") as span:
+            key, rewritten = self._lookup(query, history)
+            span.set(skipped=key is None, cache_hit=key is not None and rewritten is not None)
+            if rewritten is not None:
+                return rewritten
+            response = self.llm.chat(self._prompt(query, history))
+            record_llm_call(response)
+            return self._store(key, str(response).strip())
+
+    async def arewrite(self, query: str, history: list) -> str:
+        with tracer.span("chat.rewrite") as span:
+            key, rewritten = self._lookup(query, history)
+            span.set(skipped=key is None, cache_hit=key is not None and rewritten is not None)
+            if rewritten is not None:
+                return rewritten
+            response = await self.llm.achat(self._prompt(query, history))
+            record_llm_call(response)
+            return self._store(key, str(response).strip())
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "skipped": self.skipped,
+            "cache_hits": self.cache.hits,
+            "llm_rewrites": self.llm_rewrites,
+            "skip_rate": self.skipped / self.calls if self.calls else 0.0,
+        }
@@ -1,14 +1,102 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence, Tuple
 from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.vector_stores.utils import legacy_metadata_dict_to_node, metadata_dict_to_node
 from configs import Configs
+from context_packer import ContextPacker
+from utils.tracing import tracer
 
 class Retriever:
-    def __init__(self, index: VectorStoreIndex):
+    def __init__(self, index: VectorStoreIndex, top_k: int = Configs.SIMILARITY_TOP_K, packer: ContextPacker = None,
+                 workers: int = Configs.RETRIEVAL_WORKERS):
         self.index = index
+        self.top_k = top_k
         self.prompt_template = Configs.CONTEXT_PROMPT_TEMPLATE
+        self.packer = packer or ContextPacker()
+        # Async retrievals share this bounded pool instead of taking a thread each
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieve")
 
-    def retrieve(self, query: str, top_k: int = Configs.SIMILARITY_TOP_K) -> list:
-        return self.index.as_retriever(similarity_top_k=top_k).retrieve(query)
+    def retrieve(self, query: str, top_k: int = None) -> list:
+        top_k = top_k or self.top_k
+        with tracer.span("retrieve", top_k=top_k) as span:
+            nodes = self.index.as_retriever(similarity_top_k=top_k).retrieve(query)
+            span.set(results=len(nodes))
+            return nodes
 
-    def format_context(self, nodes: list) -> str:
-        context_str = "\n\n".join([n.node.get_content(metadata_mode='all') for n in nodes])
-        return self.prompt_template.format(context_str=context_str)
+    def retrieve_batch(self, queries: Sequence[str], embeddings: Sequence[Sequence[float]],
+                       top_k: int = None) -> List[list]:
+        """Retrieve for many already-embedded queries.
+
+        Vector stores with query_batch (the numpy store) score all queries in one pass over the
+        matrix, chroma answers them in one multi-embedding collection query; other stores get one
+        query per call, still without re-embedding.
+        """
+        top_k = top_k or self.top_k
+        with tracer.span("retrieve.batch", queries=len(queries), top_k=top_k) as span:
+            store = self.index.vector_store
+            if hasattr(store, "query_batch"):
+                results = [[NodeWithScore(node=node, score=score) for node, score in zip(r.nodes, r.similarities)]
+                           for r in store.query_batch(embeddings, top_k)]
+                span.set(vectorized=True)
+            elif type(store).__name__ == "ChromaVectorStore":  # not imported here; chromadb is heavy
+                results = self._chroma_query_batch(store, embeddings, top_k)
+                span.set(vectorized=True)
+            else:
+                retriever = self.index.as_retriever(similarity_top_k=top_k)
+                results = [retriever.retrieve(QueryBundle(query, embedding=list(embedding)))
+                           for query, embedding in zip(queries, embeddings)]
+            span.set(results=sum(len(nodes) for nodes in results))
+            return results
+
+    @staticmethod
+    def _chroma_query_batch(store, embeddings: Sequence[Sequence[float]], top_k: int) -> List[list]:
+        """Nodes for every embedding from a single chroma query; nodes and scores as in ChromaVectorStore.query."""
+        results = store.client.query(query_embeddings=[list(embedding) for embedding in embeddings],
+                                     n_results=top_k, include=["documents", "metadatas", "distances"])
+        batches = []
+        for ids, texts, metadatas, distances in zip(results["ids"], results["documents"], results["metadatas"],
+                                                    results["distances"]):
+            nodes = []
+            for node_id, text, metadata, distance in zip(ids, texts, metadatas, distances):
+                try:
+                    node = metadata_dict_to_node(metadata)
+                    node.set_content(text)
+                except Exception:
+                    # Entries added without llama_index node metadata (e.g. by collection.add directly)
+                    metadata, node_info, relationships = legacy_metadata_dict_to_node(metadata or {})
+                    node = TextNode(text=text, id_=node_id, metadata=metadata, relationships=relationships,
+                                    start_char_idx=node_info.get("start"), end_char_idx=node_info.get("end"))
+                nodes.append(NodeWithScore(node=node, score=math.exp(-distance)))
+            batches.append(nodes)
+        return batches
+
+    async def aretrieve(self, query: str, top_k: int = None) -> list:
+        # The vector store clients are synchronous, so retrieval runs on the bounded retrieval pool
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, self.retrieve, query, top_k))
+
+    def merge_results(self, *node_lists: list, top_k: int = None) -> list:
+        """Union several retrieval results, keeping each node's best score."""
+        top_k = top_k or self.top_k
+        best = {}
+        for nodes in node_lists:
+            for n in nodes:
+                if n.node.node_id not in best or (n.score or 0) > (best[n.node.node_id].score or 0):
+                    best[n.node.node_id] = n
+        return sorted(best.values(), key=lambda n: n.score or 0, reverse=True)[:top_k]
+
+    def format_context(self, nodes: list) -> Tuple[str, dict]:
+        """(context prompt, packing stats) for retrieved nodes; the stats also go on the trace span."""
+        with tracer.span("context.format") as span:
+            context_str, stats = self.packer.pack(nodes)
+            span.set(**stats)
+        if Configs.WRITE_LOGS:
+            logging.info(f"format_context: {stats}")
+        return self.prompt_template.format(context_str=context_str), stats
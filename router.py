@@ -0,0 +1,142 @@
+import re
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional
+import numpy as np
+from configs import Configs
+
+SQL = "sql"
+CHAT = "chat"
+
+# Phrases that signal an aggregate / lookup over tabular data, or a question about the documents
+SQL_CUES = ("how many", "number of", "count", "total", "sum of", "average", "avg", "mean", "maximum", "minimum",
+            "highest", "lowest", "most", "least", "top", "list all", "list the", "show all", "per", "sorted",
+            "order by", "group by", "greater than", "less than", "more than", "fewer than", "between")
+CHAT_CUES = ("what is", "what are", "explain", "why", "how do i", "how can i", "how does", "describe",
+             "summarize", "summary", "guide", "policy", "document", "according to", "tell me about",
+             "help", "hello", "hi", "thanks", "where can i")
+
+FEATURE_DIM = 1024
+
+# Function words carry no intent and would make unrelated questions look alike
+STOP_WORDS = {"a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "of", "to", "in", "on",
+              "for", "at", "by", "from", "with", "and", "or", "it", "this", "that", "there", "their", "me", "my"}
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _stem(word: str) -> str:
+    """Crude plural folding so 'orders' matches table 'orders' and column 'order_id'."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def hashed_features(text: str, dim: int = FEATURE_DIM) -> np.ndarray:
+    """L2-normalised hashed bag of word unigrams and bigrams; a few microseconds, no model needed."""
+    words = [_stem(w) for w in _tokens(text) if w not in STOP_WORDS]
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        vector[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class Route(NamedTuple):
+    label: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+class IntentRouter:
+    """Chooses between the RAG chat path and the SQL agent without calling an LLM.
+
+    Three signals are summed into a score where positive means SQL:
+      - keyword cues for aggregates and lookups vs. document questions,
+      - mentions of table or column names, or sample values, from the (cached) database schema,
+      - nearest-example similarity to labelled questions, using hashed local features.
+    Schema words are common in ordinary questions ("order", "product"), so they are weighted below
+    the keyword cues and never route to SQL on their own: an SQL route also needs an SQL keyword cue
+    or a nearest-example margin of at least example_margin. A question with only schema evidence
+    is routed to chat with zero confidence, leaving SQL as the fallback.
+    The confidence is the score's magnitude squashed into [0, 1), halved for an SQL route that
+    mentions nothing from the schema.
+    """
+
+    def __init__(self, schema_provider: Optional[Callable[[], dict]] = None,
+                 examples: Dict[str, List[str]] = Configs.ROUTER_EXAMPLES,
+                 weights: Dict[str, float] = Configs.ROUTER_WEIGHTS,
+                 example_margin: float = Configs.ROUTER_EXAMPLE_MARGIN):
+        self.schema_provider = schema_provider
+        self.weights = weights
+        self.example_margin = example_margin
+        self.example_labels = []
+        vectors = []
+        for label, questions in examples.items():
+            for question in questions:
+                self.example_labels.append(label)
+                vectors.append(hashed_features(question))
+        self.example_labels = np.array(self.example_labels)
+        self.example_vectors = np.vstack(vectors) if vectors else np.zeros((0, FEATURE_DIM), dtype=np.float32)
+        self._schema = None
+        self._schema_terms = frozenset()
+
+    def schema_terms(self) -> frozenset:
+        """Stemmed table/column name parts and sample text values; rebuilt only when the provider
+        returns a new schema."""
+        if self.schema_provider is None:
+            return self._schema_terms
+        schema = self.schema_provider()
+        if schema is not self._schema:
+            terms = set()
+            for table, info in schema.items():
+                names = [table] + [column[0] for column in info["columns"]]
+                names += [value for row in info["samples"] for value in row if isinstance(value, str)]
+                for name in names:
+                    terms.update(_stem(part) for part in _tokens(name.replace("_", " "))
+                                 if part != "id" and part not in STOP_WORDS)
+            self._schema = schema
+            self._schema_terms = frozenset(terms)
+        return self._schema_terms
+
+    @staticmethod
+    def _cue_hits(text: str) -> tuple:
+        """(SQL cue count, chat cue count)"""
+        padded = f" {' '.join(_tokens(text))} "
+        return sum(f" {cue} " in padded for cue in SQL_CUES), sum(f" {cue} " in padded for cue in CHAT_CUES)
+
+    def _schema_score(self, text: str) -> float:
+        terms = self.schema_terms()
+        if not terms:
+            return 0.0
+        hits = sum(_stem(word) in terms for word in set(_tokens(text)))
+        return float(np.tanh(hits))
+
+    def _example_score(self, text: str) -> float:
+        if not len(self.example_vectors):
+            return 0.0
+        similarities = self.example_vectors @ hashed_features(text)
+        best = {label: float(similarities[self.example_labels == label].max(initial=0.0))
+                for label in (SQL, CHAT)}
+        return best[SQL] - best[CHAT]
+
+    def route(self, query: str) -> Route:
+        sql_hits, chat_hits = self._cue_hits(query)
+        scores = {
+            "keywords": float(np.tanh(sql_hits - chat_hits)),
+            "schema": self._schema_score(query),
+            "examples": self._example_score(query),
+        }
+        total = sum(self.weights[name] * score for name, score in scores.items())
+        scores["total"] = total
+        if total <= 0:
+            return Route(CHAT, float(np.tanh(-total)), scores)
+        if not sql_hits and scores["examples"] < self.example_margin:
+            return Route(CHAT, 0.0, scores)
+        confidence = float(np.tanh(total))
+        if scores["schema"] == 0 and self._schema_terms:
+            confidence /= 2
+        return Route(SQL, confidence, scores)
@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+import numpy as np
+from configs import Configs
+
+
+class CacheLookup(NamedTuple):
+    answer: Optional[str]
+    similarity: float
+    vector: np.ndarray
+    version: object
+
+
+class SemanticCache:
+    """Answer cache keyed by query meaning rather than query text.
+
+    Queries are embedded and compared by cosine similarity against a fixed-capacity numpy matrix of
+    cached queries; the nearest entry at or above threshold is a hit. Entries carry the corpus version
+    they were answered against and expire after ttl_s; when full, the least recently used entry is
+    replaced. A version change (new ingestion) drops all entries.
+    """
+
+    def __init__(self, embed_model, threshold: float = Configs.SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = Configs.SEMANTIC_CACHE_MAX_ENTRIES, ttl_s: float = Configs.SEMANTIC_CACHE_TTL_S,
+                 version_provider: Callable[[], object] = None):
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.version_provider = version_provider or (lambda: None)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._vectors = None  # allocated on first insert, once the embedding size is known
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._created = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._queries = [None] * max_entries
+        self._answers = [None] * max_entries
+        self._version = None
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._used.any():
+                self.invalidations += 1
+                self._used[:] = False
+            self._version = version
+
+    def _search(self, vector: np.ndarray, version) -> CacheLookup:
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None or not self._used.any():
+                self.misses += 1
+                return CacheLookup(None, 0.0, vector, version)
+
+            now = time.time()
+            expired = self._used & (now - self._created > self.ttl_s)
+            if expired.any():
+                self.expirations += int(expired.sum())
+                self._used &= ~expired
+
+            similarities = np.where(self._used, self._vectors @ vector, -np.inf)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self.hits += 1
+                self._last_used[best] = now
+                return CacheLookup(self._answers[best], float(similarities[best]), vector, version)
+            self.misses += 1
+            return CacheLookup(None, float(max(similarities[best], 0.0)), vector, version)
+
+    def lookup(self, query: str) -> CacheLookup:
+        """Embed query and return the nearest cached answer, if similar enough."""
+        version = self.version_provider()
+        return self._search(self._normalize(self.embed_model.get_query_embedding(query)), version)
+
+    async def alookup(self, query: str) -> CacheLookup:
+        version = self.version_provider()
+        return self._search(self._normalize(await self.embed_model.aget_query_embedding(query)), version)
+
+    def lookup_vector(self, vector) -> CacheLookup:
+        """Same as lookup, for a query that is already embedded (e.g. as part of a batch)."""
+        return self._search(self._normalize(vector), self.version_provider())
+
+    def store(self, lookup: CacheLookup, query: str, answer: str):
+        """Cache answer under the vector of a missed lookup, unless the corpus changed meanwhile."""
+        if not answer:
+            return
+        with self._lock:
+            if lookup.version != self._version:
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(lookup.vector)), dtype=np.float32)
+            free = np.flatnonzero(~self._used)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            now = time.time()
+            self._vectors[slot] = lookup.vector
+            self._queries[slot] = query
+            self._answers[slot] = answer
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._used[slot] = True
+
+    def clear(self):
+        with self._lock:
+            self._used[:] = False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": int(self._used.sum()),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
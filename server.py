@@ -0,0 +1,403 @@
+"""HTTP service for chat, SQL and routed questions on top of Generator.
+
+Usage:
+    python server.py --host 0.0.0.0 --port 8080
+
+Endpoints (POST bodies are JSON: {"query": ..., "session_id": optional, "use_context": optional}):
+    POST /chat, /sql, /answer                 -> {"answer", "session_id", ...}
+    POST /chat/stream, /sql/stream, /answer/stream -> chunked text/plain token stream
+    GET  /health, /metrics
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Optional
+
+from aiohttp import web
+
+from configs import Configs
+from generator import Generator
+from utils.lru_cache import LRUCache
+from utils.tracing import tracer
+
+_DONE = object()
+
+
+class Overloaded(Exception):
+    """Raised when a backend's wait queue is full; carries a Retry-After estimate in seconds."""
+
+    def __init__(self, backend: str, retry_after_s: int):
+        super().__init__(f"{backend} backend is overloaded")
+        self.backend = backend
+        self.retry_after_s = retry_after_s
+
+
+class BackendLimiter:
+    """Caps the in-flight requests of one backend and bounds how many may wait for a slot.
+
+    A request that finds every slot taken and max_queue requests already waiting is rejected
+    immediately instead of queueing, so overload shows up as fast 429s rather than timeouts.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout_s: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.avg_service_s = 1.0  # moving average, only used for Retry-After
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.avg_service_s * (self.waiting + 1) / self.concurrency))
+
+    @property
+    def busy(self) -> int:
+        return self.active + self.waiting
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the backend's slots; raises Overloaded instead of queueing past max_queue."""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()  # a free slot is taken without yielding to the loop
+        elif self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout_s)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Overloaded(self.name, self.retry_after())
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self.avg_service_s = 0.9 * self.avg_service_s + 0.1 * (time.perf_counter() - started)
+            self._semaphore.release()
+
+    @contextmanager
+    def blocking_slot(self, loop: asyncio.AbstractEventLoop):
+        """slot() for code on a worker thread, while loop (the serving loop) keeps running."""
+        slot = self.slot()
+        asyncio.run_coroutine_threadsafe(slot.__aenter__(), loop).result()
+        try:
+            yield
+        finally:
+            asyncio.run_coroutine_threadsafe(slot.__aexit__(None, None, None), loop).result()
+
+    def stats(self) -> dict:
+        return {"concurrency": self.concurrency, "active": self.active, "waiting": self.waiting,
+                "completed": self.completed, "rejected": self.rejected, "avg_service_s": self.avg_service_s}
+
+
+class Session:
+    """Chat history and memory of one conversation; the lock serializes its turns."""
+
+    def __init__(self, memory):
+        self.history = []
+        self.memory = memory
+        self.lock = asyncio.Lock()
+
+    def add_turn(self, query: str, answer: str):
+        self.history += [{"role": "user", "content": query}, {"role": "assistant", "content": answer}]
+
+
+class SessionStore:
+    """Least-recently-used sessions, bounded by max_sessions."""
+
+    def __init__(self, new_memory: Callable, max_sessions: int = Configs.SERVER_MAX_SESSIONS):
+        self.new_memory = new_memory
+        self._sessions = LRUCache(max_sessions)
+
+    def get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(self.new_memory())
+            self._sessions.put(session_id, session)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class ChatServer:
+    """aiohttp application around one Generator.
+
+    LLM chat runs on the event loop through Generator.achat; the synchronous SQL agent, routed
+    answers and token streams run on a thread pool sized to the backend limits, so the limiters,
+    not the pool, decide what waits.
+    """
+
+    def __init__(self, generator: Generator, config: Configs = None):
+        self.generator = generator
+        self.config = config or generator.config
+        self.sql_concurrency = self.config.SERVER_SQL_CONCURRENCY or self.config.SQLITE_POOL_SIZE
+        if self.sql_concurrency > self.config.SQLITE_POOL_SIZE:
+            # Extra admitted SQL requests would queue on the connection pool, outside the limiter
+            raise ValueError(f"SERVER_SQL_CONCURRENCY ({self.sql_concurrency}) must not exceed "
+                             f"SQLITE_POOL_SIZE ({self.config.SQLITE_POOL_SIZE})")
+        self.limiters = {}
+        self.sessions = None
+        self.draining = False
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.SERVER_CHAT_CONCURRENCY + self.sql_concurrency,
+            thread_name_prefix="server")
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._errors])
+        app.add_routes([
+            web.post("/chat", self.chat),
+            web.post("/sql", self.sql),
+            web.post("/answer", self.answer),
+            web.post("/chat/stream", self.stream_chat),
+            web.post("/sql/stream", self.stream_sql),
+            web.post("/answer/stream", self.stream_answer),
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_startup.append(self._startup)
+        app.on_shutdown.append(self._shutdown)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    # ---- lifecycle -------------------------------------------------------------------------
+
+    async def _startup(self, app: web.Application):
+        # asyncio primitives must be created on the serving loop
+        queue, timeout = self.config.SERVER_MAX_QUEUE, self.config.SERVER_QUEUE_TIMEOUT_S
+        self.limiters = {
+            "chat": BackendLimiter("chat", self.config.SERVER_CHAT_CONCURRENCY, queue, timeout),
+            "sql": BackendLimiter("sql", self.sql_concurrency, queue, timeout),
+        }
+        self.sessions = SessionStore(self.generator.new_memory, self.config.SERVER_MAX_SESSIONS)
+        if self.config.SERVER_WARMUP:
+            # Build the chat and SQL stacks before taking traffic rather than on the first requests
+            start = time.perf_counter()
+            await self._run(lambda: (self.generator.chat_engine, self.generator.sql_agent, self.generator.router))
+            if self.config.WRITE_LOGS:
+                logging.info(f"server: warm-up took {time.perf_counter() - start:.2f}s")
+
+    async def _shutdown(self, app: web.Application):
+        """Stop admitting requests and wait for in-flight ones, up to SERVER_SHUTDOWN_TIMEOUT_S."""
+        self.draining = True
+        deadline = time.monotonic() + self.config.SERVER_SHUTDOWN_TIMEOUT_S
+        while any(limiter.busy for limiter in self.limiters.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        remaining = sum(limiter.busy for limiter in self.limiters.values())
+        if remaining:
+            logging.warning(f"server: shutting down with {remaining} requests still in flight")
+        elif self.config.WRITE_LOGS:
+            logging.info("server: drained")
+
+    async def _cleanup(self, app: web.Application):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for exporter in tracer.exporters:
+            exporter.flush()
+
+    # ---- helpers ---------------------------------------------------------------------------
+
+    async def _run(self, func: Callable, *args):
+        """Run a blocking call on the server pool, keeping the current trace context."""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, func, *args))
+
+    @web.middleware
+    async def _errors(self, request: web.Request, handler):
+        if self.draining and request.path not in ("/health", "/metrics"):
+            return web.json_response({"error": "server is shutting down"}, status=503,
+                                     headers={"Connection": "close"})
+        try:
+            return await handler(request)
+        except Overloaded as e:
+            return web.json_response({"error": str(e), "retry_after_s": e.retry_after_s}, status=429,
+                                     headers={"Retry-After": str(e.retry_after_s)})
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            logging.exception(f"server: {request.path} failed")
+            return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=500)
+
+    @staticmethod
+    async def _params(request: web.Request) -> tuple:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Request body must be JSON")
+        query = body.get("query") if isinstance(body, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise web.HTTPBadRequest(text="'query' must be a non-empty string")
+        session_id = str(body.get("session_id") or uuid.uuid4().hex)
+        return query, session_id, bool(body.get("use_context", True))
+
+    def _fallback_slot(self) -> Callable:
+        """Generator.answer fallback_slot: the fallback path takes a slot of its own backend."""
+        loop = asyncio.get_running_loop()
+        return lambda backend: self.limiters[backend].blocking_slot(loop)
+
+    async def _route_backend(self, query: str) -> str:
+        """Backend of the path a routed question tries first.
+
+        Routing reads the schema version from SQLite, so it runs on the pool rather than the loop.
+        """
+        route = await self._run(self.generator.router.route, query)
+        return route.label
+
+    @asynccontextmanager
+    async def _turn(self, session: Session, backend: str):
+        """One conversation turn: the session lock first, then a backend slot.
+
+        A session runs one turn at a time; a second concurrent request for it is rejected with 409
+        instead of holding a backend slot while it waits for the first.
+        """
+        if session.lock.locked():
+            raise web.HTTPConflict(text="This session already has a request in flight")
+        async with session.lock, self.limiters[backend].slot():
+            yield
+
+    # ---- endpoints -------------------------------------------------------------------------
+
+    async def chat(self, request: web.Request) -> web.Response:
+        query, session_id, use_context = await self._params(request)
+        session = self.sessions.get(session_id)
+        with tracer.span("server.chat") as span:
+            async with self._turn(session, "chat"):
+                answer = await self.generator.achat(query, session.history, use_context, session.memory)
+                session.add_turn(query, answer)
+            span.set(session_turns=len(session.history) // 2)
+        return web.json_response({"answer": answer, "session_id": session_id})
+
+    async def sql(self, request: web.Request) -> web.Response:
+        query, session_id, _ = await self._params(request)
+        session = self.sessions.get(session_id)
+        with tracer.span("server.sql"):
+            async with self._turn(session, "sql"):
+                response = await self._run(self.generator.sql_response, query)
+                answer = response["messages"][-1].content
+                session.add_turn(query, answer)
+        return web.json_response({"answer": answer, "session_id": session_id, "sql": response.get("sql"),
+                                  "path": response["path"]})
+
+    async def answer(self, request: web.Request) -> web.Response:
+        query, session_id, _ = await self._params(request)
+        session = self.sessions.get(session_id)
+        with tracer.span("server.answer"):
+            backend = await self._route_backend(query)
+            async with self._turn(session, backend):
+                result = await self._run(self.generator.answer, query, session.history, session.memory,
+                                         self._fallback_slot())
+                session.add_turn(query, result["answer"])
+        return web.json_response({**result, "session_id": session_id})
+
+    async def _stream(self, request: web.Request, backend: str, make_stream: Callable, session_id: str,
+                      query: str, headers: dict = None) -> web.StreamResponse:
+        """Send a synchronous token stream as a chunked response, pulling tokens on the pool."""
+        session = self.sessions.get(session_id)
+        async with self._turn(session, backend):
+            response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8",
+                                                   "X-Session-Id": session_id, **(headers or {})})
+            context = contextvars.copy_context()
+            loop = asyncio.get_running_loop()
+            tokens = iter(await loop.run_in_executor(self.executor, context.run, make_stream, session))
+            parts = []
+            try:
+                # The first token is pulled before the headers go out, so setup errors still get a 500
+                token = await loop.run_in_executor(self.executor, context.run, next, tokens, _DONE)
+                await response.prepare(request)
+                while token is not _DONE:
+                    parts.append(token)
+                    await response.write(token.encode("utf-8"))
+                    token = await loop.run_in_executor(self.executor, context.run, next, tokens, _DONE)
+            except ConnectionResetError:
+                # Client went away; stop generating and keep the session as it was
+                return response
+            except Exception:
+                if not response.prepared:
+                    raise
+                logging.exception(f"server: {request.path} failed mid-stream")
+                return response
+            finally:
+                close = getattr(tokens, "close", None)
+                if close is not None:
+                    await loop.run_in_executor(self.executor, context.run, close)
+            session.add_turn(query, "".join(parts))
+        # Ended only after the turn is recorded and the session released, so the client's next turn is admitted
+        try:
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def stream_chat(self, request: web.Request) -> web.StreamResponse:
+        query, session_id, use_context = await self._params(request)
+        with tracer.span("server.stream_chat"):
+            return await self._stream(request, "chat", lambda session: self.generator.stream_chat(
+                query, session.history, use_context, session.memory), session_id, query)
+
+    async def stream_sql(self, request: web.Request) -> web.StreamResponse:
+        query, session_id, _ = await self._params(request)
+        with tracer.span("server.stream_sql"):
+            return await self._stream(request, "sql", lambda session: self.generator.stream_sql_query(query),
+                                      session_id, query)
+
+    async def stream_answer(self, request: web.Request) -> web.StreamResponse:
+        query, session_id, _ = await self._params(request)
+        with tracer.span("server.stream_answer"):
+            backend = await self._route_backend(query)
+            fallback_slot = self._fallback_slot()
+            return await self._stream(request, backend, lambda session: self.generator.stream_answer(
+                query, session.history, session.memory, fallback_slot)[1], session_id, query, {"X-Backend": backend})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "draining" if self.draining else "ok",
+            "sessions": len(self.sessions) if self.sessions is not None else 0,
+            "backends": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        })
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        lines = ["# TYPE genai_server_requests gauge"]
+        for name, limiter in self.limiters.items():
+            for key in ("active", "waiting"):
+                lines.append(f'genai_server_requests{{backend="{name}",state="{key}"}} {getattr(limiter, key)}')
+        lines.append("# TYPE genai_server_requests_total counter")
+        for name, limiter in self.limiters.items():
+            for key in ("completed", "rejected"):
+                lines.append(f'genai_server_requests_total{{backend="{name}",outcome="{key}"}} {getattr(limiter, key)}')
+        body = tracer.metrics.render() + "\n".join(lines) + "\n"
+        return web.Response(text=body, content_type="text/plain")
+
+
+def create_app(generator: Optional[Generator] = None, config: Configs = None) -> web.Application:
+    return ChatServer(generator or Generator(config), config).build_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=Configs.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Configs.SERVER_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=Configs.LOG_LEVEL)
+    web.run_app(create_app(), host=args.host, port=args.port,
+                shutdown_timeout=Configs.SERVER_SHUTDOWN_TIMEOUT_S + 5)
+
+
+if __name__ == "__main__":
+    main()
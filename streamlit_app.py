@@ -3,7 +3,12 @@ from generator import Generator
 
 st.set_page_config(page_title="GenAI Agentic Application")
 
-response_generator = Generator()
+@st.cache_resource
+def get_generator() -> Generator:
+    """One Generator per process; Streamlit reruns this script on every interaction."""
+    return Generator()
+
+response_generator = get_generator()
 st.title("CampusConnect: AI-Powered Student Discovery 🧑💻")
 
 # Initialize chat history with a welcome message
@@ -12,6 +17,10 @@ if "messages" not in st.session_state:
         {"role": "assistant", "content": "Welcome! How can I assist you today?"}
     ]
 
+# Token-bounded memory with a rolling summary, kept across reruns of this session
+if "memory" not in st.session_state:
+    st.session_state.memory = response_generator.new_memory()
+
 # Display chat messages with persistent history
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -28,17 +37,30 @@ if prompt := st.chat_input("Your question"):
     
     # Generate assistant response
     with st.chat_message("assistant"):
-        with st.spinner("Analyzing..."):
-            # Get conversation history (excluding current prompt)
-            chat_history = st.session_state.messages[:-1]
-            
-            # Generate response with context and history
-            # response = response_generator.chat(
-            response = response_generator.sql_query(
-                query=prompt,
-                chat_history=chat_history
-            )
-            
-            # Display and store response
-            st.write(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+        placeholder = st.empty()
+        placeholder.markdown("_Analyzing..._")
+
+        # Get conversation history (excluding current prompt)
+        chat_history = st.session_state.messages[:-1]
+
+        # Route locally to RAG chat or the SQL agent, then stream the chosen path
+        route, stream = response_generator.stream_answer(
+            query=prompt,
+            chat_history=chat_history,
+            memory=st.session_state.memory
+        )
+        response = ""
+        for token in stream:
+            response += token
+            placeholder.markdown(response + "▌")
+
+        # Display and store response
+        placeholder.markdown(response)
+        latency = stream.latency
+        if latency["first_token_s"] is not None:
+            st.caption(f"{route.label} · first token {latency['first_token_s']:.2f}s · total {latency['total_s']:.2f}s")
+        st.session_state.messages.append({"role": "assistant", "content": response, "latency": latency,
+                                          "route": route.label})
+
+with st.sidebar.expander("Startup timings"):
+    st.text(response_generator.startup_report())
@@ -0,0 +1,22 @@
+import pytest
+
+from configs import Configs
+from db.bulk_import import BulkImporter, generate_synthetic
+from utils.tracing import tracer
+
+
+@pytest.fixture(autouse=True)
+def quiet_logs(monkeypatch):
+    monkeypatch.setattr(Configs, "WRITE_LOGS", False)
+    # Spans still feed the metrics, but nothing is exported into the working tree
+    monkeypatch.setattr(tracer, "exporters", [])
+
+
+@pytest.fixture
+def sample_db(tmp_path) -> str:
+    """Small synthetic products / staff / orders database."""
+    db_file = str(tmp_path / "sample.db")
+    importer = BulkImporter(db_file)
+    generate_synthetic(importer, products=20, staff=5, orders=300, seed=0)
+    importer.close()
+    return db_file
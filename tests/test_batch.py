@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+
+from batch import BatchChat, completed_ids, is_rate_limit, read_questions, retry_after_s, run_batch
+from benchmarks.fakes import FakeEmbedding, FakeLLM
+from benchmarks.run_benchmarks import workdir_config
+from generator import Generator
+
+
+class StubGenerator:
+    """Answers every item with its query reversed, failing the ones listed in fail."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.asked = []
+
+    def chat_batch(self, items, use_context=True, concurrency=None, on_result=None):
+        for item in items:
+            self.asked.append(item["id"])
+            if item["id"] in self.fail:
+                result = {"id": item["id"], "query": item["query"], "error": "RuntimeError: boom"}
+            else:
+                result = {"id": item["id"], "query": item["query"], "answer": item["query"][::-1]}
+            on_result(result)
+
+
+def write_questions(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": i, "query": f"question {i}"}) + "\n")
+
+
+def test_read_questions_defaults_ids_to_line_numbers(tmp_path):
+    path = tmp_path / "q.jsonl"
+    path.write_text('"plain string"\n\n{"query": "with id", "id": "x"}\n{"query": "no id"}\n', encoding="utf-8")
+    assert [item["id"] for item in read_questions(str(path))] == [1, "x", 4]
+
+
+def test_completed_ids_skips_errors(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": 1, "answer": "a"}\n{"id": 2, "error": "x"}\n{"id": 3, "answer": "c"}\n',
+                    encoding="utf-8")
+    assert completed_ids(str(path)) == {1, 3}
+
+
+def test_completed_ids_truncates_torn_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": 1, "answer": "a"}\n{"id": 2, "ans', encoding="utf-8")
+    assert completed_ids(str(path)) == {1}
+    assert path.read_text(encoding="utf-8") == '{"id": 1, "answer": "a"}\n'
+
+
+def test_completed_ids_missing_file(tmp_path):
+    assert completed_ids(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_run_batch_resumes(tmp_path):
+    questions, output = tmp_path / "q.jsonl", tmp_path / "out.jsonl"
+    write_questions(questions, 10)
+    # An interrupted run: four answers, one failure and a torn last line
+    output.write_text("".join(json.dumps({"id": i, "answer": "x"}) + "\n" for i in range(4))
+                      + json.dumps({"id": 4, "error": "x"}) + "\n" + '{"id": 5, "answ', encoding="utf-8")
+
+    generator = StubGenerator(fail={7})
+    summary = run_batch(generator, str(questions), str(output))
+    assert generator.asked == [4, 5, 6, 7, 8, 9]
+    assert summary["skipped"] == 4
+    assert summary["answered"] == 5 and summary["failed"] == 1
+
+    again = StubGenerator()
+    run_batch(again, str(questions), str(output))
+    assert again.asked == [7]
+    assert completed_ids(str(output)) == set(range(10))
+
+
+def test_run_batch_restart_overwrites(tmp_path):
+    questions, output = tmp_path / "q.jsonl", tmp_path / "out.jsonl"
+    write_questions(questions, 3)
+    output.write_text(json.dumps({"id": 0, "answer": "old"}) + "\n", encoding="utf-8")
+    generator = StubGenerator()
+    run_batch(generator, str(questions), str(output), resume=False)
+    assert generator.asked == [0, 1, 2]
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 3
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    class response:
+        headers = {"retry-after": "2.5"}
+
+
+def test_rate_limit_detection():
+    assert is_rate_limit(RateLimited())
+    assert not is_rate_limit(ValueError())
+    assert retry_after_s(RateLimited()) == 2.5
+    assert retry_after_s(ValueError()) is None
+
+
+@pytest.fixture
+def generator(tmp_path):
+    config = workdir_config(str(tmp_path))
+    config.BATCH_CHUNK_SIZE = 2
+    generator = Generator(config=config, llm=FakeLLM(response_tokens=5), embed_model=FakeEmbedding())
+    # Added after the index is built, so ingestion does not migrate it away
+    generator.retriever
+    generator.vector_db.collection.add(
+        ids=["legacy-doc"], documents=["The library opens at eight in the morning."],
+        embeddings=[FakeEmbedding().get_text_embedding("The library opens at eight in the morning.")])
+    return generator
+
+
+QUESTIONS = [{"id": i, "query": f"When does the library open on day {i}?"} for i in range(4)]
+
+
+def test_batch_retrieval_reads_entries_without_node_metadata(generator):
+    embedding = FakeEmbedding().get_query_embedding("When does the library open?")
+    [nodes] = generator.retriever.retrieve_batch(["When does the library open?"], [embedding])
+    assert nodes[0].node.node_id == "legacy-doc"
+    assert nodes[0].node.get_content() == "The library opens at eight in the morning."
+
+
+def test_retrieval_failure_fails_only_its_chunk(generator):
+    retrieve_batch = generator.retriever.retrieve_batch
+    calls = []
+
+    def flaky(queries, embeddings, top_k=None):
+        calls.append(queries)
+        if len(calls) == 1:
+            raise RuntimeError("store unavailable")
+        return retrieve_batch(queries, embeddings, top_k)
+
+    generator.retriever.retrieve_batch = flaky
+    results = generator.chat_batch(QUESTIONS)
+    assert [r.get("error") for r in results[:2]] == ["RuntimeError: store unavailable"] * 2
+    assert all("answer" in r for r in results[2:])
+
+
+class FailingEmbedding:
+    def __init__(self):
+        self.calls = 0
+
+    async def aget_text_embedding_batch(self, texts):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("embedding service down")
+        return [FakeEmbedding().get_text_embedding(text) for text in texts]
+
+
+def test_embedding_failure_fails_only_its_chunk(generator):
+    runner = BatchChat(generator.chat_engine, FailingEmbedding(), concurrency=2, chunk_size=2, max_retries=0)
+    results = asyncio.run(runner.run(QUESTIONS))
+    assert [r.get("error") for r in results[:2]] == ["RuntimeError: embedding service down"] * 2
+    assert all("answer" in r for r in results[2:])
+    assert runner.embedding_calls == 1
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from db.bulk_import import BulkImporter, infer_schema
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["1", "22", "-3"], "INTEGER"),
+    (["1.5", "2", "3e2"], "REAL"),
+    (["007", "12"], "TEXT"),
+    (["0", "10"], "INTEGER"),
+    (["0.5", "01.5"], "TEXT"),
+    (["abc", "1"], "TEXT"),
+    ([1, 2, True], "INTEGER"),
+    ([1, 2.5], "REAL"),
+    (["", None], "TEXT"),
+])
+def test_infer_schema(values, expected):
+    assert infer_schema(["c"], [(v,) for v in values]) == [("c", expected)]
+
+
+def test_import_keeps_leading_zeros(tmp_path):
+    path = tmp_path / "codes.csv"
+    path.write_text("code,qty\n007,1\n042,2\n", encoding="utf-8")
+    importer = BulkImporter(str(tmp_path / "x.db"))
+    importer.import_file(str(path))
+    rows = importer.conn.execute("SELECT code, qty FROM codes ORDER BY qty").fetchall()
+    importer.close()
+    assert rows == [("007", 1), ("042", 2)]
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    importer = BulkImporter(str(tmp_path / "x.db"), batch_size=2)
+    importer.create_table("t", [("a", "INTEGER NOT NULL")])
+    with pytest.raises(sqlite3.IntegrityError):
+        importer.insert_rows("t", ["a"], [(1,), (2,), (3,), (None,)])
+    assert not importer.conn.in_transaction
+    assert importer.conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+    importer.insert_rows("t", ["a"], [(4,)])
+    assert importer.conn.execute("SELECT a FROM t").fetchall() == [(4,)]
+    importer.close()
+
+
+def test_import_appends_unless_replace(tmp_path):
+    path = tmp_path / "items.csv"
+    path.write_text("name\na\nb\n", encoding="utf-8")
+    importer = BulkImporter(str(tmp_path / "x.db"))
+    importer.import_file(str(path))
+    importer.import_file(str(path))
+    assert importer.conn.execute("SELECT COUNT(*) FROM items").fetchone() == (4,)
+    importer.import_file(str(path), replace=True)
+    assert importer.conn.execute("SELECT COUNT(*) FROM items").fetchone() == (2,)
+    importer.close()
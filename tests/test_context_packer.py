@@ -0,0 +1,37 @@
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from context_packer import ContextPacker
+
+
+def node(text, score, doc="doc.pdf", start=None, page=1):
+    metadata = {"file_name": doc, "page_label": page, "unused": "x" * 50}
+    end = start + len(text) if start is not None else None
+    return NodeWithScore(node=TextNode(text=text, metadata=metadata, start_char_idx=start, end_char_idx=end),
+                         score=score)
+
+
+def test_merges_overlapping_chunks_from_one_document():
+    text = "The library opens at eight. Students need their card to enter. Guests sign in at the desk."
+    nodes = [node(text[:60], 0.5, start=0), node(text[40:], 0.9, start=40)]
+    context, stats = ContextPacker(token_budget=500, metadata_keys=["file_name"]).pack(nodes)
+    assert context == "[doc.pdf]\n" + text
+    assert stats["nodes"] == 2 and stats["passages"] == 1
+    assert stats["saved_tokens"] > 0
+
+
+def test_merges_overlapping_text_without_offsets():
+    left = "Refunds are issued within thirty days of purchase"
+    right = "within thirty days of purchase if the receipt is kept."
+    context, stats = ContextPacker(token_budget=500, metadata_keys=[]).pack([node(left, 0.5), node(right, 0.4)])
+    assert context == left + " if the receipt is kept."
+    assert stats["passages"] == 1
+
+
+def test_orders_by_score_and_respects_budget():
+    packer = ContextPacker(token_budget=120, metadata_keys=["file_name"])
+    nodes = [node("low " * 100, 0.1, doc="a.pdf"), node("high " * 60, 0.9, doc="b.pdf"),
+             node("tiny", 0.05, doc="c.pdf")]
+    context, stats = packer.pack(nodes)
+    assert context.startswith("[b.pdf]\nhigh")
+    assert packer.count_tokens(context) <= 120
+    assert stats["dropped_passages"] >= 1
@@ -0,0 +1,79 @@
+import asyncio
+
+from benchmarks.fakes import FakeLLM
+from conversation_memory import ConversationMemory, conversation_key
+
+
+def turns(count, words=8):
+    history = []
+    for i in range(count):
+        history.append({"role": "user", "content": f"question {i} " + "about the library " * (words // 4)})
+        history.append({"role": "assistant", "content": f"answer {i} " + "the desk opens early " * (words // 4)})
+    return history
+
+
+def test_conversation_key_follows_the_opening_exchange():
+    history = turns(3)
+    assert conversation_key(history) == conversation_key(history[:2])
+    assert conversation_key(history) == conversation_key(history + turns(1))
+    assert conversation_key(history) != conversation_key(turns(3, words=12))
+
+
+def test_short_history_is_kept_verbatim():
+    llm = FakeLLM()
+    memory = ConversationMemory(llm, token_budget=1000, recent_turns=4)
+    summary, recent = memory.window(turns(2))
+    assert summary == "" and recent == turns(2)
+    assert llm.calls == 0
+
+
+def test_summary_folds_only_newly_aged_out_turns():
+    llm = FakeLLM(response_tokens=20)
+    memory = ConversationMemory(llm, token_budget=10_000, recent_turns=2)
+    history = turns(3)
+    summary, recent = memory.window(history)
+    assert summary and recent == history[-4:]
+    assert memory.folded == 2 and llm.calls == 1
+
+    # Same history again: nothing new aged out
+    memory.window(history)
+    assert llm.calls == 1
+
+    history = history + turns(4)[6:]
+    summary, recent = memory.window(history)
+    assert memory.folded == 4 and llm.calls == 2
+    assert recent == history[-4:]
+
+
+def test_edited_history_restarts_the_summary():
+    llm = FakeLLM(response_tokens=20)
+    memory = ConversationMemory(llm, token_budget=10_000, recent_turns=1)
+    memory.window(turns(3))
+    other = turns(3, words=12)
+    memory.window(other)
+    # Without the restart the first four messages would count as folded and nothing would be summarized
+    assert memory.folded == 4 and llm.calls == 2
+
+
+def test_window_fits_the_token_budget():
+    llm = FakeLLM(response_tokens=400)
+    memory = ConversationMemory(llm, token_budget=120, recent_turns=10, summary_max_tokens=40)
+    summary, recent = memory.window(turns(8, words=16))
+    assert len(memory.tokenizer(summary)) <= 40 and summary.endswith("…")
+    summary_tokens = len(memory.tokenizer(summary))
+    assert memory._tokens(recent) + summary_tokens <= 120
+
+
+def test_oversized_last_message_is_cut():
+    memory = ConversationMemory(FakeLLM(), token_budget=50, recent_turns=2)
+    history = [{"role": "user", "content": "tell me about the library " * 40}]
+    summary, recent = memory.window(history)
+    assert summary == "" and len(recent) == 1
+    assert memory._tokens(recent) <= 50 and recent[0]["content"].endswith("…")
+
+
+def test_async_window_matches_sync():
+    history = turns(5)
+    sync_memory = ConversationMemory(FakeLLM(response_tokens=20), token_budget=10_000, recent_turns=2)
+    async_memory = ConversationMemory(FakeLLM(response_tokens=20), token_budget=10_000, recent_turns=2)
+    assert asyncio.run(async_memory.awindow(history)) == sync_memory.window(history)
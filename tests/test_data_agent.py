@@ -0,0 +1,87 @@
+import pytest
+
+from agents.data_agent import SqliteAgent, parse_fast_reply, render_answer
+from agents.sql_cache import normalize_question
+from benchmarks.fakes import FakeChatModel
+from benchmarks.run_benchmarks import SQL_QUESTIONS
+
+
+@pytest.fixture
+def agent(sample_db):
+    agent = SqliteAgent(sample_db, llm=FakeChatModel(queries=SQL_QUESTIONS))
+    yield agent
+    agent.db.close()
+
+
+def test_normalize_question_ignores_case_punctuation_and_filler():
+    assert normalize_question("Please, tell me: HOW many orders?") == "how many orders"
+
+
+def test_react_plan_is_cached(agent):
+    first = agent.sql_agent_query("How many orders are there?", mode="react")
+    assert first["path"] == "react" and first["sql"] == "SELECT COUNT(*) FROM orders"
+    calls = agent.llm.calls
+    again = agent.sql_agent_query("how many orders are there", mode="react")
+    assert again["path"] == "cache" and again["llm_calls"] == 0
+    assert again["messages"][-1].content == first["messages"][-1].content
+    assert agent.llm.calls == calls
+
+
+def test_streamed_react_plan_is_cached(agent):
+    answer = "".join(agent.stream_sql_agent_query("How many orders are there?", mode="react"))
+    assert "300" in answer
+    calls = agent.llm.calls
+    cached = agent.sql_agent_query("How many orders are there?", mode="react")
+    assert cached["path"] == "cache" and cached["sql"] == "SELECT COUNT(*) FROM orders"
+    assert cached["messages"][-1].content == answer
+    assert agent.llm.calls == calls
+
+
+def test_abandoned_stream_caches_nothing(agent):
+    stream = agent.stream_sql_agent_query("How many orders are there?", mode="react")
+    next(stream)
+    stream.close()
+    assert agent.cached_sql_query("How many orders are there?") is None
+
+
+def test_unanswered_question_is_not_cached(agent):
+    response = agent.sql_agent_query("What is the meaning of life?", mode="react")
+    assert response["sql"] is None
+    assert agent.cached_sql_query("What is the meaning of life?") is None
+
+
+def test_parse_fast_reply():
+    assert parse_fast_reply("SQL: ```sql SELECT 1;```\nANSWER: It is {result}.") == ("SELECT 1", "It is {result}.")
+    with pytest.raises(ValueError):
+        parse_fast_reply("SQL: NONE\nANSWER: n/a")
+    with pytest.raises(ValueError):
+        parse_fast_reply("I think you should count the orders.")
+
+
+def test_render_answer_caps_rows():
+    rows = [(i,) for i in range(5)]
+    assert render_answer("Total: {result}", [(3,)]) == "Total: 3"
+    assert render_answer("None: {result}", []) == "None: no matching records"
+    assert render_answer("Ids: {result}", rows, max_rows=2) == "Ids: 0, 1\n(showing 2 of 5 rows)"
+    assert render_answer("Ids: {result}", rows, truncated=True, max_rows=10).endswith("(showing 5 of more than 5 rows)")
+    assert render_answer("Rows:", [(1, "a")]) == "Rows:\n\n1 | a"
+
+
+def test_fast_path_answers_with_one_call(agent):
+    response = agent.sql_agent_query("How many orders are there?", mode="fast")
+    assert response["path"] == "fast" and response["llm_calls"] == 1
+    assert response["messages"][-1].content == "The answer is 300."
+    assert agent.sql_agent_query("How many orders are there?", mode="fast")["path"] == "cache"
+
+
+def test_fast_path_falls_back_to_react(agent):
+    response = agent.sql_agent_query("What is the meaning of life?", mode="fast")
+    assert response["path"] == "fallback" and response["llm_calls"] == 2
+
+
+def test_fast_path_rejects_writes(sample_db):
+    agent = SqliteAgent(sample_db, llm=FakeChatModel(queries={"Remove all orders": "DELETE FROM orders"}))
+    response = agent.sql_agent_query("Remove all orders", mode="fast")
+    assert response["path"] == "fallback" and response["sql"] is None
+    assert agent.db.fetch("SELECT COUNT(*) FROM orders").rows == [(300,)]
+    agent.db.close()
@@ -0,0 +1,35 @@
+from benchmarks.fakes import FakeEmbedding
+from db.embedding_cache import CachedEmbedding, EmbeddingCache
+
+
+def test_round_trip_and_stats(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.db"))
+    cache.put_many("m", ["a", "b"], [[0.5, 1.0], [2.0, -1.0]])
+    assert cache.get_many("m", ["a", "x", "b"]) == [[0.5, 1.0], None, [2.0, -1.0]]
+    assert cache.get_many("other", ["a"]) == [None]
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["entries"] == 2
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.db"), max_entries=10)
+    cache.put_many("m", [f"t{i}" for i in range(10)], [[float(i)] for i in range(10)])
+    cache.get_many("m", ["t0"])
+    cache.put_many("m", ["t10"], [[10.0]])
+    assert cache.stats()["entries"] == 9
+    assert cache.get_many("m", ["t0", "t10"]) == [[0.0], [10.0]]
+    cache.close()
+
+
+def test_cached_embedding_only_computes_missing_texts(tmp_path):
+    base = FakeEmbedding()
+    model = CachedEmbedding(base, EmbeddingCache(str(tmp_path / "emb.db")))
+    first = model.get_text_embedding_batch(["alpha", "beta", "alpha"])
+    assert base.calls == 1
+    second = model.get_text_embedding_batch(["beta", "alpha"])
+    assert base.calls == 1
+    assert second == [first[1], first[0]]
+    model.get_text_embedding_batch(["beta", "gamma"])
+    assert base.calls == 2
+    assert model.cache.stats()["entries"] == 3
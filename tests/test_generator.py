@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from benchmarks.run_benchmarks import workdir_config
+from generator import Generator
+from router import Route
+
+
+class StubRouter:
+    def __init__(self, label, confidence):
+        self.result = Route(label, confidence, {})
+
+    def route(self, query):
+        return self.result
+
+
+@pytest.fixture
+def generator(tmp_path):
+    generator = Generator(config=workdir_config(str(tmp_path)))
+    generator.calls = []
+
+    def chat(query, chat_history=None, use_context=True, memory=None):
+        generator.calls.append("chat")
+        return generator.chat_answer
+
+    def sql_response(query):
+        generator.calls.append("sql")
+        return {"messages": [AIMessage(content="The Laptop costs 999.")], "sql": generator.sql}
+
+    generator.chat, generator.sql_response = chat, sql_response
+    generator.chat_answer, generator.sql = "Refunds are issued within 30 days.", "SELECT price FROM product"
+    return generator
+
+
+def route(generator, label, confidence):
+    generator._components["router"] = StubRouter(label, confidence)
+
+
+def test_unsure_chat_route_falls_back_to_sql_when_documents_lack_the_answer(generator):
+    route(generator, "chat", 0.0)
+    generator.chat_answer = "The documents do not contain the price of the Laptop."
+    result = generator.answer("What is the price of the Laptop?")
+    assert generator.calls == ["chat", "sql"]
+    assert result["route"] == "sql" and result["fell_back"]
+    assert result["answer"] == "The Laptop costs 999."
+
+
+def test_usable_first_path_does_not_run_the_other(generator):
+    route(generator, "chat", 0.2)
+    result = generator.answer("What is the refund policy?")
+    assert generator.calls == ["chat"]
+    assert result["route"] == "chat" and not result["fell_back"]
+
+
+def test_failed_sql_falls_back_to_chat(generator):
+    route(generator, "sql", 0.3)
+    generator.sql = None
+    assert generator.answer("Who handles refunds?")["route"] == "chat"
+    assert generator.calls == ["sql", "chat"]
+
+
+def test_first_answer_is_kept_when_neither_is_usable(generator):
+    route(generator, "chat", 0.1)
+    generator.chat_answer = "I could not find that in the documents."
+    generator.sql = None
+    result = generator.answer("What is the price of the Laptop?")
+    assert result["route"] == "chat" and result["answer"] == generator.chat_answer
+
+
+def test_confident_route_runs_one_path(generator):
+    route(generator, "chat", 0.9)
+    generator.chat_answer = "I could not find that in the documents."
+    assert generator.answer("What is the price of the Laptop?")["route"] == "chat"
+    assert generator.calls == ["chat"]
+
+
+def test_fallback_path_runs_in_its_slot(generator):
+    route(generator, "chat", 0.0)
+    generator.chat_answer = "The documents do not contain the price of the Laptop."
+    @contextmanager
+    def fallback_slot(label):
+        generator.calls.append(f"slot:{label}")
+        yield
+
+    assert generator.answer("What is the price of the Laptop?", fallback_slot=fallback_slot)["route"] == "sql"
+    assert generator.calls == ["chat", "slot:sql", "sql"]
+
+
+def test_overloaded_fallback_keeps_the_first_answer(generator):
+    route(generator, "chat", 0.0)
+    generator.chat_answer = "The documents do not contain the price of the Laptop."
+
+    def full(label):
+        raise RuntimeError("sql backend is overloaded")
+
+    result = generator.answer("What is the price of the Laptop?", fallback_slot=full)
+    assert result["route"] == "chat" and generator.calls == ["chat"]
@@ -0,0 +1,114 @@
+import os
+import shutil
+
+import pytest
+
+from benchmarks.fakes import FakeEmbedding
+from benchmarks.run_benchmarks import workdir_config, write_documents
+from db.vector_db_manager import VectorDBManager
+
+
+def make_manager(tmp_path, workers: int = 1) -> VectorDBManager:
+    config = workdir_config(str(tmp_path))
+    config.INGEST_WORKERS = workers
+    config.CHUNK_SIZE = 64
+    config.CHUNK_OVERLAP = 8
+    return VectorDBManager(config.VECTOR_DB_DIR, config.NEW_DOCUMENTS_DIR, config.PROCESSED_DOCUMENTS_DIR,
+                           config.DB_NAME, manifest_path=config.INGEST_MANIFEST_PATH,
+                           embed_model=FakeEmbedding(), config=config,
+                           failed_documents_dir=config.FAILED_DOCUMENTS_DIR)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_unparseable_file_is_quarantined(tmp_path, workers):
+    manager = make_manager(tmp_path, workers)
+    write_documents(manager.new_documents_dir, 2, 200, seed=0)
+    with open(os.path.join(manager.new_documents_dir, "broken.pdf"), "wb") as f:
+        f.write(b"not a pdf")
+
+    assert manager.process_new_documents() is not None
+    assert set(manager.pipeline.failed) == {"broken.pdf"}
+    assert os.listdir(manager.new_documents_dir) == []
+    assert os.listdir(manager.failed_documents_dir) == ["broken.pdf"]
+    assert sorted(manager.manifest.files) == ["doc_00000.txt", "doc_00001.txt"]
+    assert manager.process_new_documents() is None
+
+
+def test_interrupted_run_resumes_without_re_embedding(tmp_path):
+    manager = make_manager(tmp_path)
+    write_documents(manager.new_documents_dir, 3, 200, seed=0)
+    move, moved = manager._move_to_processed, []
+
+    def crash_on_second(filename):
+        moved.append(filename)
+        if len(moved) == 2:
+            raise KeyboardInterrupt
+        move(filename)
+
+    manager._move_to_processed = crash_on_second
+    with pytest.raises(KeyboardInterrupt):
+        manager.process_new_documents()
+    # The second file was stored and checkpointed before the crash; only the third is left to embed
+    assert sorted(manager.manifest.files) == sorted(moved)
+    chunks = manager.collection.count()
+
+    resumed = make_manager(tmp_path)
+    calls = resumed.embed_model.calls
+    assert resumed.process_new_documents() is not None
+    assert resumed.embed_model.calls - calls == 1
+    assert sorted(os.listdir(resumed.processed_documents_dir)) == ["doc_00000.txt", "doc_00001.txt", "doc_00002.txt"]
+    assert resumed.collection.count() > chunks
+
+
+def paragraphs(count: int, edited: int = None) -> str:
+    return "\n\n".join(f"Paragraph {i} {'revised ' if i == edited else ''}about library opening hours and "
+                       f"course registration rules for semester {i}." for i in range(count))
+
+
+def test_changed_file_re_embeds_only_changed_chunks(tmp_path):
+    manager = make_manager(tmp_path)
+    path = os.path.join(manager.new_documents_dir, "guide.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(paragraphs(12))
+    manager.process_new_documents()
+    before = manager.manifest.chunks("guide.txt")
+    version = manager.corpus_version
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(paragraphs(12, edited=11))
+    manager.process_new_documents()
+    after = manager.manifest.chunks("guide.txt")
+    assert len(before) > 1 and set(before) & set(after)
+    assert set(before) != set(after)
+    assert set(manager.collection.get(include=[])["ids"]) == set(after)
+    assert manager.corpus_version > version
+
+    shutil.copy(os.path.join(manager.processed_documents_dir, "guide.txt"), path)
+    assert manager.process_new_documents() is None
+
+
+def test_deleted_file_chunks_are_removed(tmp_path):
+    manager = make_manager(tmp_path)
+    write_documents(manager.new_documents_dir, 2, 200, seed=0)
+    manager.process_new_documents()
+    os.remove(os.path.join(manager.processed_documents_dir, "doc_00000.txt"))
+    assert manager.process_new_documents() is not None
+    assert list(manager.manifest.files) == ["doc_00001.txt"]
+    assert set(manager.collection.get(include=[])["ids"]) == set(manager.manifest.chunks("doc_00001.txt"))
+
+
+def test_pre_manifest_entries_are_migrated_once(tmp_path):
+    manager = make_manager(tmp_path)
+    write_documents(manager.processed_documents_dir, 1, 200, seed=0)
+    embedding = FakeEmbedding().get_text_embedding("legacy")
+    manager.collection.add(ids=["doc_00000.txt", "3f2a-uuid"], documents=["whole document", "old chunk"],
+                           embeddings=[embedding, embedding])
+
+    assert manager.process_new_documents() is not None
+    ids = set(manager.collection.get(include=[])["ids"])
+    assert ids == set(manager.manifest.chunks("doc_00000.txt")) and ids
+    assert manager.manifest.reconciled
+
+    reopened = make_manager(tmp_path)
+    assert reopened.manifest.reconciled
+    assert reopened.process_new_documents() is None
@@ -0,0 +1,20 @@
+from utils.lru_cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["size"] == 2
+
+
+def test_lru_counts_hits_and_misses():
+    cache = LRUCache(4)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("missing", default=0)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
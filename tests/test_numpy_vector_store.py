@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import ExactMatchFilter, MetadataFilters, VectorStoreQuery
+
+from benchmarks.fakes import FakeEmbedding
+from db.numpy_vector_store import NumpyVectorStore
+
+TEXTS = [
+    "the library opens at eight in the morning",
+    "refunds are issued within thirty days of purchase",
+    "staff parking is behind the north building",
+    "the cafeteria serves lunch from noon until two",
+    "exam results are published on the student portal",
+    "lost cards can be replaced at the front desk",
+]
+
+
+class ListCollection:
+    """Minimal stand-in for a Chroma collection: count() and paged get()."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def count(self):
+        return len(self.nodes)
+
+    def get(self, include, limit, offset):
+        page = self.nodes[offset:offset + limit]
+        return {"ids": [n.node_id for n in page], "embeddings": [n.embedding for n in page],
+                "documents": [n.text for n in page], "metadatas": [{"source": n.node_id} for n in page]}
+
+
+@pytest.fixture
+def nodes():
+    embedding = FakeEmbedding()
+    return [TextNode(id_=f"n{i}", text=text, embedding=embedding.get_text_embedding(text))
+            for i, text in enumerate(TEXTS)]
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_query_finds_exact_match(tmp_path, nodes, quantization):
+    store = NumpyVectorStore.from_chroma_collection(ListCollection(nodes), str(tmp_path / "index"),
+                                                    quantization=quantization, batch_size=4)
+    assert store.count == len(nodes) and store.meta["quantization"] == quantization
+
+    for node in nodes:
+        result = store.query(VectorStoreQuery(query_embedding=node.embedding, similarity_top_k=3))
+        assert result.ids[0] == node.node_id
+        assert result.nodes[0].text == node.text
+        assert result.similarities == sorted(result.similarities, reverse=True)
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_query_batch_matches_single_queries(tmp_path, nodes, quantization):
+    store = NumpyVectorStore.from_chroma_collection(ListCollection(nodes), str(tmp_path / "index"),
+                                                    quantization=quantization)
+    queries = [FakeEmbedding().get_text_embedding(q) for q in ("library morning", "refund purchase", "lunch")]
+    batch = store.query_batch(queries, top_k=2)
+
+    for query, result in zip(queries, batch):
+        single = store.query(VectorStoreQuery(query_embedding=query, similarity_top_k=2))
+        assert result.ids == single.ids
+        assert np.allclose(result.similarities, single.similarities)
+
+
+def test_quantized_scores_track_float_scores(tmp_path, nodes):
+    query = FakeEmbedding().get_text_embedding("replace lost cards at the desk")
+    scores = {}
+    for quantization in ("none", "int8"):
+        store = NumpyVectorStore.from_chroma_collection(ListCollection(nodes), str(tmp_path / quantization),
+                                                        quantization=quantization)
+        result = store.query_batch([query], top_k=len(nodes))[0]
+        scores[quantization] = dict(zip(result.ids, result.similarities))
+    for node_id, score in scores["none"].items():
+        assert scores["int8"][node_id] == pytest.approx(score, abs=0.02)
+
+
+def test_add_and_delete_persist(tmp_path, nodes):
+    persist_dir = str(tmp_path / "index")
+    store = NumpyVectorStore(persist_dir=persist_dir)
+    assert store.query_batch([nodes[0].embedding], top_k=3)[0].ids == []
+
+    nodes[0].relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id="doc-a")
+    store.add(nodes[:3])
+    store.add(nodes[3:])
+    assert NumpyVectorStore(persist_dir=persist_dir).count == len(nodes)
+
+    store.delete("doc-a")
+    reopened = NumpyVectorStore(persist_dir=persist_dir)
+    assert reopened.count == len(nodes) - 1
+    result = reopened.query(VectorStoreQuery(query_embedding=nodes[0].embedding, similarity_top_k=len(nodes)))
+    assert "n0" not in result.ids
+
+
+def test_rejects_metadata_filters_and_unknown_quantization(tmp_path, nodes):
+    store = NumpyVectorStore.from_chroma_collection(ListCollection(nodes), str(tmp_path / "index"))
+    with pytest.raises(ValueError):
+        store.query(VectorStoreQuery(query_embedding=nodes[0].embedding, similarity_top_k=1,
+                                     filters=MetadataFilters(filters=[ExactMatchFilter(key="a", value="b")])))
+    with pytest.raises(ValueError):
+        NumpyVectorStore.from_chroma_collection(ListCollection(nodes), str(tmp_path / "bad"), quantization="int4")
@@ -0,0 +1,49 @@
+import pytest
+
+from benchmarks.fakes import FakeLLM
+from query_rewriter import QueryRewriter
+
+WELCOME = {"role": "assistant", "content": "Hello! How can I help you today?"}
+HISTORY = [
+    WELCOME,
+    {"role": "user", "content": "What is the refund policy for online courses?"},
+    {"role": "assistant", "content": "Refunds are available within 30 days."},
+]
+
+
+@pytest.fixture
+def rewriter():
+    return QueryRewriter(FakeLLM(response_tokens=8))
+
+
+def test_first_question_is_not_rewritten(rewriter):
+    assert not rewriter.needs_rewrite("What does it cost?", [WELCOME])
+
+
+@pytest.mark.parametrize("query", [
+    "thanks!",
+    "How do I register for the spring semester classes?",
+    "Does the refund policy for online courses also cover textbooks?",
+])
+def test_standalone_follow_ups_skip_the_rewrite(rewriter, query):
+    assert not rewriter.needs_rewrite(query, HISTORY)
+
+
+@pytest.mark.parametrize("query", ["What about it?", "and for textbooks?", "Why?"])
+def test_referring_follow_ups_are_rewritten(rewriter, query):
+    assert rewriter.needs_rewrite(query, HISTORY)
+
+
+def test_skipped_rewrite_returns_query_without_llm_call(rewriter):
+    assert rewriter.rewrite("thanks!", HISTORY) == "thanks!"
+    assert rewriter.llm.calls == 0
+    assert rewriter.stats()["skipped"] == 1
+
+
+def test_rewrites_are_cached_per_history_window(rewriter):
+    first = rewriter.rewrite("What about it?", HISTORY)
+    assert rewriter.rewrite("what about it?  ", HISTORY) == first
+    assert rewriter.llm.calls == 1
+    rewriter.rewrite("What about it?", HISTORY + [{"role": "user", "content": "Tell me about housing."}])
+    assert rewriter.llm.calls == 2
+    assert rewriter.stats()["cache_hits"] == 1
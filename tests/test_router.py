@@ -0,0 +1,45 @@
+import pytest
+
+from db.sqlite import SQLiteDatabase
+from router import IntentRouter
+
+
+@pytest.fixture
+def router(sample_db):
+    database = SQLiteDatabase(sample_db)
+    yield IntentRouter(schema_provider=database.schema)
+    database.close()
+
+
+@pytest.mark.parametrize("query", [
+    "How many orders are there?",
+    "Which staff member handled the most orders?",
+    "List the top 5 products by price",
+    "What is the average product price?",
+])
+def test_routes_data_questions_to_sql(router, query):
+    route = router.route(query)
+    assert route.label == "sql"
+    assert route.confidence >= 0.5
+
+
+@pytest.mark.parametrize("query", [
+    "In what order should I take my courses?",
+    "What products do we sell?",
+    "What is the grading policy?",
+    "How do I register for classes?",
+])
+def test_schema_words_alone_do_not_route_to_sql(router, query):
+    assert router.route(query).label == "chat"
+
+
+def test_schema_terms_follow_the_schema(router):
+    terms = router.schema_terms()
+    assert {"order", "product", "staff", "price"} <= terms
+    assert router.schema_terms() is terms
+
+
+def test_routes_without_schema():
+    route = IntentRouter().route("How many orders are there?")
+    assert route.label == "sql"
+    assert route.scores["schema"] == 0
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeEmbedding, FakeLLM
+from chat_engine import ChatEngine
+from semantic_cache import SemanticCache
+
+
+def answer(cache: SemanticCache, query: str, text: str):
+    lookup = cache.lookup(query)
+    assert lookup.answer is None
+    cache.store(lookup, query, text)
+
+
+def test_semantic_cache_hits_same_meaning():
+    cache = SemanticCache(FakeEmbedding(), threshold=0.9, max_entries=4, ttl_s=60)
+    answer(cache, "what is the refund policy", "Refunds within 30 days.")
+    assert cache.lookup("what is the refund policy").answer == "Refunds within 30 days."
+    assert cache.lookup("where is the library building").answer is None
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache(FakeEmbedding(), threshold=0.99, max_entries=2, ttl_s=60)
+    answer(cache, "alpha query words", "a")
+    answer(cache, "beta other terms", "b")
+    time.sleep(0.01)
+    assert cache.lookup("alpha query words").answer == "a"
+    answer(cache, "gamma third topic", "c")
+    assert cache.evictions == 1
+    assert cache.lookup("beta other terms").answer is None
+    assert cache.lookup("alpha query words").answer == "a"
+
+
+def test_semantic_cache_expires_entries():
+    cache = SemanticCache(FakeEmbedding(), threshold=0.9, max_entries=2, ttl_s=0.01)
+    answer(cache, "what is the refund policy", "x")
+    time.sleep(0.02)
+    assert cache.lookup("what is the refund policy").answer is None
+    assert cache.expirations == 1
+
+
+def test_semantic_cache_drops_entries_on_version_change():
+    version = {"value": 1}
+    cache = SemanticCache(FakeEmbedding(), threshold=0.9, max_entries=2, ttl_s=60,
+                          version_provider=lambda: version["value"])
+    answer(cache, "what is the refund policy", "old")
+    stale = cache.lookup("something else entirely")
+    version["value"] = 2
+    assert cache.lookup("what is the refund policy").answer is None
+    assert cache.invalidations == 1
+    cache.store(stale, "something else entirely", "answered against the old corpus")
+    assert cache.lookup("something else entirely").answer is None
+
+
+WELCOME = {"role": "assistant", "content": "Welcome! How can I assist you today?"}
+
+
+@pytest.fixture
+def engine():
+    llm = FakeLLM(response_tokens=8)
+    return ChatEngine(llm, retriever=None, semantic_cache=SemanticCache(FakeEmbedding()))
+
+
+def test_cache_applies_to_first_question_after_welcome(engine):
+    query = "What is the refund policy?"
+    assert engine.cache_applies(query, query, [WELCOME], True)
+    assert not engine.cache_applies(query, query, [WELCOME], False)
+
+
+def test_cache_applies_to_standalone_follow_up(engine):
+    history = [WELCOME, {"role": "user", "content": "What is the refund policy?"},
+               {"role": "assistant", "content": "Refunds within 30 days."}]
+    query = "How do I register for the spring semester classes?"
+    assert engine.cache_applies(query, query, history, True)
+    assert engine.cache_applies("What about it?", "What about the refund policy deadline?", history, True)
+    assert not engine.cache_applies("What about it?", "What about it?", history, True)
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from benchmarks.run_benchmarks import workdir_config
+from generator import Generator
+from server import BackendLimiter, ChatServer, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def occupy(limiter: BackendLimiter, release: asyncio.Event):
+    async with limiter.slot():
+        await release.wait()
+
+
+def test_limiter_admits_up_to_concurrency_plus_queue():
+    async def scenario():
+        limiter = BackendLimiter("chat", concurrency=2, max_queue=3, queue_timeout_s=5)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(occupy(limiter, release)) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        assert limiter.active == 2 and limiter.waiting == 3
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return limiter, results
+
+    limiter, results = run(scenario())
+    rejected = [r for r in results if isinstance(r, Overloaded)]
+    assert len(rejected) == 5
+    assert all(r.backend == "chat" and r.retry_after_s >= 1 for r in rejected)
+    assert limiter.completed == 5 and limiter.rejected == 5
+    assert limiter.busy == 0
+
+
+def test_limiter_queue_timeout_rejects():
+    async def scenario():
+        limiter = BackendLimiter("sql", concurrency=1, max_queue=5, queue_timeout_s=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(occupy(limiter, release))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with limiter.slot():
+                pass
+        release.set()
+        await holder
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.rejected == 1 and limiter.waiting == 0
+
+
+def test_limiter_free_slot_is_taken_immediately():
+    async def scenario():
+        limiter = BackendLimiter("chat", concurrency=1, max_queue=0, queue_timeout_s=1)
+        for _ in range(3):
+            async with limiter.slot():
+                assert limiter.active == 1
+        return limiter
+
+    assert run(scenario()).completed == 3
+
+
+def test_blocking_slot_holds_a_slot_from_a_worker_thread():
+    async def scenario():
+        limiter = BackendLimiter("sql", concurrency=1, max_queue=0, queue_timeout_s=1)
+        loop = asyncio.get_running_loop()
+        inside = []
+
+        def work():
+            with limiter.blocking_slot(loop):
+                inside.append(limiter.active)
+
+        await asyncio.to_thread(work)
+        return limiter, inside
+
+    limiter, inside = run(scenario())
+    assert inside == [1] and limiter.active == 0 and limiter.completed == 1
+
+
+def test_sql_concurrency_defaults_to_pool_size(tmp_path):
+    config = workdir_config(str(tmp_path))
+    assert ChatServer(Generator(config=config)).sql_concurrency == config.SQLITE_POOL_SIZE
+    config.SERVER_SQL_CONCURRENCY = config.SQLITE_POOL_SIZE + 1
+    with pytest.raises(ValueError):
+        ChatServer(Generator(config=config))
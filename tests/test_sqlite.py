@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+
+import pytest
+
+from configs import Configs
+from db.sqlite import ConnectionPool, PoolTimeoutError, SQLiteDatabase
+
+WRITES = [
+    "INSERT INTO products (product_name, price) VALUES ('x', 1)",
+    "UPDATE products SET price = 0",
+    "DELETE FROM orders",
+    "DROP TABLE staff",
+    "CREATE TABLE t (a)",
+    "ATTACH DATABASE ':memory:' AS other",
+    "PRAGMA journal_mode=DELETE",
+    "PRAGMA writable_schema=1",
+]
+
+
+@pytest.fixture
+def db(sample_db):
+    database = SQLiteDatabase(sample_db, pool_size=2, query_timeout_s=5)
+    yield database
+    database.close()
+
+
+def test_select_runs(db):
+    result = db.fetch("SELECT COUNT(*) FROM orders")
+    assert result.rows == [(300,)]
+    assert not result.truncated
+
+
+def test_fetch_caps_rows(sample_db):
+    database = SQLiteDatabase(sample_db, max_rows=10)
+    try:
+        result = database.fetch("SELECT order_id FROM orders")
+    finally:
+        database.close()
+    assert len(result.rows) == 10
+    assert result.truncated
+
+
+@pytest.mark.parametrize("sql", WRITES)
+def test_validate_query_rejects_writes(db, sql):
+    with pytest.raises(sqlite3.DatabaseError):
+        db.validate_query(sql)
+
+
+@pytest.mark.parametrize("sql", WRITES)
+def test_fetch_rejects_writes(db, sql):
+    with pytest.raises(sqlite3.DatabaseError):
+        db.fetch(sql)
+    assert db.fetch("SELECT COUNT(*) FROM orders").rows == [(300,)]
+
+
+def test_validate_query_accepts_reads(db):
+    assert db.validate_query("SELECT s.first_name, COUNT(*) FROM orders o JOIN staff s USING (staff_id) "
+                             "GROUP BY s.staff_id")
+
+
+def test_query_layer_leaves_file_untouched(sample_db):
+    with open(sample_db, "rb") as f:
+        before = f.read()
+    database = SQLiteDatabase(sample_db)
+    database.fetch("SELECT * FROM products")
+    database.schema()
+    database.close()
+    with open(sample_db, "rb") as f:
+        assert f.read() == before
+
+
+def test_schema_lists_tables(db):
+    schema = db.schema()
+    assert set(schema) == {"orders", "products", "staff"}
+    assert schema is db.schema()  # cached until schema_version changes
+
+
+def test_pool_checkout_times_out(sample_db):
+    pool = ConnectionPool(sample_db, size=1)
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait(5)
+    try:
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection(wait_s=0.05):
+                pass
+    finally:
+        release.set()
+        worker.join()
+        pool.close()
+
+
+def test_data_version_follows_writes_from_other_connections(db, sample_db):
+    before = db.data_version()
+    assert db.data_version() == before
+    writer = sqlite3.connect(sample_db)
+    writer.execute("UPDATE products SET price = price + 1")
+    writer.commit()
+    writer.close()
+    assert db.data_version() != before
+
+
+def test_bundled_database_uses_wal():
+    conn = sqlite3.connect(f"file:{Configs.SQLITE_DB_DIR}?mode=ro", uri=True)
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    conn.close()
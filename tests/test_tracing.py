@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agents.data_agent import SqliteAgent
+from benchmarks.fakes import FakeChatModel
+from benchmarks.run_benchmarks import SQL_QUESTIONS
+from utils.tracing import JsonlExporter, Metrics, Tracer, record_llm_call, tracer
+
+
+def usage_reply(prompt_tokens, completion_tokens):
+    return AIMessage(content="ok", usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                                                   "total_tokens": prompt_tokens + completion_tokens})
+
+
+def test_llm_usage_propagates_to_ancestors():
+    test_tracer = Tracer(sample_rate=1.0)
+    with test_tracer.span("request") as root:
+        with test_tracer.span("llm"):
+            record_llm_call(usage_reply(10, 3))
+        with test_tracer.span("retrieve") as child:
+            child.incr("results", 4)
+    assert root.attributes == {"llm_calls": 1, "prompt_tokens": 10, "completion_tokens": 3}
+
+
+def test_exports_only_sampled_traces(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonlExporter(str(path))
+    for rate in (1.0, 0.0):
+        test_tracer = Tracer(sample_rate=rate, exporters=[exporter])
+        with test_tracer.span("request"):
+            with test_tracer.span("child"):
+                pass
+    spans = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [span["name"] for span in spans] == ["child", "request"]
+    assert spans[0]["parent_id"] == spans[1]["span_id"] and spans[0]["trace_id"] == spans[1]["trace_id"]
+
+
+def test_iterate_records_first_item_and_count():
+    test_tracer = Tracer(sample_rate=1.0)
+    with test_tracer.span("request") as root:
+        stream = test_tracer.iterate("stream", iter("abc"))
+        assert list(stream) == ["a", "b", "c"]
+    assert test_tracer.metrics._counters[("stream", "items")] == 3
+    assert root.duration_s is not None
+
+
+def test_metrics_count_counts_and_summarize_measurements():
+    metrics = Metrics()
+    test_tracer = Tracer(sample_rate=0.0, metrics=metrics)
+    for similarity in (0.5, 0.75):
+        with test_tracer.span("cache", hit=True, similarity=similarity, top_k=5, results=2):
+            pass
+    text = metrics.render()
+    assert 'genai_span_attribute_total{span="cache",attribute="hit"} 2' in text
+    assert 'genai_span_attribute_total{span="cache",attribute="results"} 4' in text
+    assert 'attribute="similarity"' not in "\n".join(l for l in text.splitlines() if "_total" in l)
+    assert 'genai_span_attribute_value_sum{span="cache",attribute="similarity"} 1.250000' in text
+    assert 'genai_span_attribute_value_count{span="cache",attribute="top_k"} 2' in text
+    assert 'genai_span_duration_seconds_count{span="cache"} 2' in text
+
+
+def test_react_path_records_token_usage(sample_db, monkeypatch):
+    monkeypatch.setattr(tracer, "metrics", Metrics())
+    agent = SqliteAgent(sample_db, llm=FakeChatModel(queries=SQL_QUESTIONS))
+    agent.sql_agent_query("How many orders are there?", mode="react")
+    agent.db.close()
+    counters = tracer.metrics._counters
+    assert counters[("sql.react", "llm_calls")] == 2
+    assert counters[("sql.react", "prompt_tokens")] > 0 and counters[("sql.react", "completion_tokens")] > 0
+
+
+def test_streamed_react_path_records_token_usage(sample_db, monkeypatch):
+    monkeypatch.setattr(tracer, "metrics", Metrics())
+    agent = SqliteAgent(sample_db, llm=FakeChatModel(queries=SQL_QUESTIONS))
+    list(tracer.iterate("stream", agent.stream_sql_agent_query("How many orders are there?", mode="react")))
+    agent.db.close()
+    assert tracer.metrics._counters[("stream", "llm_calls")] == 2
+    assert tracer.metrics._counters[("stream", "prompt_tokens")] > 0
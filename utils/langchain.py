@@ -1,3 +1,4 @@
+import logging
 from langchain_core.messages import HumanMessage,AIMessage, ToolMessage 
 
 class Langchain:
@@ -5,27 +6,30 @@ class Langchain:
     def __init__(self):
         pass
 
-    def read_detailed_response(self, response):
-        """Comprehensive response parsing"""
-        print("\n=== Detailed Response Breakdown ===")
+    def read_detailed_response(self, response) -> list:
+        """Comprehensive response parsing; returns the breakdown lines and logs them"""
+        lines = ["=== Detailed Response Breakdown ==="]
         
         # Iterate through all messages
         for i, message in enumerate(response['messages']):
-            print(f"\nMessage {i + 1}:")
+            lines.append(f"Message {i + 1}:")
             
             # Message Type Handling
             if isinstance(message, HumanMessage):
-                print("User Query:", message.content)
+                lines.append(f"User Query: {message.content}")
             
             elif isinstance(message, AIMessage):
                 # Check for tool calls
                 if message.tool_calls:
-                    print("Reasoning Step:")
+                    lines.append("Reasoning Step:")
                     for tool_call in message.tool_calls:
-                        print(f"- Tool: {tool_call['name']}")
-                        print(f"  Arguments: {tool_call.get('args', 'N/A')}")
+                        lines.append(f"- Tool: {tool_call['name']}")
+                        lines.append(f"  Arguments: {tool_call.get('args', 'N/A')}")
                 
-                print("AI Thought:", message.content)
+                lines.append(f"AI Thought: {message.content}")
             
             elif isinstance(message, ToolMessage):
-                print("Tool Result:", message.content)
\ No newline at end of file
+                lines.append(f"Tool Result: {message.content}")
+
+        logging.info("\n".join(lines))
+        return lines
@@ -0,0 +1,43 @@
+import logging
+import time
+from typing import Callable, Iterable, Iterator, Optional
+from configs import Configs
+
+
+class TimedStream:
+    """Iterates over a token stream while recording time-to-first-token and total latency.
+
+    The clock starts when the wrapper is created, so work done lazily inside the wrapped
+    generator (retrieval, tool calls) counts towards the first-token latency.
+    """
+
+    def __init__(self, tokens: Iterable[str], name: str = "stream",
+                 on_complete: Optional[Callable[["TimedStream"], None]] = None):
+        self.tokens = tokens
+        self.name = name
+        self.on_complete = on_complete
+        self.started_at = time.perf_counter()
+        self.first_token_s = None
+        self.total_s = None
+        self.parts = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def latency(self) -> dict:
+        return {"first_token_s": self.first_token_s, "total_s": self.total_s}
+
+    def __iter__(self) -> Iterator[str]:
+        for token in self.tokens:
+            if self.first_token_s is None:
+                self.first_token_s = time.perf_counter() - self.started_at
+            self.parts.append(token)
+            yield token
+        self.total_s = time.perf_counter() - self.started_at
+        if Configs.WRITE_LOGS:
+            first_token = "n/a" if self.first_token_s is None else f"{self.first_token_s:.3f}s"
+            logging.info(f"{self.name}: first token {first_token}, total {self.total_s:.3f}s")
+        if self.on_complete is not None:
+            self.on_complete(self)
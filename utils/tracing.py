@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from configs import Configs
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Span attributes that add up along the trace (a child's LLM calls also count for its parents)
+PROPAGATED_COUNTERS = ("llm_calls", "prompt_tokens", "completion_tokens")
+
+# Numeric span attributes that are counts, summed into Prometheus counters. Other numeric attributes
+# (confidence, similarity, top_k, ...) are measurements and only feed a sum/count summary.
+COUNTED_ATTRIBUTES = PROPAGATED_COUNTERS + (
+    "results", "items", "rows", "tool_calls", "questions", "queries", "cache_hits", "retrieved",
+    "folded_messages", "rate_limited", "embedding_calls", "nodes", "passages", "dropped_passages",
+    "raw_tokens", "packed_tokens", "saved_tokens",
+)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage of a request; children inherit the trace id and sampling decision."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "sampled", "start_time", "duration_s",
+                 "attributes", "_started")
+
+    def __init__(self, name: str, parent: Optional["Span"], sampled: bool, attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.sampled = sampled
+        self.start_time = time.time()
+        self.duration_s = None
+        self.attributes = attributes
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def incr(self, key: str, amount: float = 1):
+        """Add to a numeric attribute; PROPAGATED_COUNTERS are also added to every ancestor."""
+        span = self
+        while span is not None:
+            span.attributes[key] = span.attributes.get(key, 0) + amount
+            span = span.parent if key in PROPAGATED_COUNTERS else None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start": self.start_time,
+            "duration_s": self.duration_s,
+            "attributes": self.attributes,
+        }
+
+
+class JsonlExporter:
+    """Appends finished sampled spans to a JSONL file, flushing every flush_every spans."""
+
+    def __init__(self, path: str, flush_every: int = 50):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_every or span.parent is None:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+
+class Metrics:
+    """Per-span-name latency histograms, attribute counters and summaries in Prometheus text format.
+
+    Boolean attributes and COUNTED_ATTRIBUTES become counters; other numeric attributes become a
+    sum/count summary. Every span is counted here regardless of sampling; the cost is a dict update
+    per attribute.
+    """
+
+    def __init__(self, prefix: str = "genai"):
+        self.prefix = prefix
+        self._histograms: Dict[str, list] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._summaries: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span: Span):
+        with self._lock:
+            histogram = self._histograms.setdefault(span.name, [0] * len(LATENCY_BUCKETS) + [0, 0.0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if span.duration_s <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += span.duration_s
+            for key, value in span.attributes.items():
+                if isinstance(value, bool) or (key in COUNTED_ATTRIBUTES and isinstance(value, (int, float))):
+                    self._counters[(span.name, key)] = self._counters.get((span.name, key), 0) + value
+                elif isinstance(value, (int, float)):
+                    summary = self._summaries.setdefault((span.name, key), [0, 0.0])
+                    summary[0] += 1
+                    summary[1] += value
+
+    def render(self) -> str:
+        lines = [f"# TYPE {self.prefix}_span_duration_seconds histogram"]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f'{self.prefix}_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'{self.prefix}_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {histogram[-2]}')
+                lines.append(f'{self.prefix}_span_duration_seconds_count{{span="{name}"}} {histogram[-2]}')
+                lines.append(f'{self.prefix}_span_duration_seconds_sum{{span="{name}"}} {histogram[-1]:.6f}')
+            lines.append(f"# TYPE {self.prefix}_span_attribute_total counter")
+            for (name, key), value in sorted(self._counters.items()):
+                lines.append(f'{self.prefix}_span_attribute_total{{span="{name}",attribute="{key}"}} {value}')
+            lines.append(f"# TYPE {self.prefix}_span_attribute_value summary")
+            for (name, key), (count, total) in sorted(self._summaries.items()):
+                labels = f'span="{name}",attribute="{key}"'
+                lines.append(f'{self.prefix}_span_attribute_value_count{{{labels}}} {count}')
+                lines.append(f'{self.prefix}_span_attribute_value_sum{{{labels}}} {total:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        """Expose render() at http://host:port/metrics from a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
+
+
+class Tracer:
+    """Creates nested spans through a context variable, so nesting follows threads and asyncio tasks.
+
+    The sampling decision is made once per trace (at the root span); unsampled traces still feed
+    the metrics but are not exported.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, exporters: List = None, metrics: Metrics = None):
+        self.sample_rate = sample_rate
+        self.exporters = exporters or []
+        self.metrics = metrics or Metrics()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = _current_span.get()
+        sampled = parent.sampled if parent else random.random() < self.sample_rate
+        span = Span(name, parent, sampled, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span, time.perf_counter() - span._started)
+
+    def record(self, name: str, duration_s: float, **attributes):
+        """Record an already-finished stage (e.g. a consumed stream) as a child of the current span."""
+        parent = _current_span.get()
+        span = Span(name, parent, parent.sampled if parent else random.random() < self.sample_rate, attributes)
+        span.start_time -= duration_s
+        self._finish(span, duration_s)
+
+    def _finish(self, span: Span, duration_s: float):
+        span.duration_s = duration_s
+        self.metrics.observe(span)
+        if span.sampled:
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:  # tracing must never break a request
+                    logging.warning(f"Span export failed: {e}")
+
+    def iterate(self, name: str, items: Iterable, **attributes) -> Iterator:
+        """Trace the consumption of a lazy iterable (e.g. a token stream) as one span.
+
+        The span is made current only while the next item is produced, so it is safe even when the
+        consumer iterates from another context or abandons the stream half-way.
+        """
+        parent = _current_span.get()
+        span = Span(name, parent, parent.sampled if parent else random.random() < self.sample_rate, attributes)
+        iterator = iter(items)
+        count = 0
+        try:
+            while True:
+                token = _current_span.set(span)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    span.set(error=type(e).__name__)
+                    raise
+                finally:
+                    _current_span.reset(token)
+                if count == 0:
+                    span.set(first_item_s=time.perf_counter() - span._started)
+                count += 1
+                yield item
+        finally:
+            span.set(items=count)
+            self._finish(span, time.perf_counter() - span._started)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator form of span() for plain functions."""
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            wrapper.__name__, wrapper.__doc__ = func.__name__, func.__doc__
+            return wrapper
+        return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def annotate(**attributes):
+    """Set attributes on the current span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def incr(key: str, amount: float = 1):
+    """Increment a counter on the current span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.incr(key, amount)
+
+
+def llm_usage(response) -> dict:
+    """Token usage of a llama_index or langchain response, when the provider reports it."""
+    raw = getattr(response, "raw", None)
+    usage = getattr(raw, "usage", None) or (raw.get("usage") if isinstance(raw, dict) else None)
+    if usage is not None:
+        get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+        return {"prompt_tokens": get("prompt_tokens") or 0, "completion_tokens": get("completion_tokens") or 0}
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    return {}
+
+
+def record_llm_call(response=None):
+    """Count one LLM call (and its token usage) on the current span and its ancestors."""
+    span = _current_span.get()
+    if span is None:
+        return
+    span.incr("llm_calls")
+    for key, value in llm_usage(response).items():
+        span.incr(key, value)
+
+
+_metrics_server = None
+
+
+def serve_metrics(port: int):
+    """Start the Prometheus text endpoint once per process."""
+    global _metrics_server
+    if _metrics_server is None:
+        _metrics_server = tracer.metrics.serve(port)
+        logging.info(f"Serving metrics on :{port}/metrics")
+
+
+def _build_tracer() -> Tracer:
+    exporters = [JsonlExporter(Configs.TRACE_JSONL_PATH)] if Configs.TRACE_JSONL_PATH else []
+    return Tracer(sample_rate=Configs.TRACE_SAMPLE_RATE, exporters=exporters)
+
+
+tracer = _build_tracer()